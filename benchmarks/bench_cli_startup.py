@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+# Benchmark: start-up cost of client commands.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_cli_startup.py [COMMAND...]
+#
+# Runs each command against a stub daemon socket, and reports the
+# wall-clock time per invocation, as well as the time spent importing
+# blankie's own modules (from -X importtime) and which of them were
+# imported.
+
+import contextlib
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+RUNS = 10
+
+def serve(path):
+	server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	server.bind(path)
+	server.listen()
+
+	def handle(connection):
+		with connection, connection.makefile('rb') as f:
+			line = f.readline()
+			# Notifications (e.g. 'reload') do not wait for a reply.
+			with contextlib.suppress(BrokenPipeError):
+				if line == b'["wake-lock"]\n':
+					connection.sendall(b'Wake lock acquired.\n')
+				else:
+					connection.sendall(b'ok')
+
+	def run():
+		while True:
+			(connection, _) = server.accept()
+			threading.Thread(target=handle, args=(connection,), daemon=True).start()
+
+	threading.Thread(target=run, daemon=True).start()
+
+def run(command, env):
+	start = time.perf_counter()
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', 'import sys, blankie; sys.exit(blankie.main())', command],
+		env=env,
+		stdout=subprocess.DEVNULL,
+		stderr=subprocess.PIPE,
+		check=True,
+	)
+	elapsed = time.perf_counter() - start
+
+	# Lines look like: "import time: self [us] | cumulative | package"
+	blankie_us = 0
+	modules = []
+	for line in result.stderr.decode().splitlines():
+		if not line.startswith('import time:') or 'cumulative' in line:
+			continue
+		(_self, cumulative, name) = line[len('import time:'):].split('|')
+		if name.strip() == 'blankie':
+			blankie_us = int(cumulative)
+		if name.strip().startswith('blankie'):
+			modules.append(name.strip())
+	return elapsed, blankie_us / 1e6, modules
+
+def main():
+	commands = sys.argv[1:] or ['status', 'lock', 'unlock', 'reload', 'attach', 'detach', 'wake-lock', 'stop']
+
+	with tempfile.TemporaryDirectory() as tmp:
+		socket_path = os.path.join(tmp, 'daemon.sock')
+		serve(socket_path)
+
+		# For 'stop': a PID file naming a process which has exited.
+		run_dir = os.path.join(tmp, 'run')
+		os.mkdir(run_dir)
+		exited = subprocess.Popen(['true'])
+		exited.wait()
+		with open(os.path.join(run_dir, 'daemon.pid'), 'w') as f:
+			f.write(str(exited.pid))
+
+		env = dict(
+			os.environ,
+			BLANKIE_SOCKET=socket_path,
+			BLANKIE_RUN_DIR=run_dir,
+			XDG_CONFIG_HOME=os.path.join(tmp, 'config'),
+			DISPLAY=':0',
+		)
+
+		print('%-10s %12s %12s    %s' % ('command', 'wall (ms)', 'blankie (ms)', 'blankie modules imported'))
+		for command in commands:
+			results = [run(command, env) for _ in range(RUNS)]
+			print('%-10s %12.1f %12.1f    %s' % (
+				command,
+				statistics.median(r[0] for r in results) * 1000,
+				statistics.median(r[1] for r in results) * 1000,
+				' '.join(results[0][2]),
+			))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+# Benchmark: one-shot commands vs. a persistent, pipelined connection.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_client_pipeline.py [COMMANDS]
+#
+# Runs the server module in-process (with the event loop on its own
+# thread, like in the daemon), then sends COMMANDS "ping" commands:
+# - one-shot:   one connection per command (blankie.server.query)
+# - persistent: one connection, waiting for each reply (Client.call)
+# - pipelined:  one connection, sending all commands before reading
+#               the replies (Client.pipeline)
+# - async:      one connection, from concurrent asyncio tasks
+
+import asyncio
+import os
+import sys
+import tempfile
+import threading
+import time
+
+tmp = tempfile.mkdtemp()
+os.environ['BLANKIE_RUN_DIR'] = tmp
+os.environ['BLANKIE_SOCKET'] = os.path.join(tmp, 'daemon.sock')
+
+import blankie
+import blankie.client
+
+def start_daemon():
+	blankie.module.module_dirs = [os.path.dirname(blankie.__file__) + '/modules']
+	for key in list(blankie.module.selectors):
+		if key != '30-sessions':
+			del blankie.module.selectors[key]
+	blankie.module.selectors['10-bench'] = lambda wanted_modules: wanted_modules.append(('server',))
+
+	started = threading.Event()
+
+	def run():
+		blankie.daemon.event_loop_thread = threading.current_thread()
+		blankie.module.update()
+		started.set()
+		blankie.daemon._event_loop.run()
+
+	threading.Thread(target=run, daemon=True).start()
+	started.wait()
+
+def one_shot(count):
+	for _ in range(count):
+		assert blankie.server.query('ping') == b'pong\n'
+
+def persistent(count):
+	with blankie.client.Client() as client:
+		for _ in range(count):
+			assert client.call('ping') == 'pong\n'
+
+def pipelined(count):
+	with blankie.client.Client() as client:
+		assert client.pipeline([['ping']] * count) == ['pong\n'] * count
+
+def concurrent(count):
+	async def run():
+		async with await blankie.client.AsyncClient.connect() as client:
+			results = await asyncio.gather(*(client.call('ping') for _ in range(count)))
+			assert results == ['pong\n'] * count
+	asyncio.run(run())
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 10000
+	start_daemon()
+
+	print('%-12s %10s %12s %14s' % ('mode', 'commands', 'total (ms)', 'per cmd (us)'))
+	for name, func in (
+			('one-shot', one_shot),
+			('persistent', persistent),
+			('pipelined', pipelined),
+			('async', concurrent),
+	):
+		start = time.perf_counter()
+		func(count)
+		elapsed = time.perf_counter() - start
+		print('%-12s %10d %12.1f %14.1f' % (name, count, elapsed * 1000, elapsed / count * 1e6))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,93 @@
+#!/usr/bin/env python3
+# Benchmark: cost of blankie.module.update() versus the number of modules.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_module_update.py
+#
+# Each scenario is timed for an increasing number of (no-op) modules:
+# - start:      start N modules from nothing
+# - toggle:     stop every other module, then start them again
+# - reentrant:  a launcher module which, like PerSessionModuleLauncher,
+#               starts N per-session modules from a re-entrant update()
+# - stop:       stop all N modules
+
+import os
+import sys
+import threading
+import time
+
+os.environ.setdefault('BLANKIE_RUN_DIR', '/tmp/blankie-bench-%d' % os.getpid())
+
+import blankie
+
+class BenchModule(blankie.module.Module):
+	name = 'bench'
+
+	def __init__(self, *args):
+		super().__init__()
+
+class LauncherModule(blankie.module.Module):
+	name = 'bench_launcher'
+
+	def __init__(self, count):
+		super().__init__()
+		self.count = count
+
+	def selector(self, wanted_modules):
+		wanted_modules.extend(('bench', 'child', i) for i in range(self.count))
+
+	def start(self):
+		blankie.module.selectors['40-bench-launcher'] = self.selector
+		blankie.module.update()
+
+	def stop(self):
+		del blankie.module.selectors['40-bench-launcher']
+		blankie.module.update()
+
+def timed(func):
+	start = time.perf_counter()
+	func()
+	return time.perf_counter() - start
+
+def run(count):
+	wanted = []
+	blankie.module.selectors.clear()
+	blankie.module.selectors['10-bench'] = lambda wanted_modules: wanted_modules.extend(wanted)
+
+	results = {}
+
+	wanted[:] = [('bench', i) for i in range(count)]
+	results['start'] = timed(blankie.module.update)
+
+	def toggle():
+		wanted[:] = [('bench', i) for i in range(0, count, 2)]
+		blankie.module.update()
+		wanted[:] = [('bench', i) for i in range(count)]
+		blankie.module.update()
+	results['toggle'] = timed(toggle)
+
+	wanted[:] = []
+	results['stop'] = timed(blankie.module.update)
+
+	def reentrant():
+		wanted[:] = [('bench_launcher', count)]
+		blankie.module.update()
+	results['reentrant'] = timed(reentrant)
+
+	wanted[:] = []
+	blankie.module.update()
+	blankie.module.module_instances.clear()
+	return results
+
+def main():
+	blankie.daemon.event_loop_thread = threading.current_thread()
+	counts = [int(arg) for arg in sys.argv[1:]] or [10, 30, 100, 300, 1000]
+
+	scenarios = ['start', 'toggle', 'reentrant', 'stop']
+	print('%8s' % 'modules' + ''.join('%12s' % s for s in scenarios) + '    (milliseconds)')
+	for count in counts:
+		results = run(count)
+		print('%8d' % count + ''.join('%12.2f' % (results[s] * 1000) for s in scenarios))
+
+if __name__ == '__main__':
+	main()
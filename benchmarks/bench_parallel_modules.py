@@ -0,0 +1,78 @@
+#!/usr/bin/env python3
+# Benchmark: lock / shutdown latency versus the number of displays, with
+# and without concurrent module start/stop.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_parallel_modules.py
+#
+# Simulates a lock transition which starts three per-display modules
+# (like xkbmap, dpms and i3lock) on each display, plus dunst.  Each
+# start/stop runs an external program which takes DELAY seconds, like
+# the real modules' xset / setxkbmap / i3lock invocations.
+
+import os
+import subprocess
+import sys
+import threading
+import time
+
+os.environ.setdefault('BLANKIE_RUN_DIR', '/tmp/blankie-bench-%d' % os.getpid())
+
+import blankie
+
+DELAY = '0.05'
+
+class ExternalProgramModule(blankie.module.Module):
+	name = 'bench_external'
+	concurrent = True
+
+	def __init__(self, *args):
+		super().__init__()
+
+	def start(self):
+		subprocess.check_call(['sleep', DELAY])
+
+	def stop(self):
+		subprocess.check_call(['sleep', DELAY])
+
+def timed(func):
+	start = time.perf_counter()
+	func()
+	return time.perf_counter() - start
+
+def run(displays, max_workers):
+	blankie.module.max_workers = max_workers
+	blankie.module._executor = None
+
+	wanted = []
+	blankie.module.selectors.clear()
+	blankie.module.selectors['10-bench'] = lambda wanted_modules: wanted_modules.extend(wanted)
+
+	wanted[:] = [('bench_external', 'dunst')] + [
+		('bench_external', kind, display)
+		for kind in ('xkbmap', 'dpms', 'i3lock')
+		for display in range(displays)
+	]
+	lock = timed(blankie.module.update)
+	wanted[:] = []
+	shutdown = timed(blankie.module.update)
+	blankie.module.module_instances.clear()
+	return lock, shutdown
+
+def main():
+	blankie.daemon.event_loop_thread = threading.current_thread()
+	counts = [int(arg) for arg in sys.argv[1:]] or [1, 2, 3, 4, 6]
+
+	print('%8s %12s %12s %12s %12s    (milliseconds)' % (
+		'displays', 'lock serial', 'lock par.', 'stop serial', 'stop par.'))
+	for count in counts:
+		(serial_lock, serial_stop) = run(count, 1)
+		(parallel_lock, parallel_stop) = run(count, 8)
+		print('%8d %12.1f %12.1f %12.1f %12.1f' % (
+			count,
+			serial_lock * 1000, parallel_lock * 1000,
+			serial_stop * 1000, parallel_stop * 1000,
+		))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+# Benchmark: socket server under many concurrent clients.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_server_load.py [CLIENTS]
+#
+# Runs the server module in-process (with the event loop on its own
+# thread, like in the daemon), then opens CLIENTS connections at once
+# from a single client thread, and reports the number of threads in
+# the process and the per-request latency, for:
+# - ping:       one-shot commands (like status bars polling)
+# - wake-lock:  connections which acquire and then hold a wake-lock
+
+import os
+import selectors
+import socket
+import statistics
+import sys
+import tempfile
+import threading
+import time
+
+tmp = tempfile.mkdtemp()
+os.environ['BLANKIE_RUN_DIR'] = tmp
+os.environ['BLANKIE_SOCKET'] = os.path.join(tmp, 'daemon.sock')
+
+import blankie
+
+def start_daemon():
+	blankie.module.module_dirs = [os.path.dirname(blankie.__file__) + '/modules']
+	for key in list(blankie.module.selectors):
+		if key != '30-sessions':
+			del blankie.module.selectors[key]
+	blankie.module.selectors['10-bench'] = lambda wanted_modules: wanted_modules.append(('server',))
+
+	started = threading.Event()
+
+	def run():
+		blankie.daemon.event_loop_thread = threading.current_thread()
+		blankie.module.update()
+		started.set()
+		blankie.daemon._event_loop.run()
+
+	threading.Thread(target=run, daemon=True).start()
+	started.wait()
+
+def run_clients(count, command, expected, hold):
+	'''Connect count clients at once; return (latencies, threads while
+	all requests are in flight or held, clients).'''
+	selector = selectors.DefaultSelector()
+	message = b'["%s"]\n' % command.encode()
+	latencies = []
+	pending = []
+	clients = []
+	for _ in range(count):
+		client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		client.setblocking(False)
+		clients.append(client)
+		pending.append(client)
+
+	start_times = {}
+	replies = {}
+	while pending or len(latencies) < count:
+		# Connect (retrying while the listen backlog is full).
+		still_pending = []
+		for client in pending:
+			try:
+				client.connect(blankie.server.path)
+			except (BlockingIOError, InterruptedError):
+				still_pending.append(client)
+				continue
+			start_times[client] = time.perf_counter()
+			replies[client] = b''
+			client.sendall(message)
+			selector.register(client, selectors.EVENT_READ)
+		pending = still_pending
+
+		for key, _ in selector.select(timeout=0.01):
+			client = key.fileobj
+			data = client.recv(4096)
+			replies[client] += data
+			if replies[client] == expected or not data:
+				assert replies[client] == expected, replies[client]
+				latencies.append(time.perf_counter() - start_times[client])
+				selector.unregister(client)
+
+	threads = threading.active_count()
+	if not hold:
+		for client in clients:
+			client.close()
+	return latencies, threads, clients
+
+def report(name, latencies, threads):
+	latencies = sorted(latencies)
+	print('%-10s %8d %8d %10.2f %10.2f %10.2f' % (
+		name,
+		len(latencies),
+		threads,
+		statistics.median(latencies) * 1000,
+		latencies[int(len(latencies) * 0.99) - 1] * 1000,
+		latencies[-1] * 1000,
+	))
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	start_daemon()
+
+	print('%-10s %8s %8s %10s %10s %10s    (milliseconds)' % ('scenario', 'clients', 'threads', 'p50', 'p99', 'max'))
+	print('%-10s %8s %8d' % ('idle', '', threading.active_count()))
+
+	latencies, threads, _ = run_clients(count, 'ping', b'pong\n', hold=False)
+	report('ping', latencies, threads)
+
+	latencies, threads, clients = run_clients(count, 'wake-lock', b'Wake lock acquired.\n', hold=True)
+	report('wake-lock', latencies, threads)
+	assert len(blankie.wake_lock.holders) == count
+
+	for client in clients:
+		client.close()
+	while blankie.session.session_specs:
+		time.sleep(0.01)
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+# Benchmark: wake-lock acquire/release throughput.
+#
+# Run from a source checkout:
+#   PYTHONPATH=src python3 benchmarks/bench_wake_lock.py [CYCLES]
+#
+# Runs the server module in-process (with the event loop on its own
+# thread, like in the daemon), then acquires and releases a wake-lock
+# CYCLES times over the socket (as "blankie wake-lock" does), and
+# reports the time per cycle and the number of module instances the
+# daemon keeps, for:
+# - first:  no other wake-lock is held, so each cycle attaches and
+#           detaches the wake-lock session
+# - shared: another client holds a wake-lock throughout
+# - lease:  leases CYCLES wake-locks for five seconds each (over one
+#           pipelined connection), then waits for them to expire
+
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+
+tmp = tempfile.mkdtemp()
+os.environ['BLANKIE_RUN_DIR'] = tmp
+os.environ['BLANKIE_SOCKET'] = os.path.join(tmp, 'daemon.sock')
+
+import blankie
+import blankie.client
+
+def start_daemon():
+	blankie.module.module_dirs = [os.path.dirname(blankie.__file__) + '/modules']
+	for key in list(blankie.module.selectors):
+		if key != '30-sessions':
+			del blankie.module.selectors[key]
+	blankie.module.selectors['10-bench'] = lambda wanted_modules: wanted_modules.append(('server',))
+
+	started = threading.Event()
+
+	def run():
+		blankie.daemon.event_loop_thread = threading.current_thread()
+		blankie.module.update()
+		started.set()
+		blankie.daemon._event_loop.run()
+
+	threading.Thread(target=run, daemon=True).start()
+	started.wait()
+
+def acquire():
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.connect(blankie.server.path)
+	client.sendall(b'["wake-lock"]\n')
+	f = client.makefile('rb')
+	assert f.readline() == b'Wake lock acquired.\n'
+	return client, f
+
+def release(client, f):
+	# The daemon closes the connection once the wake-lock is released.
+	client.shutdown(socket.SHUT_WR)
+	assert f.read() == b''
+	f.close()
+	client.close()
+
+def run(cycles):
+	start = time.perf_counter()
+	for _ in range(cycles):
+		release(*acquire())
+	return time.perf_counter() - start
+
+def main():
+	cycles = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+	start_daemon()
+
+	print('%-8s %8s %14s %10s' % ('scenario', 'cycles', 'per cycle (us)', 'instances'))
+
+	elapsed = run(cycles)
+	print('%-8s %8d %14.1f %10d' % ('first', cycles, elapsed / cycles * 1e6, len(blankie.module.module_instances)))
+
+	holder = acquire()
+	elapsed = run(cycles)
+	print('%-8s %8d %14.1f %10d' % ('shared', cycles, elapsed / cycles * 1e6, len(blankie.module.module_instances)))
+	release(*holder)
+
+	start = time.perf_counter()
+	with blankie.client.Client() as client:
+		client.pipeline([['wake-lock-lease', 5]] * cycles)
+	elapsed = time.perf_counter() - start
+	threads = threading.active_count()
+	assert len(blankie.wake_lock.holders) == cycles
+	while blankie.wake_lock.holders:
+		time.sleep(0.01)
+	expired = time.perf_counter() - start
+	print('%-8s %8d %14.1f %10d    (%d threads; all expired after %.2f s)' % (
+		'lease', cycles, elapsed / cycles * 1e6, len(blankie.module.module_instances), threads, expired))
+
+if __name__ == '__main__':
+	main()
@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# Benchmark: cost of querying the X server's idle time.
+#
+# Run from a source checkout (needs Xvfb, xprintidle and python-xlib):
+#   PYTHONPATH=src python3 benchmarks/bench_x11_idle.py [QUERIES]
+#
+# Starts a private Xvfb server, then queries its idle time QUERIES times:
+# - subprocess: running xprintidle, as session.x11 used to
+# - in-process: X11Session.query_idle_time, over a persistent
+#               connection (MIT-SCREEN-SAVER QueryInfo)
+# - reconnect:  the same, closing the connection before each query
+#               (the cost of recovering from a broken connection)
+
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('BLANKIE_RUN_DIR', '/tmp/blankie-bench-%d' % os.getpid())
+
+import blankie
+import blankie.modules.session.x11
+
+def start_xvfb():
+	(read_fd, write_fd) = os.pipe()
+	process = subprocess.Popen(
+		['Xvfb', '-displayfd', str(write_fd), '-nolisten', 'tcp'],
+		pass_fds=(write_fd,),
+		stderr=subprocess.DEVNULL,
+	)
+	os.close(write_fd)
+	with os.fdopen(read_fd, 'rb') as f:
+		number = f.readline().strip()
+	if not number:
+		process.kill()
+		sys.exit('Xvfb failed to start.')
+	return (process, ':' + number.decode())
+
+def subprocess_query(display, count):
+	env = dict(os.environ, DISPLAY=display)
+	for _ in range(count):
+		int(subprocess.check_output(['xprintidle'], env=env))
+
+def in_process_query(display, count):
+	session = blankie.modules.session.x11.X11Session(display)
+	try:
+		for _ in range(count):
+			session.query_idle_time()
+	finally:
+		session.disconnect()
+
+def reconnect_query(display, count):
+	session = blankie.modules.session.x11.X11Session(display)
+	for _ in range(count):
+		session.query_idle_time()
+		session.disconnect()
+
+def main():
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+	(xvfb, display) = start_xvfb()
+	try:
+		print('%-12s %10s %12s %16s' % ('mode', 'queries', 'total (ms)', 'per query (us)'))
+		for name, func in (
+				('subprocess', subprocess_query),
+				('in-process', in_process_query),
+				('reconnect', reconnect_query),
+		):
+			start = time.perf_counter()
+			func(display, count)
+			elapsed = time.perf_counter() - start
+			print('%-12s %10d %12.1f %16.1f' % (name, count, elapsed * 1000, elapsed / count * 1e6))
+	finally:
+		xvfb.terminate()
+		xvfb.wait()
+
+if __name__ == '__main__':
+	main()
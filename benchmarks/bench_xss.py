@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+# Benchmark: memory use and start-up latency of the xss module.
+#
+# Run from a source checkout (needs Xvfb and python-xlib):
+#   PYTHONPATH=src python3 benchmarks/bench_xss.py [DISPLAYS]
+#
+# Starts DISPLAYS private Xvfb servers, then, in a fresh process for
+# each mode, starts the xss module for each of them and reports how
+# long that took, and how much memory (RSS) it added - counting that
+# of the helper processes, if any:
+# - in-process: the screen saver runs on the daemon's I/O thread
+# - helper:     one "python -m blankie.xss_helper" process per display
+
+import os
+import subprocess
+import sys
+import time
+
+os.environ.setdefault('BLANKIE_RUN_DIR', '/tmp/blankie-bench-%d' % os.getpid())
+
+def start_xvfb():
+	(read_fd, write_fd) = os.pipe()
+	process = subprocess.Popen(
+		['Xvfb', '-displayfd', str(write_fd), '-nolisten', 'tcp'],
+		pass_fds=(write_fd,),
+		stderr=subprocess.DEVNULL,
+	)
+	os.close(write_fd)
+	with os.fdopen(read_fd, 'rb') as f:
+		number = f.readline().strip()
+	if not number:
+		process.kill()
+		sys.exit('Xvfb failed to start.')
+	return (process, ':' + number.decode())
+
+def rss_kib(pid):
+	with open('/proc/%d/status' % pid) as f:
+		for line in f:
+			if line.startswith('VmRSS:'):
+				return int(line.split()[1])
+	return 0
+
+def measure(mode, displays):
+	'''Runs in the child process.'''
+	import blankie
+	import blankie.modules.session.x11
+	import blankie.modules.xss
+
+	blankie.module.update = lambda: None
+	blankie.modules.xss.XSSPerSessionModule.in_process = mode == 'in-process'
+
+	modules = []
+	baseline = rss_kib(os.getpid())
+	start = time.perf_counter()
+	for display in displays:
+		spec = ('session.x11', display)
+		blankie.module.module_instances[spec] = blankie.modules.session.x11.X11Session(display)
+		module = blankie.modules.xss.XSSPerSessionModule(spec)
+		module.start()
+		modules.append(module)
+	elapsed = time.perf_counter() - start
+
+	rss = rss_kib(os.getpid()) - baseline
+	rss += sum(rss_kib(module.xss_process.pid) for module in modules if module.xss_process is not None)
+	for module in modules:
+		module.stop()
+	print('%-12s %10d %16.1f %14d' % (mode, len(displays), elapsed / len(displays) * 1000, rss / len(displays)))
+
+def main():
+	if sys.argv[1:2] == ['--child']:
+		measure(sys.argv[2], sys.argv[3:])
+		return
+
+	count = int(sys.argv[1]) if len(sys.argv) > 1 else 4
+	servers = [start_xvfb() for _ in range(count)]
+	try:
+		displays = [display for _process, display in servers]
+		print('%-12s %10s %16s %14s' % ('mode', 'displays', 'start (ms/disp)', 'RSS (KiB/disp)'))
+		for mode in ('in-process', 'helper'):
+			subprocess.check_call([sys.executable, __file__, '--child', mode, *displays])
+	finally:
+		for process, _display in servers:
+			process.terminate()
+			process.wait()
+
+if __name__ == '__main__':
+	main()
@@ -15,7 +15,7 @@
       # module installed system-wide) are intentionally NOT included -
       # they must be installed on the host and found on PATH at runtime.
       runtimeDeps = pkgs: with pkgs; [
-        dunst procps systemd upower acpilight xprintidle
+        dunst procps systemd upower acpilight
         setxkbmap xset
       ];
     in
@@ -2,6 +2,7 @@
 # Receives events and manages X screen saver settings, power,
 # and the screen locker.
 
+import importlib
 import math
 import os
 import sys
@@ -47,12 +48,14 @@ state = State()
 #   cannot become idle, no matter how much time will pass.
 # - -math.inf: when the system is about to go to sleep
 #   (or otherwise be incapacitated)
+# The value is the same for the whole event loop task, unless sessions
+# are invalidated (see blankie.idle).
 def get_idle_since():
-	if state.sleeping:
-		return -math.inf
+	import blankie.idle
+	return blankie.idle.get_idle_since()
 
-	sessions = blankie.session.get_sessions()
-	idle_times = [session.get_idle_since() for session in sessions]
+# Combine the get_idle_since results of all sessions.
+def combine_idle_times(idle_times):
 	idle_times = list(filter(lambda t: not math.isnan(t), idle_times))
 
 	if not idle_times:
@@ -74,6 +77,10 @@ def get_idle_since():
 # for the entire duration it's running.
 
 def lock():
+	import blankie.config
+	import blankie.events
+	if not state.locked:
+		blankie.events.emit('locked')
 	state.locked = True
 	blankie.config.reconfigure()
 
@@ -81,6 +88,11 @@ def lock():
 unlock_notification_fds = []
 
 def unlock():
+	import blankie.config
+	import blankie.events
+	import blankie.session
+	if state.locked:
+		blankie.events.emit('unlocked')
 	state.locked = False
 
 	# Ensure we don't try to immediately relock / go to sleep
@@ -107,127 +119,27 @@ class UserError(Exception):
 
 # -----------------------------------------------------------------------------
 # Import Blankie modules
-# Placed after the declarations above, so that they can be used by the
-# imported modules.
 
-import blankie.config
-import blankie.daemon
-import blankie.server
-import blankie.module
-import blankie.session
-from blankie.logging import log
+# The modules making up the daemon are imported on first use, rather
+# than here: client commands (see blankie.cli) only need to talk to
+# the daemon's socket, and should start as quickly as possible.
+# Accessing any of them (e.g. blankie.module) imports all of them,
+# as they register their module selectors when imported.  (Functions
+# above import the ones they use, as they run in the daemon, where
+# these are all imported already.)
 
-# -----------------------------------------------------------------------------
-# Core functionality: run core modules
-
-is_systemd = False
-try:
-	is_systemd = os.readlink('/bin/init').endswith('/systemd')
-except Exception:
-	pass
-if is_systemd:
-	log.debug('Detected systemd - enabling systemd-logind integration')
-
-def core_selector(wanted_modules):
-	wanted_modules.extend([
-		# Receives commands / events from other processes.
-		('server', ),
-
-		# Receives events from other instances.
-		('remote_receiver', ),
-
-		# Receives idle / unidle events from X.
-		# Required for X11 sessions to work properly.
-		('xss', ),
-
-		# Monitors TTY device timestamps.
-		# Required for TTY sessions to work properly.
-		('tty_idle', ),
-	])
-	if is_systemd:
-		wanted_modules.append(
-			# Connects to D-Bus to intercept the system going to sleep.
-			# Required to reliably lock the system first.
-			('logind',)
-		)
+_core_modules = ('config', 'daemon', 'events', 'idle', 'server', 'module', 'session', 'snapshot', 'stats', 'wake_lock', 'watchdog')
 
-blankie.module.selectors['10-core'] = core_selector
+def __getattr__(name):
+	if name in _core_modules:
+		for module_name in _core_modules:
+			importlib.import_module('blankie.' + module_name)
+		return sys.modules['blankie.' + name]
+	raise AttributeError('module %r has no attribute %r' % (__name__, name))
 
 # -----------------------------------------------------------------------------
 # Entry point
 
 def main():
-	args = sys.argv[1:]
-
-	help_text = '''
-Usage: blankie COMMAND
-
-Commands:
-  help         Print this message.
-  start        Start the blankie daemon.
-  stop         Stop the blankie daemon.
-  status       Print the current status.
-  reload       Reload the configuration.
-  lock         Lock the system now.
-  unlock       Unlock the system now.
-  wake-lock    Inhibit locking and suspend until this command exits.
-  attach       Attach to the current session.
-  detach       Detach from the current session.
-'''
-
-	if not args:
-		sys.stderr.write(help_text)
-		return 2
-
-	try:
-		os.makedirs(run_dir, exist_ok=True)
-		blankie.config.load()
-
-		match args[0]:
-			case 'help':
-				sys.stdout.write(help_text)
-
-			case 'start':
-				ret = blankie.daemon.start()
-				if ret != 0:
-					return ret
-
-				session_spec = blankie.session.get_session()
-				if session_spec is not None:
-					log.info('Automatically attaching to current session %s.', session_spec)
-					blankie.session.remote_attach_or_detach(True, session_spec)
-
-			# Undocumented, meant for debugging.
-			case 'debug-run-in-foreground':
-				return blankie.daemon.start(fork=False)
-
-			case 'stop':
-				blankie.daemon.stop_remote()
-
-			case 'reload':
-				blankie.server.notify(*args)
-
-			case 'status' | 'lock' | 'unlock':
-				sys.stdout.buffer.write(blankie.server.query(*args))
-
-			case 'wake-lock':
-				if len(args) != 1:
-					raise UserError('wake-lock does not accept arguments.')
-				blankie.server.wake_lock()
-
-			case 'attach' | 'detach':
-				blankie.session.remote_attach_or_detach(args[0] == 'attach')
-
-			# Internal commands:
-			case 'module':
-				blankie.module.cli_command(args[1:])
-
-			case _:
-				log.critical('Unknown command: %r', args[0])
-				return 1
-
-		return 0
-
-	except UserError as e:
-		log.critical('Fatal error: %s', e)
-		return 1
+	import blankie.cli
+	return blankie.cli.main()
@@ -0,0 +1,200 @@
+# blankie.cli - command-line entry point
+# Most commands are clients, which only send a command to the daemon's
+# socket.  These run often (e.g. "blankie attach" from shell start-up
+# files, or "blankie status" from status bars), so they avoid
+# importing the daemon's modules or evaluating the configuration.
+
+import os
+import sys
+import time
+
+import blankie
+import blankie.detect
+import blankie.server
+from blankie.logging import log
+
+help_text = '''
+Usage: blankie COMMAND [OPTIONS]
+
+Commands:
+  help         Print this message.
+  start        Start the blankie daemon.
+  stop         Stop the blankie daemon.
+  status       Print the current status (add --json for JSON).
+  stats        Print event loop statistics.
+  reload       Reload the configuration.
+  lock         Lock the system now.
+  unlock       Unlock the system now.
+  wake-lock    Inhibit locking and suspend until this command exits.
+               Use --reason TEXT to say why (shown by "status").
+               With --for SECONDS, lease a wake-lock instead: print
+               its ID and exit; the daemon releases it after SECONDS.
+  wake-lock-renew ID [--for SECONDS]
+               Extend a wake-lock lease (by default, by its duration).
+  wake-lock-release ID
+               Release a wake-lock lease now.
+  watch        Print state changes (as lines of JSON) as they happen.
+  attach [SESSION...]
+               Attach to the current session, or to the given one
+               (e.g. "session.input" for the input devices).
+  detach [SESSION...]
+               Detach from the current (or given) session.
+'''
+
+# Ask the Blankie daemon to attach/detach to/from the given session that the
+# current process is running in.
+def remote_attach_or_detach(do_attach, session_spec=None):
+	if session_spec is None:
+		session_spec = blankie.detect.get_session()
+	if session_spec is None:
+		raise blankie.UserError('No session detected.')
+	result = blankie.server.query('attach' if do_attach else 'detach', *session_spec)
+	if result == b'ok':
+		log.info('Attached to %r' if do_attach else 'Detached from %r', session_spec)
+	else:
+		log.critical('Failed to %s %r: %s',
+					 'attach to' if do_attach else 'detach from',
+					 session_spec, result)
+
+def stop_remote():
+	'''Connects to the daemon, tells it to stop, and waits for it to exit.'''
+	pid_file = blankie.server.pid_file
+	if not os.path.exists(pid_file):
+		log.critical('PID file %r does not exist - daemon not running?', pid_file)
+		sys.exit(2)
+
+	with open(pid_file, 'rb') as f:
+		daemon_pid = int(f.read())
+	log.debug('Stopping daemon (PID %d)...', daemon_pid)
+	blankie.server.notify('stop')
+	while True:
+		try:
+			os.kill(daemon_pid, 0)
+			time.sleep(0.1)  # Still running
+		except ProcessLookupError:
+			break
+	log.info('Daemon stopped.')
+
+def parse_options(args, names, usage):
+	'''Parse "--name value" pairs, returning a dict.'''
+	if len(args) % 2 or any(name not in names for name in args[::2]):
+		raise blankie.UserError('Usage: ' + usage)
+	return dict(zip(args[::2], args[1::2]))
+
+def parse_duration(value):
+	try:
+		return float(value)
+	except ValueError:
+		raise blankie.UserError('Invalid duration: %r' % (value,))
+
+def parse_lease_id(value):
+	try:
+		return int(value)
+	except ValueError:
+		raise blankie.UserError('Invalid wake-lock lease ID: %r' % (value,))
+
+# Run a command, reporting errors from the daemon.
+def call(*args):
+	import blankie.client
+	with blankie.client.Client() as client:
+		return client.call(*args)
+
+# Commands which run without loading the configuration.
+def client_command(args):
+	match args[0]:
+		case 'help':
+			sys.stdout.write(help_text)
+
+		case 'stop':
+			stop_remote()
+
+		case 'reload':
+			blankie.server.notify(*args)
+
+		case 'status' | 'stats' | 'lock' | 'unlock':
+			sys.stdout.buffer.write(blankie.server.query(*args))
+
+		case 'wake-lock':
+			options = parse_options(args[1:], ('--for', '--reason'), 'blankie wake-lock [--for SECONDS] [--reason TEXT]')
+			if '--for' in options:
+				duration = parse_duration(options['--for'])
+				reason = [options['--reason']] if '--reason' in options else []
+				sys.stdout.write(call('wake-lock-lease', duration, *reason))
+			elif '--reason' in options:
+				blankie.server.wake_lock(options['--reason'])
+			else:
+				blankie.server.wake_lock()
+
+		case 'wake-lock-renew':
+			usage = 'blankie wake-lock-renew ID [--for SECONDS]'
+			if len(args) < 2:
+				raise blankie.UserError('Usage: ' + usage)
+			options = parse_options(args[2:], ('--for',), usage)
+			duration = [parse_duration(options['--for'])] if '--for' in options else []
+			sys.stdout.write(call('wake-lock-renew', parse_lease_id(args[1]), *duration))
+
+		case 'wake-lock-release':
+			if len(args) != 2:
+				raise blankie.UserError('Usage: blankie wake-lock-release ID')
+			sys.stdout.write(call('wake-lock-release', parse_lease_id(args[1])))
+
+		case 'watch':
+			if len(args) != 1:
+				raise blankie.UserError('watch does not accept arguments.')
+			blankie.server.watch()
+
+		case 'attach' | 'detach':
+			remote_attach_or_detach(args[0] == 'attach', tuple(args[1:]) or None)
+
+		case _:
+			return None
+
+	return 0
+
+# Commands which need the configuration (and the daemon's modules).
+def daemon_command(args):
+	os.makedirs(blankie.run_dir, exist_ok=True)
+	blankie.config.load()
+
+	match args[0]:
+		case 'start':
+			ret = blankie.daemon.start()
+			if ret != 0:
+				return ret
+
+			session_spec = blankie.detect.get_session()
+			if session_spec is not None:
+				log.info('Automatically attaching to current session %s.', session_spec)
+				remote_attach_or_detach(True, session_spec)
+
+		# Undocumented, meant for debugging.
+		case 'debug-run-in-foreground':
+			return blankie.daemon.start(fork=False)
+
+		# Internal commands:
+		case 'module':
+			blankie.module.cli_command(args[1:])
+
+	return 0
+
+def main():
+	args = sys.argv[1:]
+
+	if not args:
+		sys.stderr.write(help_text)
+		return 2
+
+	try:
+		ret = client_command(args)
+		if ret is not None:
+			return ret
+
+		if args[0] in ('start', 'debug-run-in-foreground', 'module'):
+			return daemon_command(args)
+
+		log.critical('Unknown command: %r', args[0])
+		return 1
+
+	except blankie.UserError as e:
+		log.critical('Fatal error: %s', e)
+		return 1
@@ -0,0 +1,171 @@
+# blankie.client - library for talking to the daemon
+# Keeps one connection to the daemon's socket open, and sends any
+# number of commands over it, without waiting for the replies to
+# earlier ones ("pipelining").  Meant for programs which query the
+# daemon often, such as status bars, for which connecting (and
+# starting a process) per command is comparatively expensive.
+#
+# Uses the framed protocol: each request is a line
+#   {"id": ID, "command": [COMMAND, ARGS...]}
+# and is answered by a line
+#   {"id": ID, "result": TEXT}  or  {"id": ID, "error": TEXT}
+# (see blankie.modules.server).  A wake-lock acquired over such a
+# connection is held until the connection is closed.
+#
+# Example:
+#   with blankie.client.Client() as client:
+#       print(client.call('status'))
+#       (pong, status) = client.pipeline([['ping'], ['status']])
+
+import itertools
+import json
+import socket
+
+import blankie
+import blankie.server
+
+class Error(blankie.UserError):
+	'''The daemon failed to execute a command.'''
+	pass
+
+def _connect_error(path, error):
+	return blankie.UserError('Failed to connect to daemon UNIX socket at %r (%s). Is the blankie daemon running?' %
+							 (path, error))
+
+def _encode(request_id, command):
+	return json.dumps({'id': request_id, 'command': list(command)}).encode() + b'\n'
+
+def _decode(line):
+	'''Return (request ID, result or Error).'''
+	reply = json.loads(line)
+	if 'error' in reply:
+		return reply.get('id'), Error(reply['error'])
+	return reply.get('id'), reply['result']
+
+class Client:
+	'''A blocking client.  Not thread-safe.'''
+
+	def __init__(self, path=None):
+		self.path = path or blankie.server.path
+		self.ids = itertools.count(1)
+		# Replies received while waiting for another one.
+		self.replies = {}
+
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			self.socket.connect(self.path)
+		except (FileNotFoundError, ConnectionRefusedError) as e:
+			self.socket.close()
+			raise _connect_error(self.path, e)
+		self.file = self.socket.makefile('rb')
+
+	def send(self, *command):
+		'''Send a command without waiting for its reply; return the
+		request ID to pass to receive().'''
+		request_id = next(self.ids)
+		self.socket.sendall(_encode(request_id, command))
+		return request_id
+
+	def receive(self, request_id):
+		'''Wait for the reply to a request sent with send(), and return
+		its result.  Raises Error if the command failed.'''
+		while request_id not in self.replies:
+			line = self.file.readline()
+			if not line.endswith(b'\n'):
+				raise blankie.UserError('Connection to the daemon closed.')
+			(reply_id, result) = _decode(line)
+			self.replies[reply_id] = result
+		result = self.replies.pop(request_id)
+		if isinstance(result, Error):
+			raise result
+		return result
+
+	def call(self, *command):
+		'''Run a command, and return its result.'''
+		return self.receive(self.send(*command))
+
+	def pipeline(self, commands):
+		'''Run several commands, sending all of them before waiting for
+		the replies; return the list of results.'''
+		request_ids = [self.send(*command) for command in commands]
+		return [self.receive(request_id) for request_id in request_ids]
+
+	def close(self):
+		self.file.close()
+		self.socket.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+class AsyncClient:
+	'''An asyncio client.  Commands may be run concurrently from
+	several tasks.  Create with "await AsyncClient.connect()".'''
+
+	def __init__(self, reader, writer):
+		import asyncio
+
+		self.reader = reader
+		self.writer = writer
+		self.ids = itertools.count(1)
+		# Futures of requests waiting for a reply, by request ID.
+		self.pending = {}
+		self.reader_task = asyncio.get_running_loop().create_task(self.read_replies())
+
+	@classmethod
+	async def connect(cls, path=None):
+		import asyncio
+
+		path = path or blankie.server.path
+		try:
+			(reader, writer) = await asyncio.open_unix_connection(path)
+		except (FileNotFoundError, ConnectionRefusedError) as e:
+			raise _connect_error(path, e)
+		return cls(reader, writer)
+
+	async def read_replies(self):
+		try:
+			while True:
+				line = await self.reader.readline()
+				if not line.endswith(b'\n'):
+					break
+				(reply_id, result) = _decode(line)
+				future = self.pending.pop(reply_id, None)
+				if future is None or future.done():
+					continue
+				if isinstance(result, Error):
+					future.set_exception(result)
+				else:
+					future.set_result(result)
+		finally:
+			for future in self.pending.values():
+				if not future.done():
+					future.set_exception(blankie.UserError('Connection to the daemon closed.'))
+			self.pending.clear()
+
+	async def call(self, *command):
+		'''Run a command, and return its result.'''
+		if self.reader_task.done():
+			raise blankie.UserError('Connection to the daemon closed.')
+		request_id = next(self.ids)
+		future = self.reader_task.get_loop().create_future()
+		self.pending[request_id] = future
+		self.writer.write(_encode(request_id, command))
+		await self.writer.drain()
+		return await future
+
+	async def close(self):
+		self.writer.close()
+		try:
+			await self.writer.wait_closed()
+		except OSError:
+			pass
+		await self.reader_task
+
+	async def __aenter__(self):
+		return self
+
+	async def __aexit__(self, *exc_info):
+		await self.close()
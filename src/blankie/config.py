@@ -14,6 +14,13 @@ module = None
 
 class Configurator:
 	def __init__(self):
+		# Incremented to force re-evaluation of the configuration (see
+		# invalidate()).
+		self.generation = 0
+
+		# selector_inputs() as of the last evaluation, or None.
+		self.evaluated_inputs = None
+
 		self.reset()
 
 	def reset(self):
@@ -22,6 +29,16 @@ class Configurator:
 		self.idle_timers = []
 		self.bus_key = None
 
+		# Arguments of all is_idle_for() calls.
+		self.idle_checks = []
+
+	# Request that the configuration is re-evaluated on the next
+	# update(), even if the inputs which we track did not change.
+	# Must be called when anything else the configuration may depend
+	# on (such as the power state) changes.
+	def invalidate(self):
+		self.generation += 1
+
 	# Re-evaluate the configuration and update our state to match.
 	def evaluate(self):
 		log.debug('Reconfiguring.')
@@ -44,11 +61,33 @@ class Configurator:
 			s.add(timeout)
 		return sorted(s)
 
+	def selector_inputs(self):
+		'''Summarizes the state which the configuration was evaluated
+		against: if this does not change, neither will the outcome of
+		re-evaluating it.'''
+		idle_time = time.time() - blankie.get_idle_since()
+		return (
+			self.generation,
+			# The attached sessions (see blankie.session.attach).
+			blankie.session.generation,
+			blankie.state.locked,
+			blankie.state.sleeping,
+			idle_time >= 0,
+			# The result of each is_idle_for() call.
+			tuple(idle_seconds < idle_time for idle_seconds in self.idle_checks),
+		)
+
+	def inputs_changed(self):
+		'''Return True if re-evaluating the configuration may change its
+		outcome, e.g. because an is_idle_for() threshold was crossed.'''
+		return self.selector_inputs() != self.evaluated_inputs
+
 	def selector(self, wanted_modules):
 		'''Module selector which applies the user's configuration.'''
 
 		# Re-run the user configuration function
 		self.evaluate()
+		self.evaluated_inputs = self.selector_inputs()
 
 		schedule = self.get_schedule()
 
@@ -68,11 +107,6 @@ class Configurator:
 		# User-configured modules:
 		wanted_modules.extend(self.modules)
 
-	def print_status(self, f):
-		'''Used in 'blankie status' command.'''
-		f.write(b'Configuration-requested modules:\n')
-		f.write(b''.join(b'- %r\n' % (spec,) for spec in self.modules))
-
 	# Public API follows:
 
 	def run_module(self, module_name, *parameters):
@@ -89,6 +123,7 @@ class Configurator:
 		is idle for at least this many seconds.'''
 		if not isinstance(idle_seconds, int) or idle_seconds <= 0:
 			raise blankie.UserError('Invalid idle time - must be a positive integer')
+		self.idle_checks.append(idle_seconds)
 		idle_time = time.time() - blankie.get_idle_since()
 		if idle_seconds < idle_time:
 			return True
@@ -104,7 +139,10 @@ class Configurator:
 
 
 configurator = Configurator()
-blankie.module.selectors['20-config'] = configurator.selector
+blankie.module.selectors['20-config'] = blankie.module.Selector(
+	configurator.selector,
+	configurator.selector_inputs,
+)
 
 # (Re-)Load the configuration file.
 def load():
@@ -118,6 +156,10 @@ def load():
 		[d + '/blankie/modules' for d in config_dirs] +
 		[os.path.dirname(__file__) + '/modules']
 	)
+	# Pick up any added or removed module files.
+	blankie.module.module_files = None
+
+	configurator.invalidate()
 
 	for config_file in config_files:
 		if os.path.exists(config_file):
@@ -142,4 +184,5 @@ def reload():
 
 # Re-evaluate the configuration and update our state to match.
 def reconfigure():
+	configurator.invalidate()
 	blankie.module.update()
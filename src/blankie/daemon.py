@@ -1,40 +1,285 @@
 # blankie.daemon - Daemon event queue and lifecycle
 
 import atexit
+import collections
 import contextlib
+import heapq
+import itertools
 import os
-import queue
 import signal
 import sys
 import threading
 import time
 
 import blankie
+import blankie.config
+import blankie.ioloop
+import blankie.module
 import blankie.server
+import blankie.session
+import blankie.stats
+import blankie.watchdog
 from blankie.logging import log
 
 # Daemon's PID file.
-pid_file = blankie.run_dir + '/daemon.pid'
+pid_file = blankie.server.pid_file
+
+# Maximum number of tasks waiting in the event queue before threads
+# posting further tasks are made to wait (0 means unbounded).  Can be
+# changed from the configuration file.
+max_queue_size = 0
+
+# How long (in seconds) a thread may be made to wait for room in the
+# event queue.  After that, the task is queued anyway: a producer
+# which the event loop is itself waiting on must not be dead-locked.
+# The shared I/O thread (see blankie.ioloop) and coalesced calls never
+# wait.
+backpressure_timeout = 0.5
+
+# Tasks which take longer than this many seconds to run are logged
+# (and counted in "blankie stats").  Can be changed from the
+# configuration file.
+slow_task_threshold = 0.5
+
+# By how many seconds timers may be delayed, so that timers due at
+# around the same time fire together, with a single wake-up.  Applies
+# to timers which do not specify their own slack.  Can be changed from
+# the configuration file (e.g. when running on battery).
+timer_slack = 0
+
+# Clock used for timer deadlines.  Unlike CLOCK_MONOTONIC,
+# CLOCK_BOOTTIME keeps counting while the system is suspended, so
+# timers which should have fired during the suspension are run as soon
+# as the event loop wakes up after it.
+if hasattr(time, 'CLOCK_BOOTTIME'):
+	def clock():
+		return time.clock_gettime(time.CLOCK_BOOTTIME)
+else:
+	clock = time.monotonic
+
+class TimerHandle:
+	'''Returned by call_later().  Can be used to cancel or reschedule
+	the call.'''
+
+	def __init__(self, event_loop, func, args, kwargs, slack):
+		self.event_loop = event_loop
+		self.func = func
+		self.args = args
+		self.kwargs = kwargs
+		self.slack = slack
+
+		# Point in time (per clock()) when the timer is due.
+		self.deadline = None
+
+		# Sequence number of this handle's live entry in the event
+		# loop's timer heap, or None if the timer is not scheduled.
+		self.seq = None
+
+	def active(self):
+		'''Return True if the timer is scheduled and has not yet fired.'''
+		return self.seq is not None
+
+	def cancel(self):
+		'''Prevent the call from happening, if it has not yet.'''
+		with self.event_loop.lock:
+			if self.seq is not None:
+				self.seq = None
+				self.event_loop.live_timers -= 1
+
+	def reschedule(self, delay):
+		'''(Re-)schedule the call to happen after delay seconds, even if
+		it was already done or cancelled.'''
+		self.event_loop.schedule(self, delay)
+
+	def __repr__(self):
+		return '<TimerHandle %r at %r>' % (self.func, self.deadline)
 
 class EventLoop:
-	queue = None
-
 	stopping = False
 
-	def __init__(self):
-		self.queue = queue.Queue()
+	# Thread running the event loop.
+	thread = None
+
+	# (number, func, start_time) of the task which is currently
+	# running, or None.  Read by the watchdog.
+	current = None
 
-	def call(self, func, *args, **kwargs):
-		'''Enqueue a function and call it from the main event loop.'''
-		task = (func, args, kwargs)
-		self.queue.put(task)
+	# (task kind, duration so far, time) of the last stall detected
+	# by the watchdog, or None.
+	last_stall = None
+
+	def __init__(self):
+		self.lock = threading.Lock()
+		self.not_empty = threading.Condition(self.lock)
+		self.not_full = threading.Condition(self.lock)
+
+		# Pending tasks, in order.  Each task is a list of [func,
+		# args, kwargs, coalesce_key, enqueue_time, depth], so that
+		# coalesced calls can update it in place.
+		self.queue = collections.deque()
+
+		# Coalescing key -> pending task.
+		self.pending = {}
+
+		# Counters, shown in 'blankie status'.
+		self.stats = {
+			'posted': 0,     # call() invocations
+			'coalesced': 0,  # ... merged into an already pending task
+			'throttled': 0,  # ... which had to wait for room in the queue
+			'overflow': 0,   # ... which were queued without waiting when it was full
+			'executed': 0,   # tasks which were run
+			'max_depth': 0,  # high-water mark of the queue length
+			'slow': 0,       # tasks which ran for over slow_task_threshold
+			'stalls': 0,     # tasks which the watchdog found to be stuck
+		}
+
+		# Task kind -> blankie.stats.TaskStats.
+		# Only accessed from the event loop thread.
+		self.task_stats = {}
+
+		# Heap of scheduled timers: (deadline, seq, TimerHandle).
+		# Entries whose seq does not match the handle's are stale
+		# (cancelled or rescheduled), and are discarded lazily.
+		self.timers = []
+		# The same timers, by the latest time they may fire at
+		# (deadline + slack), which is when we need to wake up.
+		self.timer_limits = []
+		self.timer_seq = itertools.count()
+		# Number of scheduled timers (i.e. of live entries in each
+		# heap).
+		self.live_timers = 0
+
+	def call(self, func, *args, coalesce_key=None, merge=None, **kwargs):
+		'''Enqueue a function and call it from the main event loop.
+
+		If coalesce_key is not None and a task with the same key is
+		still waiting to run, no new task is queued; instead, the
+		pending task keeps its place in the queue and is updated to
+		call func with the latest arguments.  If merge is given, it is
+		called as merge((old_args, old_kwargs), (args, kwargs)) and
+		should return the (args, kwargs) to call func with.'''
+		with self.lock:
+			self.stats['posted'] += 1
+
+			if coalesce_key is not None:
+				task = self.pending.get(coalesce_key)
+				if task is not None:
+					if merge is not None:
+						(args, kwargs) = merge((task[1], task[2]), (args, kwargs))
+					task[0:3] = [func, args, kwargs]
+					self.stats['coalesced'] += 1
+					return
+
+			# Apply backpressure to noisy producers.  Never block the
+			# event loop itself, which is the only consumer, nor the
+			# I/O thread, which must not block (all sockets would stall
+			# with it).  Coalesced calls cannot flood the queue (there
+			# is at most one per key), so they do not wait either.
+			if max_queue_size > 0 and len(self.queue) >= max_queue_size and not is_main_thread():
+				if coalesce_key is not None or blankie.ioloop.in_thread():
+					self.stats['overflow'] += 1
+				else:
+					self.stats['throttled'] += 1
+					self.not_full.wait_for(
+						lambda: len(self.queue) < max_queue_size,
+						timeout=backpressure_timeout,
+					)
+
+			task = [func, args, kwargs, coalesce_key, time.monotonic(), len(self.queue)]
+			self.queue.append(task)
+			if coalesce_key is not None:
+				self.pending[coalesce_key] = task
+			self.stats['max_depth'] = max(self.stats['max_depth'], len(self.queue))
+			self.not_empty.notify()
+
+	def call_later(self, delay, func, *args, slack=None, **kwargs):
+		'''Call a function from the main event loop after delay seconds.
+
+		The call may be delayed by up to slack seconds (timer_slack if
+		None), to allow it to happen together with other work.
+		Returns a TimerHandle.'''
+		handle = TimerHandle(self, func, args, kwargs, slack)
+		self.schedule(handle, delay)
+		return handle
+
+	def schedule(self, handle, delay):
+		with self.lock:
+			if handle.seq is None:
+				self.live_timers += 1
+			handle.deadline = clock() + delay
+			handle.seq = next(self.timer_seq)
+			slack = timer_slack if handle.slack is None else handle.slack
+			heapq.heappush(self.timers, (handle.deadline, handle.seq, handle))
+			heapq.heappush(self.timer_limits, (handle.deadline + slack, handle.seq, handle))
+			# Drop stale entries, once they are the majority.
+			if len(self.timer_limits) > 16 and len(self.timer_limits) > 2 * self.live_timers:
+				self.timers = [entry for entry in self.timers if entry[2].seq == entry[1]]
+				self.timer_limits = [entry for entry in self.timer_limits if entry[2].seq == entry[1]]
+				heapq.heapify(self.timers)
+				heapq.heapify(self.timer_limits)
+			# The event loop may need to wake up earlier.
+			self.not_empty.notify()
+
+	def queue_due_timers(self):
+		'''Move timers which are due to the task queue.  Return the
+		number of seconds until we need to check again (or None).'''
+		now = clock()
+		while self.timers and self.timers[0][0] <= now:
+			(deadline, seq, handle) = heapq.heappop(self.timers)
+			if handle.seq != seq:
+				continue  # Cancelled or rescheduled
+			handle.seq = None
+			self.live_timers -= 1
+			self.queue.append([
+				handle.func, handle.args, handle.kwargs, None,
+				# Count lateness as time spent in the queue.
+				time.monotonic() - (now - deadline),
+				len(self.queue),
+			])
+
+		# Both heaps are cleaned up lazily, so each entry is popped
+		# at most once.
+		while self.timer_limits and self.timer_limits[0][2].seq != self.timer_limits[0][1]:
+			heapq.heappop(self.timer_limits)
+		if not self.timer_limits:
+			return None
+		return max(self.timer_limits[0][0] - now, 0)
+
+	def get(self):
+		'''Wait for and dequeue the next task.'''
+		with self.lock:
+			while True:
+				# Run due timers whenever we are awake anyway, even if
+				# they are still within their slack.
+				timeout = self.queue_due_timers()
+				if self.queue:
+					break
+				self.not_empty.wait(timeout)
+			task = self.queue.popleft()
+			if task[3] is not None:
+				# From now on, calls with this key queue a new task.
+				del self.pending[task[3]]
+			self.not_full.notify()
+			return task
+
+	def empty(self):
+		with self.lock:
+			return not self.queue
+
+	def depth(self):
+		'''Return the number of tasks waiting to run.'''
+		with self.lock:
+			return len(self.queue)
 
 	def run(self):
 		log.debug('Starting event loop.')
-		while not self.stopping or not self.queue.empty():
-			task = self.queue.get()
-			(func, args, kwargs) = task
+		self.thread = threading.current_thread()
+		while not self.stopping or not self.empty():
+			(func, args, kwargs, _coalesce_key, enqueue_time, depth) = self.get()
+			self.stats['executed'] += 1
 			log.debug('Calling %r with %r / %r', func, args, kwargs)
+			start_time = time.monotonic()
+			self.current = (self.stats['executed'], func, start_time)
 			try:
 				func(*args, **kwargs)
 			except Exception:
@@ -42,9 +287,40 @@ class EventLoop:
 				# would leave the system unmanaged, and would strand
 				# queued tasks (and any threads waiting on them).
 				log.exception('Unhandled error in event task %r:', func)
+			finally:
+				self.current = None
+			self.record(func, enqueue_time, start_time, time.monotonic(), depth)
+
+	def get_task_stats(self, kind):
+		task_stats = self.task_stats.get(kind)
+		if task_stats is None:
+			task_stats = self.task_stats[kind] = blankie.stats.TaskStats()
+		return task_stats
+
+	def record(self, func, enqueue_time, start_time, end_time, depth):
+		kind = blankie.stats.task_kind(func)
+		task_stats = self.get_task_stats(kind)
+		task_stats.latency.add(start_time - enqueue_time)
+		task_stats.duration.add(end_time - start_time)
+		task_stats.depth.add(depth)
+
+		if end_time - start_time > slow_task_threshold:
+			task_stats.slow += 1
+			self.stats['slow'] += 1
+			log.warning('Slow event task: %s took %.3f s (waited %.3f s in the queue).',
+						kind, end_time - start_time, start_time - enqueue_time)
+
+	def record_stall(self, kind, duration):
+		'''Called by the watchdog (on its own thread) when a task has
+		been running for too long.'''
+		with self.lock:
+			self.get_task_stats(kind).stalls += 1
+			self.stats['stalls'] += 1
+			self.last_stall = (kind, duration, time.time())
 
 _event_loop = EventLoop()
 call = _event_loop.call
+call_later = _event_loop.call_later
 
 
 # Thread that the event loop is running in.
@@ -69,6 +345,46 @@ def sighup(signalnum, _frame):
 	call(blankie.config.reload)
 
 
+# -----------------------------------------------------------------------------
+# Core functionality: run core modules
+
+is_systemd = False
+try:
+	is_systemd = os.readlink('/bin/init').endswith('/systemd')
+except Exception:
+	pass
+if is_systemd:
+	log.debug('Detected systemd - enabling systemd-logind integration')
+
+def core_selector(wanted_modules):
+	wanted_modules.extend([
+		# Receives commands / events from other processes.
+		('server', ),
+
+		# Publishes the state for other processes to read.
+		('state_file', ),
+
+		# Receives events from other instances.
+		('remote_receiver', ),
+
+		# Receives idle / unidle events from X.
+		# Required for X11 sessions to work properly.
+		('xss', ),
+
+		# Monitors TTY device timestamps.
+		# Required for TTY sessions to work properly.
+		('tty_idle', ),
+	])
+	if is_systemd:
+		wanted_modules.append(
+			# Connects to D-Bus to intercept the system going to sleep.
+			# Required to reliably lock the system first.
+			('logind',)
+		)
+
+blankie.module.selectors['10-core'] = core_selector
+
+
 def shutdown_selector(wanted_modules):
 	wanted_modules.clear()
 
@@ -124,6 +440,9 @@ def start(fork=True):
 		assert event_loop_thread is None
 		event_loop_thread = threading.current_thread()
 
+		# Detect and report stalls of the event loop.
+		blankie.watchdog.start(_event_loop)
+
 		# Start on-boot modules.
 		blankie.config.reconfigure()
 
@@ -184,21 +503,3 @@ def stop():
 	except Exception:
 		log.exception('Error during shutdown (continuing to exit):')
 
-
-def stop_remote():
-	'''Connects to the daemon, tells it to stop, and waits for it to exit.'''
-	if not os.path.exists(pid_file):
-		log.critical('PID file %r does not exist - daemon not running?', pid_file)
-		sys.exit(2)
-
-	with open(pid_file, 'rb') as f:
-		daemon_pid = int(f.read())
-	log.debug('Stopping daemon (PID %d)...', daemon_pid)
-	blankie.server.notify('stop')
-	while True:
-		try:
-			os.kill(daemon_pid, 0)
-			time.sleep(0.1)  # Still running
-		except ProcessLookupError:
-			break
-	log.info('Daemon stopped.')
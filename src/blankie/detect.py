@@ -0,0 +1,24 @@
+# blankie.detect - detection of the invoking process's session
+# Only depends on the standard library, so that client commands (see
+# blankie.cli) can use it without importing the daemon's modules.  The
+# session modules refer to it too, so that the detection of each
+# session type lives in one place.
+
+import os
+import sys
+
+def get_x11_session():
+	if 'DISPLAY' in os.environ:
+		return ('session.x11', os.environ['DISPLAY'])
+	return None
+
+def get_tty_session():
+	try:
+		return ('session.tty', os.ttyname(sys.stderr.fileno()))
+	except Exception:
+		return None
+
+# Returns a module spec suitable for attaching to the invoking
+# process's session, or None.  X11 sessions take precedence.
+def get_session():
+	return get_x11_session() or get_tty_session()
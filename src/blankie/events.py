@@ -0,0 +1,36 @@
+# blankie.events - notifications of state changes
+# Parts of the daemon report changes (the system being locked or
+# unlocked, sessions being attached, modules being started...) by
+# calling emit().  Interested parties (such as the server module,
+# which streams them to "blankie watch" clients) subscribe to them.
+#
+# Events are dicts with an "event" key naming the kind of event, a
+# "time" key (seconds since the UNIX epoch), and any other keys
+# specific to the kind of event.  Their values should be serializable
+# as JSON (or be printable with repr()).
+#
+# Events are emitted and delivered on the main thread.  Subscribers
+# must not block, and must not emit events themselves.
+
+import time
+
+from blankie.logging import log
+
+# Functions called with each event.
+subscribers = []
+
+def subscribe(callback):
+	subscribers.append(callback)
+
+def unsubscribe(callback):
+	subscribers.remove(callback)
+
+def emit(kind, **fields):
+	if not subscribers:
+		return
+	event = {'event': kind, 'time': time.time(), **fields}
+	for callback in list(subscribers):
+		try:
+			callback(event)
+		except Exception:
+			log.exception('Error in event subscriber %r:', callback)
@@ -0,0 +1,169 @@
+# blankie.idle - aggregation of the sessions' idle times
+# The system's idle time (see blankie.get_idle_since) is the latest of
+# the attached sessions' idle since values.  Rather than querying every
+# session each time it is needed, the aggregator below keeps each
+# session's value in a heap, so that the combined value can be read
+# without looking at the other sessions when one of them changes.
+# This matters for bus hubs, which may have hundreds of remote
+# sessions.
+#
+# How a session's value is kept up to date depends on the session (see
+# Session.notifies_changes):
+# - Sessions which call invalidate() whenever their idle time changes
+#   (e.g. remote sessions) are only queried again after doing so.
+# - Other sessions are queried again in each event loop task which
+#   needs the idle time - but at most once, unless invalidated, so
+#   that the whole task (e.g. a module update, which asks for the idle
+#   time several times) sees one consistent value.
+#
+# When the combined value changes, an "idle_since" event is emitted
+# (see blankie.events), so that interested modules can act on it
+# without polling, and a new state snapshot is published (see
+# blankie.snapshot), so that "blankie status" and the state file show
+# it without waiting for a module update.
+#
+# Outside of event loop tasks (e.g. before the event loop starts), the
+# aggregator is not used, and the sessions are queried directly.
+
+import heapq
+import itertools
+import math
+
+import blankie
+import blankie.daemon
+import blankie.events
+import blankie.session
+import blankie.snapshot
+
+# Session spec -> (idle since, sequence number) of each attached
+# session, as last returned by its get_idle_since.  The value is None
+# if the session has not been queried yet.
+_values = {}
+
+# Session spec -> session, and back, for the attached sessions which
+# were queried.
+_sessions = {}
+_specs = {}
+
+# Max-heap of (-idle since, sequence number, session spec).  Entries
+# whose sequence number does not match the session's in _values are
+# stale, and discarded lazily.  Sessions whose value is NaN are
+# ignored, and so have no entry.
+_heap = []
+_seq = itertools.count()
+
+# Specs of the sessions which must be queried again before the
+# combined value can be read.
+_stale = set()
+
+# Specs of the sessions which do not notify changes, and so are
+# queried again in each task.
+_polled = set()
+
+# Number of the event loop task (see EventLoop.current) in which the
+# polled sessions were last queried.
+_task = None
+
+# The combined value, as of the last "idle_since" event.
+last_idle_since = math.inf
+
+def add(spec):
+	'''Start aggregating the given session.  Called when it is
+	attached.'''
+	_values[spec] = (None, None)
+	_stale.add(spec)
+	_schedule_refresh()
+
+def remove(spec):
+	'''Stop aggregating the given session.  Called when it is
+	detached.'''
+	if _values.pop(spec, None) is None:
+		return
+	session = _sessions.pop(spec, None)
+	if session is not None:
+		del _specs[session]
+	_stale.discard(spec)
+	_polled.discard(spec)
+	_compact()
+	_schedule_refresh()
+
+def invalidate(session):
+	'''Query the given session again the next time its value is needed.
+	Called by Session.invalidate.'''
+	spec = _specs.get(session)
+	if spec is not None:
+		_stale.add(spec)
+		_schedule_refresh()
+
+def _schedule_refresh():
+	# Once the current task is done, check whether the combined value
+	# changed, so that this is noticed even if nothing else asks.
+	blankie.daemon.call(refresh, coalesce_key=refresh)
+
+def _in_task():
+	current = blankie.daemon._event_loop.current
+	if current is None or not blankie.daemon.is_main_thread():
+		return False
+	global _task
+	if current[0] != _task:
+		_task = current[0]
+		_stale.update(_polled)
+	return True
+
+def _set(spec, idle_since):
+	seq = next(_seq)
+	_values[spec] = (idle_since, seq)
+	if not math.isnan(idle_since):
+		heapq.heappush(_heap, (-idle_since, seq, spec))
+
+def _compact():
+	# Drop stale entries, once they are the majority.
+	global _heap
+	if len(_heap) > 16 and len(_heap) > 2 * len(_values):
+		_heap = [entry for entry in _heap if _values.get(entry[2], (None, None))[1] == entry[1]]
+		heapq.heapify(_heap)
+
+def refresh():
+	'''Query the stale sessions, and return the combined value of all
+	sessions.  Emits an "idle_since" event if it changed.'''
+	global last_idle_since
+	while _stale:
+		spec = _stale.pop()
+		if spec not in _values:
+			continue
+		session = _sessions.get(spec)
+		if session is None:
+			session = _sessions[spec] = blankie.module.get(spec)
+			_specs[session] = spec
+			if not session.notifies_changes:
+				_polled.add(spec)
+		_set(spec, session.get_idle_since())
+	_compact()
+
+	while _heap and _values.get(_heap[0][2], (None, None))[1] != _heap[0][1]:
+		heapq.heappop(_heap)
+	# Without sessions, see blankie.combine_idle_times.
+	idle_since = -_heap[0][0] if _heap else math.inf
+
+	if idle_since != last_idle_since:
+		last_idle_since = idle_since
+		blankie.events.emit('idle_since', idle_since=idle_since)
+		blankie.snapshot.schedule()
+	return idle_since
+
+def get_session_idle_since(spec):
+	'''Return the idle since value of the given session, as per its
+	get_idle_since.'''
+	if spec not in _values or not _in_task():
+		return blankie.module.get(spec).get_idle_since()
+	if spec in _stale:
+		refresh()
+	return _values[spec][0]
+
+def get_idle_since():
+	'''See blankie.get_idle_since.'''
+	if blankie.state.sleeping:
+		return -math.inf
+	if not _in_task():
+		return blankie.combine_idle_times(session.get_idle_since() for session in blankie.session.get_sessions())
+	return refresh()
@@ -0,0 +1,208 @@
+# blankie.ioloop - shared I/O thread
+# A single thread which waits for file descriptors (sockets, pipes...)
+# to become ready, and calls the callbacks registered for them.  Used
+# by modules which would otherwise need a thread per connection or
+# per stream.
+#
+# Callbacks run on the I/O thread, and must not block.  Work which
+# needs Blankie's state must be passed on to the main event loop (see
+# blankie.daemon.call).
+
+import collections
+import os
+import selectors
+import threading
+
+from blankie.logging import log
+
+class IOLoop:
+	def __init__(self):
+		self.selector = selectors.DefaultSelector()
+
+		# Writing to this pipe wakes up the I/O thread, so that it
+		# picks up new registrations and calls.
+		(self.wake_r, self.wake_w) = os.pipe()
+		os.set_blocking(self.wake_r, False)
+		os.set_blocking(self.wake_w, False)
+		self.selector.register(self.wake_r, selectors.EVENT_READ, None)
+
+		# Functions to call on the I/O thread.
+		self.lock = threading.Lock()
+		self.calls = collections.deque()
+
+		self.thread = None
+		self.stopping = False
+
+	def start(self):
+		self.thread = threading.Thread(target=self.run, name='blankie-io', daemon=True)
+		self.thread.start()
+
+	def stop(self):
+		self.call_soon(setattr, self, 'stopping', True)
+		self.thread.join()
+		self.selector.close()
+		os.close(self.wake_r)
+		os.close(self.wake_w)
+
+	def in_thread(self):
+		return threading.current_thread() is self.thread
+
+	def call_soon(self, func, *args):
+		'''Call func(*args) on the I/O thread.  When called from the
+		I/O thread, calls it immediately.'''
+		if self.in_thread():
+			func(*args)
+			return
+		with self.lock:
+			self.calls.append((func, args))
+		try:
+			os.write(self.wake_w, b'\0')
+		except BlockingIOError:
+			pass  # Already woken up
+
+	def run_sync(self, func, *args):
+		'''Call func(*args) on the I/O thread, wait for it to finish, and
+		return its result.  Must not be called from code which the I/O
+		thread may be waiting on.'''
+		if self.in_thread():
+			return func(*args)
+		done = threading.Event()
+		result = []
+
+		def call():
+			try:
+				result.append((True, func(*args)))
+			except BaseException as error:
+				result.append((False, error))
+			finally:
+				done.set()
+
+		self.call_soon(call)
+		done.wait()
+		(succeeded, value) = result[0]
+		if not succeeded:
+			raise value
+		return value
+
+	# Registration.  Only one reader and one writer callback may be
+	# registered per file object.  Each callback is called without
+	# arguments when the file object becomes ready.
+
+	def add_reader(self, fileobj, callback):
+		self.call_soon(self.set_callback, fileobj, selectors.EVENT_READ, callback)
+
+	def remove_reader(self, fileobj):
+		self.call_soon(self.set_callback, fileobj, selectors.EVENT_READ, None)
+
+	def add_writer(self, fileobj, callback):
+		self.call_soon(self.set_callback, fileobj, selectors.EVENT_WRITE, callback)
+
+	def remove_writer(self, fileobj):
+		self.call_soon(self.set_callback, fileobj, selectors.EVENT_WRITE, None)
+
+	def set_callback(self, fileobj, event, callback):
+		try:
+			key = self.selector.get_key(fileobj)
+			callbacks = dict(key.data)
+		except (KeyError, ValueError):
+			key = None
+			callbacks = {}
+
+		if callback is None:
+			callbacks.pop(event, None)
+		else:
+			callbacks[event] = callback
+
+		events = 0
+		for registered_event in callbacks:
+			events |= registered_event
+
+		if key is None:
+			if events:
+				self.selector.register(fileobj, events, callbacks)
+		elif events:
+			self.selector.modify(fileobj, events, callbacks)
+		else:
+			self.selector.unregister(fileobj)
+
+	def run(self):
+		while not self.stopping:
+			for key, events in self.selector.select():
+				if key.data is None:
+					# Wake-up pipe
+					while True:
+						try:
+							if not os.read(self.wake_r, 4096):
+								break
+						except BlockingIOError:
+							break
+					continue
+
+				for event in (selectors.EVENT_READ, selectors.EVENT_WRITE):
+					# Look the callback up again, as an earlier callback
+					# may have unregistered it.
+					try:
+						callback = self.selector.get_key(key.fileobj).data.get(event)
+					except (KeyError, ValueError):
+						break
+					if events & event and callback is not None:
+						self.call(callback)
+
+			while True:
+				with self.lock:
+					if not self.calls:
+						break
+					(func, args) = self.calls.popleft()
+				self.call(func, *args)
+
+	def call(self, func, *args):
+		try:
+			func(*args)
+		except Exception:
+			# A failure in one callback must not stop the I/O thread.
+			log.exception('Unhandled error in I/O callback %r:', func)
+
+
+# The shared I/O loop, started on first use.
+_io_loop = None
+_io_loop_lock = threading.Lock()
+
+def get():
+	global _io_loop
+	with _io_loop_lock:
+		if _io_loop is None:
+			_io_loop = IOLoop()
+			_io_loop.start()
+		return _io_loop
+
+def stop():
+	'''Stop the shared I/O loop, if it is running.'''
+	global _io_loop
+	with _io_loop_lock:
+		io_loop = _io_loop
+		_io_loop = None
+	if io_loop is not None:
+		io_loop.stop()
+
+def in_thread():
+	'''Return True if called from the shared I/O thread.'''
+	io_loop = _io_loop
+	return io_loop is not None and io_loop.in_thread()
+
+def call_soon(func, *args):
+	get().call_soon(func, *args)
+
+def run_sync(func, *args):
+	return get().run_sync(func, *args)
+
+def add_reader(fileobj, callback):
+	get().add_reader(fileobj, callback)
+
+def remove_reader(fileobj):
+	get().remove_reader(fileobj)
+
+def add_writer(fileobj, callback):
+	get().add_writer(fileobj, callback)
+
+def remove_writer(fileobj):
+	get().remove_writer(fileobj)
@@ -1,6 +1,11 @@
 # blankie.module - core module machinery
 
+import collections
+import concurrent.futures
+import contextlib
+import heapq
 import importlib.util
+import itertools
 import os
 import shlex
 import sys
@@ -9,11 +14,30 @@ import traceback
 import blankie
 from blankie.logging import log
 
+# Map from module names to Module subclasses.  Populated as the
+# classes are defined (see Module.__init_subclass__).
+module_classes = {}
+
 # Base class for modules.
 class Module:
 	# All modules should define their name.
 	name = None
 
+	# Set to True if start() and stop() only act on the outside world
+	# (e.g. run external programs), and neither read nor modify
+	# Blankie's state (in particular, do not call update()).  Such
+	# modules may be started and stopped on a worker thread,
+	# concurrently with other such modules.
+	concurrent = False
+
+	# Register the subclass under its name, so that get() can find it.
+	# If more than one class is defined with the same name, the most
+	# recently defined one is used.
+	def __init_subclass__(cls, **kwargs):
+		super().__init_subclass__(**kwargs)
+		if cls.name is not None:
+			module_classes[cls.name] = cls
+
 	# Constructor. You can specify module parameters as its signature.
 	def __init__(self):
 		self.log = log.getChild('modules.' + self.name)
@@ -66,17 +90,30 @@ class Module:
 # Module search path.  Populated in load_config.
 module_dirs = []
 
-# Currently running modules.
+# Currently running modules, in the order in which they were started.
 # This is an over-approximation of the modules whose effects are
 # actually in force: when a module's start() or stop() fails, the
 # module stays on this list, so that a later update() can converge it
 # (modules' stop() functions tolerate partial state).
-running_modules = []
+# This is a dict used as an ordered set: it maps module specs to their
+# start sequence numbers (see _start_sequence).
+running_modules = {}
+
+# Source of start sequence numbers.  Increasing sequence numbers
+# correspond to the order of running_modules.
+_start_sequence = itertools.count()
+
+# Counts changes to the set of running modules, per module name.
+# Selectors which depend on which modules are running can use this as
+# their input (see Selector).
+running_changes = collections.Counter()
 
 # The modules we want to be running, according to the last invocation
 # of update().  This is a global (instead of a local /
 # start_stop_modules parameter) to support recursive calls to
 # update().
+# This is a dict used as an ordered set: it maps module specs to their
+# position in the order in which they should be started.
 wanted_modules = None
 
 # Functions to call to build the list of modules which should be
@@ -84,22 +121,84 @@ wanted_modules = None
 # Functions are called in order of this associative array's keys.
 # Functions accept one argument - a list, which they should mutate to
 # describe which modules they want to be running right now.
+# Selectors may declare their inputs (see Selector), which allows
+# update() to skip calling them.
 selectors = {}
 
+# A selector with declared inputs.
+# `inputs` is a function which returns a (hashable) summary of
+# everything the selector's output depends on.  If it returns the same
+# value as it did the last time the selector was called, update()
+# reuses the selector's previous output instead of calling it again.
+# Such selectors must only add modules to the list (and not otherwise
+# inspect or modify it).
+class Selector:
+	def __init__(self, func, inputs):
+		self.func = func
+		self.inputs = inputs
+
+	def __call__(self, wanted_modules):
+		self.func(wanted_modules)
+
+	def __repr__(self):
+		return 'Selector(%r)' % (self.func,)
+
+# Map from selector keys to (selector, inputs, output) of the last call
+# of selectors which declared their inputs.
+_selector_cache = {}
+
+# Counts of selector calls which were executed, or skipped (because
+# their inputs did not change).
+selector_stats = {
+	'executed': 0,
+	'skipped': 0,
+}
+
+# Map from module names to the files defining them, found by scanning
+# module_dirs.  Built on first use, and rebuilt when module_dirs
+# changes (see _get_module_files).
+module_files = None
+
+# The module_dirs which module_files was built from.
+_module_files_dirs = None
+
+# Scan a module directory, adding any modules not already found in a
+# preceding directory.
+def _scan_module_dir(files, module_dir, prefix=''):
+	try:
+		entries = sorted(os.scandir(module_dir), key=lambda entry: entry.name)
+	except (FileNotFoundError, NotADirectoryError):
+		return
+	for entry in entries:
+		if entry.is_dir():
+			if entry.name != '__pycache__':
+				_scan_module_dir(files, entry.path, prefix + entry.name + '.')
+		elif entry.name.endswith('.py') and entry.name != '__init__.py':
+			files.setdefault(prefix + entry.name[:-3], entry.path)
+
+def _get_module_files():
+	global module_files, _module_files_dirs
+	if module_files is None or _module_files_dirs != module_dirs:
+		files = {}
+		for module_dir in module_dirs:
+			_scan_module_dir(files, module_dir)
+		module_files = files
+		_module_files_dirs = list(module_dirs)
+	return module_files
+
 def load_module(module_name):
-	for module_dir in module_dirs:
-		module_file = module_dir  + '/' + module_name.replace('.', '/') + '.py'
-		if os.path.exists(module_file):
-			log.debug('Loading module %r from %r', module_name, module_file)
-			python_module_name = 'blankie.modules.' + module_name
+	module_file = _get_module_files().get(module_name)
+	if module_file is not None:
+		log.debug('Loading module %r from %r', module_name, module_file)
+		python_module_name = 'blankie.modules.' + module_name
 
-			# https://docs.python.org/3/library/importlib.html#importing-a-source-file-directly
-			spec = importlib.util.spec_from_file_location(python_module_name, module_file)
-			module = importlib.util.module_from_spec(spec)
-			sys.modules[python_module_name] = module
-			spec.loader.exec_module(module)
+		# https://docs.python.org/3/library/importlib.html#importing-a-source-file-directly
+		spec = importlib.util.spec_from_file_location(python_module_name, module_file)
+		module = importlib.util.module_from_spec(spec)
+		sys.modules[python_module_name] = module
+		spec.loader.exec_module(module)
 
-			return
+		return
 
 	raise blankie.UserError('Module %r not found (looked in: %r)' % (
 		module_name,
@@ -109,27 +208,267 @@ def load_module(module_name):
 # Map from module specs to Module instances.
 module_instances = {}
 
+# Number of worker threads used to start and stop concurrent modules
+# (see Module.concurrent).  May be set from the configuration file;
+# 1 disables concurrency.
+max_workers = 8
+
+# The worker thread pool.  Created on first use.
+_executor = None
+
 def get(module_spec):
 	if module_spec in module_instances:
 		return module_instances[module_spec]
 
 	module_name = module_spec[0]
-	def search(p):
-		return ([p] if p.name == module_name else []) + sum((search(c) for c in p.__subclasses__()), start=[])
-	module_classes = search(Module)
-	if len(module_classes) == 0:
+	module_class = module_classes.get(module_name)
+	if module_class is None:
 		log.debug('Auto-loading module %r', module_name)
 		load_module(module_name)
-		module_classes = search(Module)
+		module_class = module_classes.get(module_name)
 
-	assert len(module_classes) > 0, 'No module class defined with name == %r' % (module_name,)
-	module_class = module_classes[-1]  # Use the most recently defined class
+	assert module_class is not None, 'No module class defined with name == %r' % (module_name,)
 
 	# Instantiate
 	module = module_class(*module_spec[1:])
 	module_instances[module_spec] = module
 	return module
 
+# A set of module specs, indexed by module name.
+class _SpecSet:
+	def __init__(self, specs=()):
+		self.by_name = {}
+		for spec in specs:
+			self.add(spec)
+
+	def __contains__(self, spec):
+		return spec in self.by_name.get(spec[0], ())
+
+	def add(self, spec):
+		self.by_name.setdefault(spec[0], {})[spec] = None
+
+	def discard(self, spec):
+		specs = self.by_name.get(spec[0])
+		if specs is not None:
+			specs.pop(spec, None)
+			if not specs:
+				del self.by_name[spec[0]]
+
+	def named(self, name):
+		return self.by_name.get(name, {})
+
+
+# The work remaining to synchronize running_modules against
+# wanted_modules.  It is computed in one pass when synchronization
+# begins; afterwards, as modules are started and stopped, and as
+# re-entrant update() calls change wanted_modules, it is patched
+# (instead of being recomputed) to account for just the modules which
+# were affected.
+class _Plan:
+	def __init__(self):
+		# Running modules which are not wanted.
+		self.pending_stops = _SpecSet(
+			spec for spec in running_modules if spec not in wanted_modules)
+
+		# Wanted modules which are not running.
+		self.pending_starts = _SpecSet(
+			spec for spec in wanted_modules if spec not in running_modules)
+
+		# Modules which failed to stop.  These are not retried until
+		# the next synchronization.
+		self.failed = set()
+
+		# (running spec, wanted spec) pairs for which reconfigure()
+		# returned False.
+		self.declined = set()
+
+		# Names of modules which are both pending to start and stop,
+		# and may therefore be reconfigured instead.
+		# (A dict used as an ordered set.)
+		self.reconfigure_names = dict.fromkeys(
+			name for name in self.pending_starts.by_name
+			if name in self.pending_stops.by_name)
+
+		# Heap of (-start sequence number, spec), so that modules are
+		# stopped in reverse order of starting them.
+		# Entries are validated when they are popped.
+		self.stop_queue = [(-running_modules[spec], spec)
+						   for specs in self.pending_stops.by_name.values()
+						   for spec in specs]
+		heapq.heapify(self.stop_queue)
+
+		# Heap of (wanted position, spec), so that modules are started
+		# in the order they were requested.
+		self.start_queue = []
+		self.reindex_starts()
+
+	# Rebuild start_queue to reflect the positions of the pending
+	# modules in wanted_modules.
+	def reindex_starts(self):
+		self.start_queue = [(wanted_modules[spec], spec)
+							for specs in self.pending_starts.by_name.values()
+							for spec in specs]
+		heapq.heapify(self.start_queue)
+
+	def add_stop(self, spec):
+		self.pending_stops.add(spec)
+		heapq.heappush(self.stop_queue, (-running_modules[spec], spec))
+		if spec[0] in self.pending_starts.by_name:
+			self.reconfigure_names[spec[0]] = None
+
+	def add_start(self, spec):
+		self.pending_starts.add(spec)
+		if spec[0] in self.pending_stops.by_name:
+			self.reconfigure_names[spec[0]] = None
+
+	# Account for update() replacing wanted_modules.
+	def wanted_changed(self, old_wanted, new_wanted):
+		for spec in old_wanted:
+			if spec not in new_wanted:
+				self.pending_starts.discard(spec)
+				if spec in running_modules and spec not in self.failed:
+					self.add_stop(spec)
+		for spec in new_wanted:
+			if spec not in old_wanted:
+				if spec in running_modules:
+					self.pending_stops.discard(spec)
+				else:
+					self.add_start(spec)
+		# Positions may have shifted.
+		self.reindex_starts()
+
+	def is_valid_stop(self, entry):
+		(sequence, spec) = entry
+		return spec in self.pending_stops and running_modules.get(spec) == -sequence
+
+	def is_valid_start(self, entry):
+		return entry[1] in self.pending_starts
+
+	def next_stop(self):
+		while self.stop_queue:
+			entry = heapq.heappop(self.stop_queue)
+			if self.is_valid_stop(entry):
+				return entry[1]
+		return None
+
+	def next_start(self):
+		while self.start_queue:
+			entry = heapq.heappop(self.start_queue)
+			if self.is_valid_start(entry):
+				return entry[1]
+		return None
+
+	# Add to `batch` the following entries in `queue` (stop_queue or
+	# start_queue) which may be processed concurrently with it: those
+	# of concurrent modules, which are not ordered relative to each
+	# other by dependencies.  Stops at the first entry which may not,
+	# so that the order of operations is otherwise preserved.
+	def extend_batch(self, queue, is_valid, batch):
+		batch_specs = set(batch)
+		batch_dependencies = set()
+		for spec in batch:
+			batch_dependencies.update(_ordering_dependencies(spec))
+		while queue:
+			entry = queue[0]
+			if not is_valid(entry):
+				heapq.heappop(queue)
+				continue
+			spec = entry[1]
+			dependencies = _ordering_dependencies(spec)
+			if not get(spec).concurrent or \
+			   spec in batch_dependencies or \
+			   not batch_specs.isdisjoint(dependencies):
+				break
+			heapq.heappop(queue)
+			batch.append(spec)
+			batch_specs.add(spec)
+			batch_dependencies.update(dependencies)
+
+
+# The synchronization in progress, if any.  Shared by re-entrant
+# invocations of start_stop_modules().
+_plan = None
+
+# Return the modules which must be started before, and stopped after,
+# the given module: its dependencies and, for modules whose first
+# parameter is the spec of a running module (such as the per-session
+# modules of PerSessionModuleLauncher, which receive their session's
+# spec), that module.
+def _ordering_dependencies(spec):
+	dependencies = list(get(spec).get_dependencies())
+	if len(spec) > 1 and isinstance(spec[1], tuple) and spec[1] in running_modules:
+		dependencies.append(spec[1])
+	return dependencies
+
+def _get_executor():
+	global _executor
+	if _executor is None:
+		_executor = concurrent.futures.ThreadPoolExecutor(
+			max_workers=max_workers,
+			thread_name_prefix='blankie-module',
+		)
+	return _executor
+
+# Call func(spec) for each of the given module specs - on the worker
+# pool, if there is more than one.  Waits for all calls to complete.
+# Returns a list of (spec, exception or None) pairs, in order.
+def _run_batch(func, specs):
+	if len(specs) == 1:
+		calls = [lambda: func(specs[0])]
+	else:
+		calls = [_get_executor().submit(func, spec).result for spec in specs]
+
+	results = []
+	for spec, call in zip(specs, calls):
+		try:
+			call()
+			results.append((spec, None))
+		except Exception as e:
+			results.append((spec, e))
+	return results
+
+# Restore the order of running_modules after re-inserting a module.
+def _sort_running_modules():
+	items = sorted(running_modules.items(), key=lambda item: item[1])
+	running_modules.clear()
+	running_modules.update(items)
+
+# Try to reconfigure running modules named `name`, which are no longer
+# wanted, into wanted modules which are not yet running.
+# Returns True if any module was reconfigured.
+def _reconfigure(plan, name):
+	result = False
+	for wanted_module in sorted(plan.pending_starts.named(name), key=wanted_modules.__getitem__):
+		for running_module in sorted(plan.pending_stops.named(name), key=running_modules.__getitem__):
+			# A re-entrant update() may have changed things.
+			if wanted_module not in plan.pending_starts:
+				break
+			if running_module not in plan.pending_stops or \
+			   (running_module, wanted_module) in plan.declined:
+				continue
+			module = get(running_module)
+			if module.reconfigure(*wanted_module[1:]):
+				# Replace the module, keeping its sequence number (and
+				# so its place in the stopping order), and its position
+				# in running_modules - which only needs restoring if
+				# it was not the last one.
+				sequence = running_modules.pop(running_module)
+				later = running_modules and running_modules[next(reversed(running_modules))] > sequence
+				running_modules[wanted_module] = sequence
+				if later:
+					_sort_running_modules()
+				running_changes[name] += 1
+				plan.pending_stops.discard(running_module)
+				plan.pending_starts.discard(wanted_module)
+				del module_instances[running_module]
+				module_instances[wanted_module] = module
+				log.debug('Reconfigured module %r from %r to %r.',
+						  wanted_module[0], running_module[1:], wanted_module[1:])
+				result = True
+				break
+			plan.declined.add((running_module, wanted_module))
+	return result
+
 # Start or stop modules, synchronizing running_modules against
 # wanted_modules.
 # The contract this function fulfills is that when it returns,
@@ -144,98 +483,198 @@ def start_stop_modules():
 	# they are started or stopped, support re-entrancy by performing
 	# one operation at a time, and looping until there is no work left
 	# to be done.  Note that wanted_modules may change "under our
-	# feet" in response to a module starting or stopping.
+	# feet" in response to a module starting or stopping; the plan is
+	# shared with any such re-entrant invocation, which updates it.
+
+	global _plan
+	outermost = _plan is None
+	if outermost:
+		_plan = _Plan()
+	plan = _plan
 
 	errors = []
 
-	# Use a local function to break out of deep loops.
-	def do_one_module():
-		# 1. Reconfigure modules which can be reconfigured.
-		for wanted_module in wanted_modules:
-			if wanted_module not in running_modules:
-				for i, running_module in enumerate(running_modules):
-					if wanted_module[0] == running_module[0] and \
-					   running_module not in wanted_modules:
-						module = get(running_module)
-						result = module.reconfigure(*wanted_module[1:])
-						if result:
-							running_modules[i] = wanted_module
-							del module_instances[running_module]
-							module_instances[wanted_module] = module
-							log.debug('Reconfigured module %r from %r to %r.',
-								 wanted_module[0], running_module[1:], wanted_module[1:])
-							return True  # Keep going
-
-		# 2. Stop modules which we no longer want to be running.
-		# Do this in reverse order of starting them.
-		for i, running_module in reversed(list(enumerate(running_modules))):
-			if running_module not in wanted_modules and running_module not in errors:
-				# Remove the module before stopping it, so that
-				# re-entrant updates don't try to stop it again.
-				del running_modules[i]
-				log.debug('Stopping module %r', running_module)
+	try:
+		while True:
+			# 1. Reconfigure modules which can be reconfigured.
+			if plan.reconfigure_names:
+				name = next(iter(plan.reconfigure_names))
+				del plan.reconfigure_names[name]
+				_reconfigure(plan, name)
+				continue
+
+			# 2. Stop modules which we no longer want to be running.
+			# Do this in reverse order of starting them.
+			running_module = plan.next_stop()
+			if running_module is not None:
+				batch = [running_module]
+				if max_workers > 1 and get(running_module).concurrent:
+					plan.extend_batch(plan.stop_queue, plan.is_valid_stop, batch)
+
+				# Remove the modules before stopping them, so that
+				# re-entrant updates don't try to stop them again.
+				sequences = {}
+				for spec in batch:
+					sequences[spec] = running_modules.pop(spec)
+					running_changes[spec[0]] += 1
+					plan.pending_stops.discard(spec)
+					log.debug('Stopping module %r', spec)
+
 				# It is important that, in case of an error, we revert
 				# back to the original state insofar as possible.
 				# This means that an error in one module should not cause
 				# us to not try to stop other modules.
-				module = get(running_module)
-				try:
-					module.stop()
-				except Exception:
-					log.error('Error when attempting to stop module %r:', str(running_module))
-					traceback.print_exc()
+				for spec, error in _run_batch(lambda spec: get(spec).stop(), batch):
+					if error is None:
+						log.debug('Stopped module %r', spec)
+						blankie.events.emit('stopped', module=spec)
+						continue
+					log.error('Error when attempting to stop module %r:', str(spec))
+					traceback.print_exception(error)
 					# Assume the module's effects are still in force:
 					# put it back, so that a later update() retries the
-					# stop.  (Being in the errors list excludes it from
-					# further attempts within this pass, which
-					# guarantees termination.)
-					running_modules.insert(i, running_module)
-					errors.append(running_module)
-					return True
-				log.debug('Stopped module %r', running_module)
-				return True  # Keep going
-
-		# 3. Start modules which we now want to be running.
-		for wanted_module in wanted_modules:
-			if wanted_module not in running_modules:
-				running_modules.append(wanted_module)
-				log.debug('Starting module: %r', wanted_module)
-				get(wanted_module).start()
-				log.debug('Started module: %r', wanted_module)
-				# Put the module we just started at the end, so that
-				# any dependents are stopped after it:
-				if wanted_module in wanted_modules and wanted_module in running_modules:
-					running_modules.remove(wanted_module)
-					running_modules.append(wanted_module)
-				return True  # Keep going
-
-		# If we reached this point, there is no more work to do.
-		return False
-
-	while do_one_module():
-		pass  # Keep going
+					# stop.  (Being in the failed set excludes it from
+					# further attempts within this synchronization,
+					# which guarantees termination.)
+					running_modules[spec] = sequences[spec]
+					running_changes[spec[0]] += 1
+					plan.failed.add(spec)
+					errors.append(spec)
+				if plan.failed.intersection(batch):
+					_sort_running_modules()
+				continue
+
+			# 3. Start modules which we now want to be running.
+			wanted_module = plan.next_start()
+			if wanted_module is not None:
+				batch = [wanted_module]
+				if max_workers > 1 and get(wanted_module).concurrent:
+					plan.extend_batch(plan.start_queue, plan.is_valid_start, batch)
+
+				for spec in batch:
+					running_modules[spec] = next(_start_sequence)
+					running_changes[spec[0]] += 1
+					plan.pending_starts.discard(spec)
+					log.debug('Starting module: %r', spec)
+
+				start_errors = []
+				for spec, error in _run_batch(lambda spec: get(spec).start(), batch):
+					if error is not None:
+						# The module remains tracked as running.
+						start_errors.append((spec, error))
+						continue
+					log.debug('Started module: %r', spec)
+					blankie.events.emit('started', module=spec)
+					# Put the module we just started at the end, so that
+					# any dependents are stopped after it:
+					if spec in wanted_modules and spec in running_modules:
+						del running_modules[spec]
+						running_modules[spec] = next(_start_sequence)
+
+				if start_errors:
+					# Propagate the first error; report any others.
+					for spec, error in start_errors[1:]:
+						log.error('Error when attempting to start module %r:', str(spec))
+						traceback.print_exception(error)
+					raise start_errors[0][1]
+				continue
+
+			# If we reached this point, there is no more work to do.
+			break
+	finally:
+		if outermost:
+			_plan = None
 
 	if errors:
 		raise blankie.UserError('Failed to stop some modules.')
 
 	log.debug('Modules are synchronized.')
 
+# Nesting depth of batch() blocks, and whether update() was called
+# inside them.
+_batch_depth = 0
+_batch_pending = False
+
+@contextlib.contextmanager
+def batch():
+	'''Defer update() calls made inside the block, and perform a single
+	update() when the outermost block exits (if any were deferred).
+
+	Use this when making several changes which would each call
+	update(), e.g. attaching or detaching many sessions.  Note that
+	errors from the deferred update() are raised at the end of the
+	outermost block, and not by the calls within it - unless the
+	block itself raised, in which case they are only logged.'''
+	assert blankie.daemon.is_main_thread()
+
+	global _batch_depth, _batch_pending
+	_batch_depth += 1
+	try:
+		yield
+	except BaseException:
+		# Still converge, but do not hide the block's exception.
+		if _end_batch():
+			try:
+				update()
+			except Exception:
+				log.exception('Error in deferred module update:')
+		raise
+	else:
+		if _end_batch():
+			update()
+
+def _end_batch():
+	'''Leave a batch() block.  Return True if it was the outermost
+	one, and an update is pending.'''
+	global _batch_depth, _batch_pending
+	_batch_depth -= 1
+	if _batch_depth == 0 and _batch_pending:
+		_batch_pending = False
+		return True
+	return False
+
 # Start or stop modules according to the current circumstances.
 def update():
 	assert blankie.daemon.is_main_thread()
 
+	global _batch_pending
+	if _batch_depth:
+		log.trace('Deferring update until the end of the batch.')
+		_batch_pending = True
+		return
+
 	# 1. Build the list of wanted modules.
 	# Do this by calling the functions registered in selectors.
 
 	log.debug('Updating list of modules to run with circumstances: %s', blankie.state)
 
 	global wanted_modules
-	wanted_modules = []
+	selected = []
 
 	for key in sorted(selectors.keys()):
 		selector = selectors[key]
+
+		inputs = None
+		if isinstance(selector, Selector):
+			inputs = selector.inputs()
+			cached = _selector_cache.get(key)
+			if cached is not None and cached[0] is selector and cached[1] == inputs:
+				log.trace('Reusing output of module selector: %r', selector)
+				selected.extend(cached[2])
+				selector_stats['skipped'] += 1
+				continue
+
 		log.trace('Calling module selector: %r', selector)
-		selector(wanted_modules)
+		start = len(selected)
+		selector(selected)
+		selector_stats['executed'] += 1
+
+		if isinstance(selector, Selector):
+			_selector_cache[key] = (selector, inputs, selected[start:])
+
+	# Forget about selectors which were removed.
+	for key in [key for key in _selector_cache if key not in selectors]:
+		del _selector_cache[key]
 
 	# Add dependencies
 	with_dependencies = []
@@ -244,16 +683,25 @@ def update():
 		for dependency in module.get_dependencies():
 			add(dependency)
 		with_dependencies.append(module_spec)
-	for module_spec in wanted_modules:
+	for module_spec in selected:
 		add(module_spec)
-	wanted_modules = with_dependencies
 
-	# Deduplicate
-	wanted_modules = list(dict.fromkeys(wanted_modules))
+	# Deduplicate, and index by position.
+	old_wanted_modules = wanted_modules
+	wanted_modules = {spec: position for position, spec in enumerate(dict.fromkeys(with_dependencies))}
+
+	# If this is a re-entrant invocation, patch the synchronization in
+	# progress.
+	if _plan is not None:
+		_plan.wanted_changed(old_wanted_modules, wanted_modules)
 
 	# 2. Start/stop modules accordingly.
 	start_stop_modules()
 
+	# 3. Let read-only queries see the new state.
+	if _plan is None:
+		blankie.snapshot.schedule()
+
 def cli_command(module_spec_str, *args):
 	# Synchronously instantiate a module and execute a module
 	# subcommand, outside the daemon process.
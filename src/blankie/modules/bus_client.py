@@ -84,8 +84,11 @@ class BusClientModule(blankie.module.Module):
 			})
 			return
 
-		for module_spec in blankie.module.running_modules:
-			blankie.module.get(module_spec).bus_packet(packet)
+		# Iterate over a copy, as handling a packet may start or stop
+		# modules.  Converge once, after all modules saw the packet.
+		with blankie.module.batch():
+			for module_spec in list(blankie.module.running_modules):
+				blankie.module.get(module_spec).bus_packet(packet)
 
 	def handle_disconnect(self):
 		self.handle_packet({'type': 'disconnect'})
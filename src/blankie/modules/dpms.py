@@ -8,6 +8,7 @@ import blankie
 
 class DPMSPerSessionModule(blankie.module.Module):
 	name = 'internal-dpms-session'
+	concurrent = True
 
 	def __init__(self, session_spec, dpms_state = 'off'):
 		super().__init__()
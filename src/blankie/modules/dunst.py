@@ -8,6 +8,7 @@ import blankie
 
 class DunstModule(blankie.module.Module):
 	name = 'dunst'
+	concurrent = True
 
 	def start(self):
 		subprocess.check_call(['dunstctl', 'set-paused', 'true'])
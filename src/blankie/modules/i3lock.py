@@ -18,6 +18,7 @@ class I3LockPerSessionModule(blankie.module.Module):
 	# - Exit the locked state, stopping other on_lock modules, when i3lock exits.
 
 	name = 'internal-i3lock-session'
+	concurrent = True
 
 	def __init__(self, session_spec, *args):
 		super().__init__()
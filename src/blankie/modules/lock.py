@@ -21,4 +21,7 @@ class LockModule(blankie.module.Module):
 def lock_selector(wanted_modules):
 	if blankie.state.locked:
 		wanted_modules.append(('lock', ))
-blankie.module.selectors['50-lock'] = lock_selector
+blankie.module.selectors['50-lock'] = blankie.module.Selector(
+	lock_selector,
+	lambda: blankie.state.locked,
+)
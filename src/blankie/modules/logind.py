@@ -82,6 +82,7 @@ class LogindModule(blankie.module.Module):
 	def handle_enter_sleep(self):
 		# Reconfigure the system appropriately
 		blankie.state.sleeping = True
+		blankie.events.emit('sleeping')
 		blankie.module.update()
 		# Release the inhibitor lock
 		# This must be done only after the above
@@ -94,4 +95,5 @@ class LogindModule(blankie.module.Module):
 	def handle_exit_sleep(self):
 		# Reconfigure the system appropriately
 		blankie.state.sleeping = False
+		blankie.events.emit('awake')
 		blankie.module.update()
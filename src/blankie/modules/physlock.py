@@ -10,6 +10,7 @@ import blankie.modules.session.tty
 
 class PhysLockModule(blankie.module.Module):
 	name = 'physlock'
+	concurrent = True
 
 	def __init__(self, *args):
 		super().__init__()
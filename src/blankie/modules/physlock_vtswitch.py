@@ -8,6 +8,7 @@ import blankie
 
 class PhyslockVTSwitchModule(blankie.module.Module):
 	name = 'physlock_vtswitch'
+	concurrent = True
 
 	def start(self):
 		subprocess.check_call(['physlock', '-l'])
@@ -29,8 +29,9 @@ class RemoteReceiverModule(blankie.module.Module):
 			case 'disconnect':
 				# TODO: does not handle multiple buses correctly
 				remote_session_specs = [spec for spec in blankie.session.session_specs if spec[0] == 'session.remote']
-				for spec in remote_session_specs:
-					blankie.session.detach(spec)
+				with blankie.module.batch():
+					for spec in remote_session_specs:
+						blankie.session.detach(spec)
 
 			case 'leave':
 				instance_id = packet['id']
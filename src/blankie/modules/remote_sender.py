@@ -1,9 +1,8 @@
 # blankie.modules.remote_sender
 # Connects to a bus and sends information about this instance.
 
-import threading
-
 import blankie
+import blankie.daemon
 import blankie.server
 import blankie.session
 
@@ -14,39 +13,41 @@ class RemoteSenderModule(blankie.module.Module):
 		super().__init__()
 
 		self.bus_client_spec = ('bus_client', bus_addr)
-		self.timer = None
+		self.running = False
 		self.last_idle_since = 0
 		self.last_locked = False
 
 	def get_dependencies(self):
 		return [self.bus_client_spec]
 
-	def start(self):
-		# TODO: Replace always-on timer with some kind of hook
-		# which gets called when the idle-since timestamp / lock state changes.
-		self.schedule_timer()
+	# Events after which the idle-since timestamp or lock state may
+	# have changed.
+	update_events = ('idle_since', 'locked', 'unlocked', 'sleeping', 'awake')
 
-	def schedule_timer(self):
-		self.timer = threading.Timer(
-			interval=5,
-			function=blankie.daemon.call,
-			args=(self.handle_timer,)
-		)
-		self.timer.daemon = True
-		self.timer.start()
+	def start(self):
+		self.running = True
+		# The state is sent once we joined the bus (see bus_packet),
+		# then whenever it changes.
+		blankie.events.subscribe(self.handle_event)
 
 	def stop(self):
-		if self.timer is not None:
-			self.timer.cancel()
-			self.timer = None
+		if self.running:
+			blankie.events.unsubscribe(self.handle_event)
+			self.running = False
 
 	def bus_packet(self, packet):
 		if packet['type'] == 'welcome' or packet['type'] == 'join':
 			self.update(True)
 
-	def handle_timer(self):
-		self.update()
-		self.schedule_timer()
+	def handle_event(self, event):
+		if event['event'] in self.update_events:
+			# Subscribers may not query the idle time (which may emit
+			# events), so do it once the current task is done.
+			blankie.daemon.call(self.handle_update, coalesce_key=self)
+
+	def handle_update(self):
+		if self.running:
+			self.update()
 
 	def update(self, force=False):
 		idle_since = blankie.get_idle_since()
@@ -2,231 +2,607 @@
 # Runs a UNIX socket server and receives events.
 # Needed for daemon communication commands such as "blankie stop" or
 # "blankie status".
+#
+# Connections are handled by the shared I/O thread (see
+# blankie.ioloop), using non-blocking sockets; commands are run on the
+# main event loop, which passes the reply back to the I/O thread.
+# Thus, no thread is used per connection, including for connections
+# holding a wake-lock or watching for events.
 
 import contextlib
-import itertools
+import io
 import json
 import os
 import socket
-import socketserver
-import threading
+import struct
+import time
 
 import blankie
+import blankie.events
+import blankie.ioloop
 import blankie.server
 import blankie.session
+import blankie.snapshot
+import blankie.stats
+import blankie.wake_lock
 
 
-wake_lock_ids = itertools.count(1)
-
 class ServerModule(blankie.module.Module):
 	name = 'server'
 
 	def __init__(self):
 		super().__init__()
 
-		# SocketServer instance.
+		# Server instance.
 		self.server = None
 
-		# Thread running the server accept loop.
-		self.server_thread = None
-
 	def start(self):
 		# Remove stale socket
 		with contextlib.suppress(FileNotFoundError):
 			os.remove(blankie.server.path)
 			self.log.debug('Removed stale socket: %r', blankie.server.path)
 
-		# Create and initialize the SocketServer instance
-		self.server = SocketServer(self)
-
-		# Run reader thread
-		self.server_thread = threading.Thread(target=self.server_thread_func, daemon=True)
-		self.server_thread.start()
+		self.server = Server(self)
+		blankie.ioloop.add_reader(self.server.socket, self.server.accept)
+		blankie.events.subscribe(self.server_event)
 
 	def stop(self):
+		blankie.events.unsubscribe(self.server_event)
 		server = self.server
-
-		# We can't directly interrupt the blocking 'accept' easily,
-		# but we can send a dummy command which will cause the server
-		# to check if it should shut down.
-		server.interrupt_requests()
-		blankie.server.notify('server-shutdown-ping')
-
-		# Now, just wait for the thread to exit.
-		self.server_thread.join()
-		self.server_thread = None
 		self.server = None
 
-	def server_thread_func(self):
+		# Stop accepting new work, then close all connections.  Wait
+		# for the I/O thread to do so, so that no connection outlives
+		# the module.  This does not wait for the main loop, as we
+		# may be running in it.
+		server.stopping = True
+		blankie.ioloop.run_sync(server.close)
+
+	# Called on the I/O thread when a connection received its command
+	# (one-shot protocol: one command per connection, with the reply
+	# delimited by the end of the connection).
+	def server_reader(self, connection, command_str):
+		self.log.trace('Got string: %r', command_str)
+		try:
+			command = json.loads(command_str)
+		except ValueError:
+			command = None
+		if not isinstance(command, list) or not command:
+			self.log.warning('Received invalid command: %r', command_str)
+			connection.close()
+			return
+
 		server = self.server
+		if server is None or server.stopping:
+			connection.close()
+			return
 
-		while not server.stopping:
-			server.handle_request()
-		self.log.debug('Stopping server thread.')
+		if is_wake_lock(command):
+			connection.wake_lock = True
+			blankie.daemon.call(self.server_wake_lock, server, connection, *command[1:])
+			return
 
-	def server_reader(self, handler):
-		command_str = handler.rfile.readline()
+		if command == ['watch']:
+			connection.watching = True
+			blankie.daemon.call(self.server_watch, server, connection)
+			return
 
-		if not command_str.endswith(b'\n'):
-			self.log.warning('Received unterminated command: %r', command_str)
+		try:
+			reply = self.server_query(command)
+		except blankie.UserError as e:
+			self.log.warning('%s', e)
+			reply = b''
+		if reply is not None:
+			connection.write(reply, close=True)
 			return
-		command_str = command_str[:-1]
 
-		self.log.trace('Got string: %r', command_str)
-		command = json.loads(command_str)
+		blankie.daemon.call(self.server_run_command, connection, *command)
+
+	# Called on the I/O thread for each request received on a
+	# connection using the framed protocol: each request is a JSON
+	# object {"id": ..., "command": [...]} on its own line, and is
+	# answered (in order) with a line {"id": ..., "result": "..."} or
+	# {"id": ..., "error": "..."}.  Any number of requests may be sent
+	# without waiting for the replies.
+	def server_request(self, connection, request_str):
+		self.log.trace('Got request: %r', request_str)
+		try:
+			request = json.loads(request_str)
+			request_id = request.get('id')
+			command = request['command']
+			if not isinstance(command, list) or not command:
+				raise ValueError('Invalid command')
+		except (ValueError, KeyError, AttributeError) as error:
+			self.log.warning('Received invalid request: %r', request_str)
+			connection.reply(None, error='Invalid request: %s' % (error,))
+			return
 
-		if command == ['server-shutdown-ping']:
-			return  # This was sent just to wake up the accept loop.
 		server = self.server
 		if server is None or server.stopping:
+			connection.close()
 			return
 
-		if command == ['wake-lock']:
-			self.server_wake_lock(server, handler)
+		try:
+			reply = self.server_query(command)
+		except blankie.UserError as e:
+			connection.reply(request_id, error=str(e))
+			return
+		if reply is not None:
+			connection.reply(request_id, result=reply)
 			return
 
-		done_event = threading.Event()
-		blankie.daemon.call(self.server_run_command, handler, done_event, *command)
-
-		# Wait until the event is processed, to avoid the connection
-		# getting closed early.
-		done_event.wait()
+		if is_wake_lock(command):
+			connection.wake_lock = True
+		blankie.daemon.call(self.server_run_request, server, connection, request_id, *command)
 
-	def server_wake_lock(self, server, handler):
-		spec = ('session.wake_lock', 'wake-lock-%d' % next(wake_lock_ids))
-		attach_done = threading.Event()
-		attach_result = []
-		attached = []
+	# Acquire a wake-lock on behalf of a connection.
+	# Runs in the main thread.
+	def server_wake_lock(self, server, connection, reason=None):
+		if server.stopping or connection.released:
+			connection.shutdown()
+			return
 
-		def attach():
-			try:
-				if server.stopping:
-					return
-				blankie.session.attach(spec)
-				attached.append(None)
-			except Exception as error:
-				attach_result.append(error)
-			finally:
-				attach_done.set()
-
-		blankie.daemon.call(attach)
-		attach_done.wait()
-		if attach_result:
-			raise attach_result[0]
-		if not attached:
+		try:
+			self.server_acquire_wake_lock(connection, reason)
+		except Exception:
+			self.log.exception('Failed to acquire wake lock:')
+			connection.shutdown()
 			return
 
+		connection.send(b'Wake lock acquired.\n')
+
+	def server_acquire_wake_lock(self, connection, reason=None):
+		holder = blankie.wake_lock.acquire(connection.peer_pid, reason)
+		# Held until the connection is closed (see
+		# server_wake_lock_release).
+		connection.wake_lock_holders.append(holder)
+
+	# Start streaming events to a connection, starting with the
+	# current state.  Runs in the main thread.
+	def server_watch(self, server, connection):
+		connection.send(encode_event({
+			'event': 'state',
+			'time': time.time(),
+			'locked': blankie.state.locked,
+			'sleeping': blankie.state.sleeping,
+			'sessions': sorted(blankie.session.session_specs),
+		}))
+		# Events emitted from now on are sent after the above.
+		blankie.ioloop.call_soon(server.add_watcher, connection)
+
+	# Event subscriber.  Runs in the main thread.
+	def server_event(self, event):
+		server = self.server
+		if server is not None:
+			blankie.ioloop.call_soon(server.broadcast, encode_event(event))
+
+	# Called when a wake-lock connection was closed (by either side).
+	# Runs in the main thread.
+	def server_wake_lock_release(self, connection):
+		connection.released = True
+		holders = connection.wake_lock_holders
+		connection.wake_lock_holders = []
 		try:
-			handler.wfile.write(b'Wake lock acquired.\n')
-			handler.wfile.flush()
-			handler.rfile.read()
+			with blankie.module.batch():
+				for holder in holders:
+					blankie.wake_lock.release(holder)
 		finally:
-			detach_done = threading.Event()
-			detach_result = []
+			connection.shutdown()
 
-			def detach():
-				try:
-					blankie.session.detach(spec)
-				except Exception as error:
-					detach_result.append(error)
-				finally:
-					detach_done.set()
-
-			blankie.daemon.call(detach)
-			detach_done.wait()
-			if detach_result:
-				raise detach_result[0]
-
-	# Handle one command received from the socket.
+	# Handle one command received using the one-shot protocol.
 	# Runs in the main thread.
-	def server_run_command(self, handler, done_event, *args):
+	def server_run_command(self, connection, *args):
+		output = io.BytesIO()
 		try:
-			self.log.debug('Got command: %r', args)
-			match args[0]:
-				case 'ping':
-					handler.wfile.write(b'pong\n')
-				case 'status':
-					handler.wfile.write(b'Currently locked: %r\n' % (blankie.state.locked,))
-					handler.wfile.write(b'Running modules:\n')
-					handler.wfile.write(b''.join(b'- %r\n' % (m,) for m in blankie.module.running_modules))
-					handler.wfile.write(b'Sessions:\n')
-					for spec in blankie.session.session_specs:
-						module = blankie.module.get(spec)
-						handler.wfile.write(b'- %r - %r\n' % (spec, module.get_idle_since()))
-					blankie.config.configurator.print_status(handler.wfile)
-				case 'stop':
-					blankie.daemon.stop()
-				case 'reload':
-					blankie.config.reload()
-				case 'module': # Synchronously execute module subcommand, in the daemon process
-					blankie.module.get(args[1]).server_command(*args[2:])
-				case 'lock':
-					self.log.security('Locking the screen due to user request.')
-					if not blankie.state.locked:
-						blankie.lock()
-						handler.wfile.write(b'Locked.\n')
-					else:
-						handler.wfile.write(b'Already locked.\n')
-				case 'unlock':
-					self.log.security('Unlocking the screen due to user request.')
-					if blankie.state.locked:
-						blankie.unlock()
-						handler.wfile.write(b'Unlocked.\n')
-					else:
-						handler.wfile.write(b'Already unlocked.\n')
-				case 'attach':
-					try:
-						blankie.session.attach(args[1:])
-						handler.wfile.write(b'ok')
-					except Exception as e:
-						handler.wfile.write(bytes(str(e), encoding="utf-8"))
-				case 'detach':
-					try:
-						blankie.session.detach(args[1:])
-						handler.wfile.write(b'ok')
-					except Exception as e:
-						handler.wfile.write(bytes(str(e), encoding="utf-8"))
-				case _:
-					self.log.warning('Ignoring unknown daemon command: %r', args)
+			self.server_execute(output, *args)
+		except blankie.UserError as e:
+			self.log.warning('%s', e)
 		finally:
-			done_event.set()
-
-# Glue between socketserver and ServerModule.
-
-class Handler(socketserver.StreamRequestHandler):
-	def handle(self):
-		self.server.module.server_reader(self)
-
-class SocketServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
-	# Handler threads only pump I/O for the main thread; they must
-	# never keep the interpreter from exiting.
-	daemon_threads = True
+			connection.send(output.getvalue(), close=True)
 
+	# Handle one request received using the framed protocol.
+	# Runs in the main thread.
+	def server_run_request(self, server, connection, request_id, *args):
+		if server.stopping or connection.released:
+			connection.reply(request_id, error='Server is stopping')
+			return
+		output = io.BytesIO()
+		try:
+			if is_wake_lock(args):
+				self.server_acquire_wake_lock(connection, *args[1:])
+				output.write(b'Wake lock acquired.\n')
+			else:
+				self.server_execute(output, *args)
+		except Exception as e:
+			if not isinstance(e, blankie.UserError):
+				self.log.exception('Error handling request %r:', args)
+			connection.reply(request_id, error=str(e))
+		else:
+			connection.reply(request_id, result=output.getvalue())
+
+	# Answer read-only commands from the published state snapshot (see
+	# blankie.snapshot), without involving the main thread.  Returns
+	# None for other commands.  Runs on the I/O thread.
+	def server_query(self, command):
+		if command[0] != 'status':
+			return None
+		snapshot = blankie.snapshot.current
+		if snapshot is None:
+			return None
+		return self.server_status(snapshot, *command[1:])
+
+	# Format the reply to a status command.  Runs in any thread.
+	def server_status(self, snapshot, *options):
+		if options == ('--json',):
+			return blankie.snapshot.format_json(snapshot)
+		if options:
+			raise blankie.UserError('Unknown status options: %r' % (options,))
+
+		event_loop = blankie.daemon._event_loop
+		return blankie.snapshot.format_text(snapshot) + (
+			b'Selector calls: %d executed, %d skipped\n' % (
+				blankie.module.selector_stats['executed'],
+				blankie.module.selector_stats['skipped'],
+			)
+		) + (
+			b'Event queue: %d waiting (max %d), %d posted, %d coalesced, %d throttled, %d overflow\n' % (
+				event_loop.depth(),
+				event_loop.stats['max_depth'],
+				event_loop.stats['posted'],
+				event_loop.stats['coalesced'],
+				event_loop.stats['throttled'],
+				event_loop.stats['overflow'],
+			)
+		)
+
+	# Execute a command, writing its reply to output.
+	# Runs in the main thread.
+	def server_execute(self, output, *args):
+		self.log.debug('Got command: %r', args)
+		match args[0]:
+			case 'ping':
+				output.write(b'pong\n')
+			case 'status':
+				# Take a fresh snapshot, as none may have been
+				# published yet.
+				output.write(self.server_status(blankie.snapshot.publish(), *args[1:]))
+			case 'stats':
+				output.write(blankie.stats.report(blankie.daemon._event_loop))
+			case 'stop':
+				blankie.daemon.stop()
+			case 'reload':
+				blankie.config.reload()
+			case 'module': # Synchronously execute module subcommand, in the daemon process
+				with blankie.module.batch():
+					blankie.module.get(args[1]).server_command(*args[2:])
+			case 'lock':
+				self.log.security('Locking the screen due to user request.')
+				if not blankie.state.locked:
+					blankie.lock()
+					output.write(b'Locked.\n')
+				else:
+					output.write(b'Already locked.\n')
+			case 'wake-lock-lease' if len(args) in (2, 3):
+				holder = blankie.wake_lock.lease(args[1], reason=(args[2:] or [None])[0])
+				output.write(b'%d\n' % holder.id)
+			case 'wake-lock-renew' if len(args) in (2, 3):
+				blankie.wake_lock.renew(*args[1:])
+				output.write(b'Wake lock renewed.\n')
+			case 'wake-lock-release' if len(args) == 2:
+				blankie.wake_lock.release(blankie.wake_lock.get_lease(args[1]))
+				output.write(b'Wake lock released.\n')
+			case 'watch':
+				raise blankie.UserError('watch is only supported on one-shot connections')
+			case 'unlock':
+				self.log.security('Unlocking the screen due to user request.')
+				if blankie.state.locked:
+					blankie.unlock()
+					output.write(b'Unlocked.\n')
+				else:
+					output.write(b'Already unlocked.\n')
+			case 'attach':
+				try:
+					blankie.session.attach(args[1:])
+					output.write(b'ok')
+				except Exception as e:
+					output.write(bytes(str(e), encoding="utf-8"))
+			case 'detach':
+				try:
+					blankie.session.detach(args[1:])
+					output.write(b'ok')
+				except Exception as e:
+					output.write(bytes(str(e), encoding="utf-8"))
+			case _:
+				raise blankie.UserError('Ignoring unknown daemon command: %r' % (args,))
+
+def is_wake_lock(command):
+	'''Whether a command is a wake-lock request: "wake-lock",
+	optionally followed by the reason.'''
+	return command[0] == 'wake-lock' and (
+		len(command) == 1 or
+		(len(command) == 2 and isinstance(command[1], str))
+	)
+
+def encode_event(event):
+	'''Format an event (see blankie.events) as a line of JSON.'''
+	return json.dumps(event, separators=(',', ':'), default=repr).encode() + b'\n'
+
+# The listening socket, and the connections accepted from it.
+# Only accessed from the I/O thread, except for the stopping flag.
+
+class Server:
 	def __init__(self, module):
 		self.module = module
 		self.stopping = False
-		self.request_lock = threading.Lock()
-		self.requests = set()
-		super().__init__(blankie.server.path, Handler)
-
-	def interrupt_requests(self):
-		with self.request_lock:
-			self.stopping = True
-			requests = tuple(self.requests)
-		for request in requests:
+		self.connections = set()
+		# Connections receiving events ("watch" command).
+		self.watchers = set()
+
+		self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+		try:
+			self.socket.bind(blankie.server.path)
+			self.socket.listen(128)
+			self.socket.setblocking(False)
+		except:
+			self.socket.close()
+			raise
+
+	def accept(self):
+		while True:
 			try:
-				request.shutdown(socket.SHUT_RDWR)
+				(client_socket, _address) = self.socket.accept()
+			except BlockingIOError:
+				return
 			except OSError as error:
-				self.module.log.warning('Failed to interrupt request socket: %s', error)
+				self.module.log.warning('Failed to accept connection: %s', error)
+				return
+			self.add_connection(client_socket)
+
+	def add_connection(self, client_socket):
+		connection = Connection(self, client_socket)
+		self.connections.add(connection)
+		blankie.ioloop.add_reader(client_socket, connection.on_readable)
+		return connection
+
+	def add_watcher(self, connection):
+		if not connection.closed:
+			self.watchers.add(connection)
+
+	def broadcast(self, line):
+		for connection in list(self.watchers):
+			connection.write_event(line)
+
+	def close(self):
+		blankie.ioloop.remove_reader(self.socket)
+		self.socket.close()
+		for connection in list(self.connections):
+			connection.close(force=True)
+
+
+def is_request(line):
+	'''Whether the first line received on a connection is a framed
+	request (as opposed to a one-shot command).'''
+	if not line.lstrip().startswith(b'{'):
+		return False
+	try:
+		return 'command' in json.loads(line)
+	except ValueError:
+		return False
+
+
+def get_peer_pid(client_socket):
+	try:
+		credentials = client_socket.getsockopt(socket.SOL_SOCKET, socket.SO_PEERCRED, struct.calcsize('3i'))
+	except (AttributeError, OSError):
+		return None  # Not supported
+	(pid, _uid, _gid) = struct.unpack('3i', credentials)
+	return pid or None
+
+
+class Connection:
+	# Maximum length of a command.
+	max_command_length = 64 * 1024
+
+	# Maximum amount of events waiting to be sent to a "watch"
+	# client.  Clients which do not read events quickly enough are
+	# disconnected, rather than letting them use up memory.
+	max_watch_buffer = 64 * 1024
+
+	# Maximum number of framed requests being handled at once per
+	# connection.  Once reached, the connection is not read from
+	# until replies are sent, so that a client pipelining requests
+	# faster than they are handled cannot grow the event queue.
+	max_pipeline = 64
+
+	def __init__(self, server, client_socket):
+		self.server = server
+		self.socket = client_socket
+		self.socket.setblocking(False)
+
+		# Data received so far, until the command is complete.
+		self.input = b''
+		self.command_received = False
+
+		# None until the first line is received; then 'one-shot' (a
+		# JSON array: one command, with the reply delimited by the end
+		# of the connection) or 'framed' (JSON objects: any number of
+		# requests, each with an ID which is repeated in its reply).
+		self.mode = None
+		# Framed requests not replied to yet.
+		self.outstanding = 0
+		self.paused = False
+		self.eof = False
+
+		# Data waiting to be sent.
+		self.output = b''
+		self.close_after_output = False
+
+		self.closed = False
+
+		# Wake-lock state.  wake_lock and releasing are only accessed
+		# from the I/O thread; the others only from the main thread.
+		self.wake_lock = False
+		self.releasing = False
+		self.wake_lock_holders = []
+		self.released = False
+
+		# Process ID of the client (for wake-lock holders).
+		self.peer_pid = get_peer_pid(client_socket)
+
+		# Whether this is a "watch" connection.  Only accessed from
+		# the I/O thread.
+		self.watching = False
+
+	# I/O thread:
+
+	def on_readable(self):
+		try:
+			data = self.socket.recv(4096)
+		except BlockingIOError:
+			return
+		except OSError:
+			data = b''
+
+		if not data:
+			# The peer closed the connection.
+			if not self.command_received and self.input:
+				self.server.module.log.warning('Received unterminated command: %r', self.input)
+			if self.mode == 'framed':
+				# Send the replies to the requests received so far
+				# before closing.
+				self.eof = True
+				blankie.ioloop.remove_reader(self.socket)
+				self.finish()
+			elif self.command_received and not (self.wake_lock or self.watching):
+				# The reply closes the connection once sent.
+				blankie.ioloop.remove_reader(self.socket)
+			else:
+				self.close()
+			return
 
-	def process_request(self, request, client_address):
-		with self.request_lock:
-			self.requests.add(request)
-		super().process_request(request, client_address)
+		if self.command_received:
+			# Only one command is accepted per connection.  Wake-lock
+			# clients may send more data, which is ignored.
+			return
 
-	def process_request_thread(self, request, client_address):
+		self.input += data
+		self.process_input()
+		if not self.closed and len(self.input) > self.max_command_length:
+			self.server.module.log.warning('Received overly long command.')
+			self.close()
+
+	def process_input(self):
+		while b'\n' in self.input and not self.paused:
+			(line, _, self.input) = self.input.partition(b'\n')
+
+			if self.mode is None:
+				self.mode = 'framed' if is_request(line) else 'one-shot'
+
+			if self.mode == 'one-shot':
+				self.input = b''
+				self.command_received = True
+				self.server.module.server_reader(self, line)
+				return
+
+			if not line.strip():
+				continue
+			self.outstanding += 1
+			if self.outstanding >= self.max_pipeline:
+				self.paused = True
+				blankie.ioloop.remove_reader(self.socket)
+			self.server.module.server_request(self, line)
+			if self.closed:
+				return
+
+	def on_writable(self):
 		try:
-			super().process_request_thread(request, client_address)
-		finally:
-			with self.request_lock:
-				self.requests.remove(request)
+			sent = self.socket.send(self.output)
+		except BlockingIOError:
+			return
+		except OSError:
+			self.close()
+			return
+		self.output = self.output[sent:]
+		if not self.output:
+			blankie.ioloop.remove_writer(self.socket)
+			if self.close_after_output:
+				self.close()
+			else:
+				self.finish()
+
+	def write(self, data, close):
+		if self.closed:
+			return
+		self.output += data
+		self.close_after_output |= close
+		if self.output:
+			blankie.ioloop.add_writer(self.socket, self.on_writable)
+		elif self.close_after_output:
+			self.close()
+
+	def write_event(self, line):
+		if len(self.output) + len(line) > self.max_watch_buffer:
+			self.server.module.log.warning('Dropping watch client which is not reading events.')
+			self.close()
+			return
+		self.write(line, False)
+
+	def write_reply(self, request_id, result, error):
+		if self.closed:
+			return
+		reply = {'id': request_id}
+		if error is not None:
+			reply['error'] = error
+		else:
+			reply['result'] = result.decode('utf-8', errors='replace')
+		self.outstanding -= 1
+		self.write(json.dumps(reply).encode() + b'\n', False)
+
+		if self.paused and self.outstanding < self.max_pipeline and not self.eof:
+			self.paused = False
+			blankie.ioloop.add_reader(self.socket, self.on_readable)
+			self.process_input()
+		self.finish()
+
+	def finish(self):
+		# Close a framed connection which the peer closed, once all
+		# replies have been sent.
+		if self.eof and not self.outstanding and not self.output:
+			self.close()
+
+	def close(self, force=False):
+		if self.closed:
+			return
+
+		if self.wake_lock and not self.releasing:
+			# Release the wake-lock first, and only then close the
+			# connection, so that the client knows that the lock is
+			# released once it sees the connection closed.
+			# server_wake_lock_release will call us again.
+			self.releasing = True
+			blankie.ioloop.remove_reader(self.socket)
+			blankie.ioloop.remove_writer(self.socket)
+			blankie.daemon.call(self.server.module.server_wake_lock_release, self)
+			if not force:
+				return
+
+		self.closed = True
+		# Forget the connection before the peer can see it closed.
+		self.server.connections.discard(self)
+		self.server.watchers.discard(self)
+		blankie.ioloop.remove_reader(self.socket)
+		blankie.ioloop.remove_writer(self.socket)
+		self.socket.close()
+
+	# Any thread:
+
+	def send(self, data, close=False):
+		'''Send data, and optionally close the connection after.'''
+		blankie.ioloop.call_soon(self.write, data, close)
+
+	def reply(self, request_id, result=b'', error=None):
+		'''Send the reply to a framed request.'''
+		blankie.ioloop.call_soon(self.write_reply, request_id, result, error)
+
+	def shutdown(self):
+		blankie.ioloop.call_soon(self.close)
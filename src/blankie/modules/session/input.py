@@ -0,0 +1,233 @@
+# blankie.modules.session.input - input device session module
+# Reads the kernel's input devices (/dev/input/event*) directly, and
+# considers the system active whenever any of them reports user input
+# (key presses, pointer motion...).  Unlike X11 and TTY sessions, this
+# does not depend on a display or a terminal, and so also covers
+# console-only setups, or machines which are used without either
+# (e.g. media centres).
+#
+# The devices are read on the shared I/O thread (see blankie.ioloop),
+# along with an inotify watch on their directory, so that devices
+# which are plugged in later are picked up.  Only the type of each
+# event is looked at.
+#
+# Input devices may report hundreds of events per second.  Only input
+# after the system was idle for at least the first idle threshold (an
+# idle -> active edge) causes a module update; other input only
+# refreshes the combined idle time (see blankie.idle).  Both are rate
+# limited, and the I/O thread posts at most one call for them at a
+# time.
+#
+# Reading input devices usually requires membership in the "input"
+# group.
+
+import functools
+import math
+import os
+import struct
+import time
+
+import inotify_simple
+
+import blankie
+import blankie.daemon
+import blankie.ioloop
+
+# struct input_event (see linux/input.h): struct timeval time;
+# __u16 type; __u16 code; __s32 value.
+_event_size = struct.calcsize('@llHHi')
+_type_offset = struct.calcsize('@ll')
+
+# Event types which indicate user input.  Others (EV_SYN, EV_MSC,
+# EV_LED...) accompany these, or are not caused by the user.
+EV_KEY = 1
+EV_REL = 2
+EV_ABS = 3
+activity_types = frozenset((EV_KEY, EV_REL, EV_ABS))
+
+class InputSession(blankie.session.Session):
+	name = 'session.input'
+
+	# Minimum number of seconds between module updates or idle time
+	# refreshes triggered by input.
+	min_update_interval = 1
+
+	# Maximum number of bytes read from a device at once.
+	read_size = _event_size * 64
+
+	def __init__(self, directory='/dev/input'):
+		super().__init__()
+		self.directory = directory
+
+		# inotify instance watching the directory.
+		self.inotify = None
+
+		# Device name -> file descriptor, for the open devices.
+		# Accessed on the I/O thread.
+		self.devices = {}
+
+		# When we last saw input (seconds since the UNIX epoch), or
+		# None if the session was not started.  Written on the I/O
+		# thread.
+		self.last_input = None
+
+		# Whether input was reported to the main thread, which did not
+		# refresh the idle time yet (see input_update).  Set on the I/O
+		# thread, and cleared on the main thread.
+		self.activity_pending = False
+
+		# Time of the input before the pending activity (seconds since
+		# the UNIX epoch), and when the pending activity started.
+		self.pending_since = None
+		self.pending_input = None
+
+		# When we last updated the modules or refreshed the idle time
+		# (per time.monotonic), and the TimerHandle of a deferred
+		# update or refresh.
+		self.last_update = -math.inf
+		self.update_timer = None
+
+	def start(self):
+		# We cannot know about input before we started watching; count
+		# attaching as activity.
+		self.last_input = time.time()
+		self.inotify = inotify_simple.INotify(nonblocking=True)
+		self.inotify.add_watch(self.directory, (
+			inotify_simple.flags.CREATE |
+			# udev creates device nodes, then sets their permissions.
+			inotify_simple.flags.ATTRIB |
+			inotify_simple.flags.MOVED_TO |
+			inotify_simple.flags.MOVED_FROM |
+			inotify_simple.flags.DELETE
+		))
+		blankie.ioloop.run_sync(self.start_reading)
+		self.log.debug('Watching %d input devices in %r.', len(self.devices), self.directory)
+		super().start()
+
+	def stop(self):
+		super().stop()
+		if self.update_timer is not None:
+			self.update_timer.cancel()
+			self.update_timer = None
+		if self.inotify is not None:
+			blankie.ioloop.run_sync(self.stop_reading)
+			self.inotify = None
+
+	def get_idle_since(self):
+		if self.last_input is None:
+			return math.nan
+		return self.last_input
+
+	# I/O thread:
+
+	def start_reading(self):
+		blankie.ioloop.add_reader(self.inotify, self.on_directory_change)
+		for name in sorted(os.listdir(self.directory)):
+			self.open_device(name)
+
+	def stop_reading(self):
+		for name in list(self.devices):
+			self.close_device(name)
+		blankie.ioloop.remove_reader(self.inotify)
+		self.inotify.close()
+
+	def open_device(self, name):
+		if not name.startswith('event') or name in self.devices:
+			return
+		path = os.path.join(self.directory, name)
+		try:
+			fd = os.open(path, os.O_RDONLY | os.O_NONBLOCK | os.O_CLOEXEC)
+		except OSError as e:
+			# Possibly not readable yet (see ATTRIB above), or not
+			# readable by us at all.
+			self.log.debug('Cannot open %r: %s', path, e)
+			return
+		self.devices[name] = fd
+		blankie.ioloop.add_reader(fd, functools.partial(self.on_device_readable, name))
+
+	def close_device(self, name):
+		fd = self.devices.pop(name, None)
+		if fd is not None:
+			blankie.ioloop.remove_reader(fd)
+			os.close(fd)
+
+	def on_directory_change(self):
+		for event in self.inotify.read(timeout=0):
+			if event.mask & (inotify_simple.flags.DELETE | inotify_simple.flags.MOVED_FROM):
+				self.close_device(event.name)
+			else:
+				self.open_device(event.name)
+
+	def on_device_readable(self, name):
+		fd = self.devices.get(name)
+		if fd is None:
+			return
+		try:
+			data = os.read(fd, self.read_size)
+		except BlockingIOError:
+			return
+		except OSError as e:
+			# ENODEV once the device is unplugged.
+			self.log.debug('Closing input device %r: %s', name, e)
+			data = b''
+		if not data:
+			self.close_device(name)
+			return
+
+		types = memoryview(data[:len(data) - len(data) % 2]).cast('H')
+		step = _event_size // 2
+		if any(event_type in activity_types for event_type in types[_type_offset // 2::step]):
+			self.record_input()
+
+	def record_input(self):
+		now = time.time()
+		previous = self.last_input
+		self.last_input = now
+		if not self.activity_pending:
+			self.activity_pending = True
+			blankie.daemon.call(self.handle_activity, previous, now)
+
+	# Main thread:
+
+	def handle_activity(self, previous, now):
+		'''Called after input, with the time of the input before it and
+		of the input itself.  Further input is not reported until the
+		idle time is refreshed.'''
+		if self.inotify is None:
+			return  # Stopped
+		self.pending_since = previous
+		self.pending_input = now
+
+		delay = self.last_update + self.min_update_interval - time.monotonic()
+		if delay > 0:
+			self.update_timer = blankie.daemon.call_later(delay, self.input_update)
+			return
+		self.input_update()
+
+	def input_update(self):
+		'''Refresh the idle time, and update the modules if the pending
+		activity followed a pause long enough for the system to be
+		considered idle.'''
+		self.update_timer = None
+		if self.inotify is None:
+			return  # Stopped
+		self.last_update = time.monotonic()
+		# If the configuration did not check the idle time the last
+		# time it ran (e.g. while locked), we cannot tell whether this
+		# is an edge; assume it is.
+		threshold = min(blankie.config.configurator.idle_checks, default=None)
+		edge = threshold is None or self.pending_input - self.pending_since >= threshold
+		self.pending_since = self.pending_input = None
+		# Input from now on is reported again.  Cleared before the idle
+		# time is read (by the refresh, see blankie.idle), so that no
+		# input is missed.
+		self.activity_pending = False
+		self.invalidate()
+		if edge:
+			blankie.module.update()
+
+	def __str__(self):
+		return 'input devices: %d, last input: %s seconds ago' % (
+			len(self.devices),
+			time.time() - self.last_input,
+		)
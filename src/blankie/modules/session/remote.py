@@ -10,6 +10,9 @@ import blankie
 class RemoteSession(blankie.session.Session):
 	name = 'session.remote'
 
+	# Updated (and invalidated) by bus_packet.
+	notifies_changes = True
+
 	def __init__(self, instance_id):
 		super().__init__()
 		self.instance_id = instance_id
@@ -22,6 +25,7 @@ class RemoteSession(blankie.session.Session):
 		if packet['type'] == 'message':
 			if packet['message']['type'] == 'idle_since':
 				self.idle_since = packet['message']['idle_since']
+				self.invalidate()
 			elif packet['message']['type'] == 'lock' and not blankie.state.locked:
 				self.log.security(f'Locking (by remote instance {self.instance_id})')
 				blankie.lock()
@@ -1,10 +1,10 @@
 # blankie.modules.session.tty - Linux tty session module
 
 import os
-import pty
 import time
 
 import blankie
+import blankie.detect
 
 class TTYSession(blankie.session.Session):
 	name = 'session.tty'
@@ -15,12 +15,31 @@ class TTYSession(blankie.session.Session):
 	# File descriptor for the TTY.
 	fd = None
 
+	# Whether output to the TTY counts as activity (e.g. a long-running
+	# job printing its progress keeps the system from becoming idle).
+	# Input (read from the TTY by the programs running on it) always
+	# counts.
+	output_is_activity = True
+
+	# When input was last read from, and output last written to, the
+	# TTY (seconds since the UNIX epoch), or None if not known yet.
+	# While the tty_idle module watches the TTY, it keeps these up to
+	# date; otherwise, they are read from the device's timestamps
+	# (which the kernel only updates every few seconds) when the
+	# session is invalidated.
+	last_input = None
+	last_output = None
+
+	# Set by the tty_idle module while it watches the TTY.
+	watched = False
+
 	def __init__(self, tty):
 		super().__init__()
 		self.tty = tty
 
 	def start(self):
 		self.fd = os.open(self.tty, os.O_RDWR | os.O_NOCTTY)
+		self.read_timestamps()
 		super().start()
 
 	def stop(self):
@@ -30,7 +49,29 @@ class TTYSession(blankie.session.Session):
 			self.fd = None
 
 	def get_idle_since(self):
-		return os.path.getmtime(self.tty)
+		if self.last_input is None:
+			self.read_timestamps()
+		if self.output_is_activity:
+			return max(self.last_input, self.last_output)
+		return self.last_input
+
+	def invalidate(self):
+		super().invalidate()
+		if not self.watched:
+			self.last_input = None
+
+	def read_timestamps(self):
+		stat = os.stat(self.tty)
+		self.last_input = stat.st_atime
+		self.last_output = stat.st_mtime
+
+	def record_activity(self, last_input, last_output):
+		'''Called by the tty_idle module with the times of the latest
+		input and output it saw (or None).'''
+		if last_input is not None:
+			self.last_input = max(self.last_input or last_input, last_input)
+		if last_output is not None:
+			self.last_output = max(self.last_output or last_output, last_output)
 
 	def __str__(self):
 		return 'last modified: %s seconds ago' % (
@@ -38,9 +79,4 @@ class TTYSession(blankie.session.Session):
 		)
 
 
-def get_session():
-	try:
-		tty = os.ttyname(pty.STDERR_FILENO)
-		return (TTYSession.name, tty)
-	except Exception:
-		return None
+get_session = blankie.detect.get_tty_session
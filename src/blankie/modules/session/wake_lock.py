@@ -1,4 +1,5 @@
 # blankie.modules.session.wake_lock - Wake-lock session
+# Attached while any wake-lock is held (see blankie.wake_lock).
 
 import math
 
@@ -7,6 +8,7 @@ import blankie
 
 class WakeLockSession(blankie.session.Session):
 	name = 'session.wake_lock'
+	notifies_changes = True
 
 	def __init__(self, lock_id):
 		super().__init__()
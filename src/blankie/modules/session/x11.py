@@ -1,11 +1,10 @@
 # blankie.modules.session.x11 - X11 session module
 
 import math
-import os
-import subprocess
 import time
 
 import blankie
+import blankie.detect
 
 class X11Session(blankie.session.Session):
 	name = 'session.x11'
@@ -15,7 +14,7 @@ class X11Session(blankie.session.Session):
 
 	# Whether we are currently idle (according to X / xss).
 	# Because xss is affected by X screen-saver inhibitors,
-	# this may be False even if xprintidle would produce a large number.
+	# this may be False even if the X server reports a long idle time.
 	#
 	# More precisely, this is defined as follows: if this is False, we
 	# are guaranteed to receive an event (which will make this
@@ -26,22 +25,66 @@ class X11Session(blankie.session.Session):
 	# Point in time since the X server is idle, in seconds since UNIX epoch
 	idle_since = -1
 
+	# The value above is kept until xss (or anything else) calls
+	# invalidate().
+	notifies_changes = True
+
+	# Connection to the X server (Xlib.display.Display), used to query
+	# the idle time.  Opened on first use, and kept open until the
+	# session stops (or the connection fails).
+	connection = None
+
 	def __init__(self, display):
 		super().__init__()
 		self.display = display
 
+	def stop(self):
+		super().stop()
+		self.disconnect()
+
 	def get_idle_since(self):
 		if not self.idle:
 			return math.inf
 		if self.idle_since == -1:
-			idle_time = int(subprocess.check_output(
-				['xprintidle'],
-				env=dict(os.environ, DISPLAY=self.display)
-			)) / 1000
-			self.idle_since = time.time() - idle_time
+			self.idle_since = time.time() - self.query_idle_time()
 		return self.idle_since
 
+	def query_idle_time(self):
+		'''Return the number of seconds since the last input, according
+		to the MIT-SCREEN-SAVER extension (like xprintidle).'''
+		try:
+			return self.query_info().idle / 1000
+		except Exception:
+			# The X server may have been restarted, or the connection
+			# otherwise broken since the last query.  Try once more,
+			# with a new connection.
+			self.log.debug('Idle time query failed, reconnecting.', exc_info=True)
+			self.disconnect()
+			return self.query_info().idle / 1000
+
+	def query_info(self):
+		if self.connection is None:
+			self.connection = self.connect()
+		# python-xlib adds the extension's requests to windows, not to
+		# the display.
+		return self.connection.screen().root.screensaver_query_info()
+
+	def connect(self):
+		# Imported here, as importing Xlib is comparatively slow, and
+		# not needed by daemons without X11 sessions.
+		import Xlib.display
+		return Xlib.display.Display(self.display)
+
+	def disconnect(self):
+		if self.connection is not None:
+			try:
+				self.connection.close()
+			except Exception:
+				pass  # Already broken
+			self.connection = None
+
 	def invalidate(self):
+		super().invalidate()
 		self.idle_since = -1
 
 	def __str__(self):
@@ -50,7 +93,4 @@ class X11Session(blankie.session.Session):
 		)
 
 
-def get_session():
-	if 'DISPLAY' in os.environ:
-		return (X11Session.name, os.environ['DISPLAY'])
-	return None
+get_session = blankie.detect.get_x11_session
@@ -0,0 +1,35 @@
+# blankie.modules.state_file - core on_start module
+# Keeps the memory-mapped state file (see blankie.state_file) up to
+# date, by writing each published state snapshot to it.
+
+import blankie
+import blankie.snapshot
+import blankie.state_file
+
+class StateFileModule(blankie.module.Module):
+	name = 'state_file'
+
+	def __init__(self):
+		super().__init__()
+
+		# blankie.state_file.Writer instance.
+		self.writer = None
+
+	def start(self):
+		self.writer = blankie.state_file.Writer()
+		blankie.snapshot.listeners.append(self.state_file_write)
+		self.state_file_write(blankie.snapshot.publish())
+
+	def stop(self):
+		blankie.snapshot.listeners.remove(self.state_file_write)
+		self.writer.close()
+		self.writer = None
+
+	def state_file_write(self, snapshot):
+		self.writer.write(
+			locked=snapshot.locked,
+			sleeping=snapshot.sleeping,
+			running=True,
+			sessions=len(snapshot.sessions),
+			idle_since=snapshot.idle_since,
+		)
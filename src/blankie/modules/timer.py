@@ -4,7 +4,6 @@
 # accordingly.
 
 import math
-import threading
 import time
 
 import blankie
@@ -20,18 +19,27 @@ class TimerModule(blankie.module.Module):
 		# seconds of idle time).
 		self.timer_schedule = schedule
 
-		# Timer instance, which waits until the next event
+		# TimerHandle of the call scheduled for the next event
 		self.timer = None
+		# The idle time (in seconds) at which it is scheduled
+		self.timer_idle_time = None
+
+		self.timer_running = False
 
 	def start(self):
+		self.timer_running = True
+		blankie.events.subscribe(self.timer_handle_event)
 		self.timer_start_next()
 
 	def stop(self):
+		if self.timer_running:
+			blankie.events.unsubscribe(self.timer_handle_event)
+			self.timer_running = False
 		self.timer_cancel()
 
 	def timer_cancel(self):
 		if self.timer is not None:
-			self.log.debug('Canceling old timer wait task.')
+			self.log.debug('Canceling old timer.')
 			self.timer.cancel()
 			self.timer = None
 
@@ -48,21 +56,37 @@ class TimerModule(blankie.module.Module):
 				next_time = timeout
 
 		if next_time < math.inf:
-			to_sleep = next_time - idle_time + 1
-			self.timer = threading.Timer(
-				interval=to_sleep,
-				function=blankie.daemon.call,
-				args=(self.timer_handle_done,)
-			)
-			self.timer.daemon = True
-			self.timer.start()
+			to_sleep = next_time - idle_time
+			self.timer = blankie.daemon.call_later(to_sleep, self.timer_handle_done)
+			self.timer_idle_time = next_time
 			self.log.debug('Started new timer for %s seconds.', to_sleep)
 
 	def timer_handle_done(self):
 		self.log.debug('Timer fired.')
-		self.timer = None  # It exited cleanly, no need to cancel it.
+		self.timer = None  # It fired, no need to cancel it.
+		blankie.events.emit('idle', seconds=self.timer_idle_time)
 		for session in blankie.session.get_sessions():
 			session.invalidate()
 		blankie.module.update()
 
 		self.timer_start_next()
+
+	def timer_handle_event(self, event):
+		if event['event'] == 'idle_since':
+			# The idle time changed outside of the schedule (e.g. a
+			# remote session became active): the timer is now too
+			# early or too late.
+			blankie.daemon.call(self.timer_handle_idle_change, coalesce_key=self)
+
+	def timer_handle_idle_change(self):
+		if not self.timer_running:
+			return
+		# If the idle time moved back past an is_idle_for() threshold,
+		# the configuration must act on it.  Otherwise (e.g. activity
+		# while already active), rescheduling is enough: the timer
+		# catches thresholds crossed from now on.
+		if blankie.config.configurator.inputs_changed():
+			blankie.module.update()
+			if not self.timer_running:
+				return
+		self.timer_start_next()
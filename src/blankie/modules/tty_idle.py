@@ -1,15 +1,114 @@
 # blankie.modules.tty_idle - built-in on_start module
 # Monitors the timestamps of TTY devices, so that Blankie can be
 # notified when a TTY stops being idle.
+#
+# The times of the latest input and output seen on each TTY are
+# passed on to its session (see TTYSession.record_activity), so that
+# it does not need to look at the device's timestamps.  Output is only
+# watched if it counts as activity (see TTYSession.output_is_activity).
+#
+# A busy TTY may see activity many times per second.  Activity on a TTY
+# which was active recently enough does not change anything the
+# configuration depends on, so only activity after the TTY was quiet
+# for at least the first idle threshold (an idle -> active edge)
+# causes a module update.  Other activity only refreshes the combined
+# idle time (see blankie.idle), so that e.g. remote peers and watchers
+# keep seeing the system as active.  Both are rate limited.
 
 import threading
+import time
 
 import inotify_simple
 
 import blankie
 import blankie.daemon
+import blankie.ioloop
 import blankie.modules.session.tty
 
+# Counts of inotify events received, of the (coalesced) calls of the
+# handler on the main thread, of the module updates and idle time
+# refreshes triggered, and of those which were deferred (when rate
+# limited).  Shown by "blankie stats".
+stats = {
+	'events': 0,
+	'handled': 0,
+	'updates': 0,
+	'refreshes': 0,
+	'deferred': 0,
+}
+
+class INotifyWatcher:
+	'''A single inotify instance, watching the TTYs of all TTY sessions.
+	Read on the shared I/O thread (see blankie.ioloop), which passes
+	events on to the per-session modules, by watch descriptor.'''
+
+	def __init__(self):
+		self.inotify = inotify_simple.INotify(nonblocking=True)
+
+		# Watch descriptor -> per-session modules watching it.  More
+		# than one session may refer to the same device (e.g. via a
+		# symlink), in which case the kernel returns the same watch
+		# descriptor for them.  Accessed from the main and I/O
+		# threads.
+		self.lock = threading.Lock()
+		self.watches = {}
+
+		blankie.ioloop.add_reader(self.inotify, self.on_readable)
+
+	def add(self, module):
+		'''Start watching module.tty.  Return the watch descriptor.'''
+		flags = inotify_simple.flags.ACCESS | inotify_simple.flags.DELETE_SELF
+		if blankie.modules.session.tty.TTYSession.output_is_activity:
+			flags |= inotify_simple.flags.MODIFY
+		wd = self.inotify.add_watch(module.tty, flags)
+		with self.lock:
+			self.watches.setdefault(wd, []).append(module)
+		return wd
+
+	def remove(self, module, wd):
+		'''Stop passing events for wd to module.  Return True if nothing
+		is being watched any more.'''
+		with self.lock:
+			modules = self.watches.get(wd, [])
+			if module in modules:
+				modules.remove(module)
+			if modules:
+				return False
+			if self.watches.pop(wd, None) is not None:
+				try:
+					self.inotify.rm_watch(wd)
+				except OSError:
+					pass  # Already removed by the kernel (device deleted)
+			return not self.watches
+
+	def on_readable(self):
+		events = self.inotify.read(timeout=0)
+		now = time.time()
+		with self.lock:
+			for event in events:
+				stats['events'] += 1
+				modules = self.watches.get(event.wd, ())
+				if event.mask & inotify_simple.flags.IGNORED:
+					# The kernel removed the watch (the device is gone).
+					self.watches.pop(event.wd, None)
+				for module in modules:
+					if event.mask & inotify_simple.flags.ACCESS:
+						module.input_time = now
+					if event.mask & inotify_simple.flags.MODIFY:
+						module.output_time = now
+					# A busy TTY can generate a flood of events; one
+					# pending call is enough for all of them.
+					blankie.daemon.call(module.tty_idle_handle_event, event.wd, coalesce_key=module)
+
+	def close(self):
+		blankie.ioloop.remove_reader(self.inotify)
+		# Closed on the I/O thread (after the reader was removed), so
+		# that it is not closed while on_readable is reading it.
+		blankie.ioloop.run_sync(self.inotify.close)
+
+# The watcher shared by all TTY sessions, while there are any.
+watcher = None
+
 class TTYIdlePerSessionModule(blankie.module.Module):
 	name = 'internal-tty_idle-session'
 
@@ -18,56 +117,86 @@ class TTYIdlePerSessionModule(blankie.module.Module):
 		self.tty = session_spec[1]
 		self.session = blankie.module.get(session_spec)
 
-		# inotify object and watch descriptor
-		self.inotify = inotify_simple.INotify()
+		# inotify watch descriptor (in watcher)
 		self.inotify_wd = None
 
-		# Reader thread
-		self.tty_thread = None
+		# When we last saw input / output on the TTY (seconds since
+		# the UNIX epoch), or None.  Set on the I/O thread.
+		self.input_time = None
+		self.output_time = None
+
+		# When we last triggered a module update or idle time refresh
+		# (per time.monotonic), the TimerHandle of a deferred one, and
+		# whether it should update the modules.
+		self.last_update = -float('inf')
+		self.update_timer = None
+		self.update_pending = False
+
+	# Minimum number of seconds between module updates or idle time
+	# refreshes triggered by one TTY.
+	min_update_interval = 1
 
 	# Implementation:
 
 	def start(self):
-		flags = (
-			inotify_simple.flags.MODIFY |
-			inotify_simple.flags.DELETE_SELF
-		)
-		self.inotify_wd = self.inotify.add_watch(self.tty, flags)
-
-		# Start thread
-		self.tty_thread = INotifyThread(daemon=True)
-		self.tty_thread.module = self
-		self.tty_thread.start()
+		global watcher
+		if watcher is None:
+			watcher = INotifyWatcher()
+		self.inotify_wd = watcher.add(self)
+		self.session.watched = True
 
 	def stop(self):
-		if self.tty_thread is not None:
-			self.tty_thread.stop = True
-			# This will generate an event, which will cause the thread
-			# to exit.
-			self.inotify.rm_watch(self.inotify_wd)
-
-			self.tty_thread.join()
-			self.tty_thread = None
+		global watcher
+		if self.update_timer is not None:
+			self.update_timer.cancel()
+			self.update_timer = None
+		if self.inotify_wd is not None:
+			self.session.watched = False
+			wd = self.inotify_wd
+			self.inotify_wd = None
+			if watcher.remove(self, wd):
+				watcher.close()
+				watcher = None
 
 			self.log.debug('Done.')
 
-	def tty_idle_handle_event(self, thread):
-		if thread is not self.tty_thread:
+	def tty_idle_handle_event(self, wd):
+		if wd != self.inotify_wd:
 			self.log.debug('Ignoring stale TTY inotify event')
 			return
-		self.session.invalidate()
-		blankie.module.update()
-
-
-class INotifyThread(threading.Thread):
-	stop = False
-	module = None
+		stats['handled'] += 1
+
+		previous_idle_since = self.session.get_idle_since()
+		self.session.record_activity(self.input_time, self.output_time)
+		idle_since = self.session.get_idle_since()
+		if idle_since == previous_idle_since:
+			return  # The activity does not count
+		# If the configuration did not check the idle time the last
+		# time it ran (e.g. while locked), we cannot tell whether this
+		# is an edge; assume it is.
+		threshold = min(blankie.config.configurator.idle_checks, default=None)
+		if threshold is None or idle_since - previous_idle_since >= threshold:
+			self.update_pending = True
+
+		delay = self.last_update + self.min_update_interval - time.monotonic()
+		if delay > 0:
+			if self.update_timer is None:
+				stats['deferred'] += 1
+				self.update_timer = blankie.daemon.call_later(delay, self.tty_idle_update)
+			return
+		self.tty_idle_update()
 
-	def run(self):
-		for _ in self.module.inotify.read():
-			if self.stop:
-				return
-			blankie.daemon.call(self.module.tty_idle_handle_event, self)
+	def tty_idle_update(self):
+		self.update_timer = None
+		self.last_update = time.monotonic()
+		# Also refreshes the combined idle time (see blankie.idle).
+		self.session.invalidate()
+		if self.update_pending:
+			self.update_pending = False
+			stats['updates'] += 1
+			blankie.module.update()
+		else:
+			stats['refreshes'] += 1
 
 
 class TTYIdleModule(blankie.session.PerSessionModuleLauncher):
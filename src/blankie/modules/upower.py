@@ -13,6 +13,7 @@ import blankie.daemon
 
 class UPowerModule(blankie.module.Module):
 	name = 'upower'
+	concurrent = True
 
 	def __init__(self):
 		super().__init__()
@@ -51,7 +52,8 @@ class UPowerModule(blankie.module.Module):
 
 	def upower_reader(self, f):
 		while f.readline():
-			blankie.daemon.call(self.upower_handle_ping)
+			# upower prints several lines per change.
+			blankie.daemon.call(self.upower_handle_ping, coalesce_key=self)
 
 	def upower_handle_ping(self):
 		self.log.debug('Got a line from upower, reconfiguring.')
@@ -26,6 +26,7 @@ def _parse_config(args):
 
 class XBacklightModule(blankie.module.Module):
 	name = 'xbacklight'
+	concurrent = True
 
 	def __init__(self, *args):
 		super().__init__()
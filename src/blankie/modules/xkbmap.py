@@ -10,6 +10,7 @@ import blankie.config
 
 class XKBMapPerSessionModule(blankie.module.Module):
 	name = 'internal-xkbmap-session'
+	concurrent = True
 
 	def __init__(self, session_spec, *args):
 		super().__init__()
@@ -11,6 +11,7 @@ import blankie.config
 
 class XSetPerSessionModule(blankie.module.Module):
 	name = 'internal-xset-session'
+	concurrent = True
 
 	def __init__(self, session_spec, time):
 		super().__init__()
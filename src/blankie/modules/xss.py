@@ -1,7 +1,12 @@
 # blankie.modules.xss - built-in on_start module
-# Manages an instance of a helper program, which receives screen saver
-# events from the X server.  Used to know when the system becomes or
-# stops being idle.
+# Acts as the X screen saver (see blankie.xss_helper), to receive
+# screen saver events from the X server.  Used to know when the system
+# becomes or stops being idle.
+#
+# The screen saver's connection to the X server is read on the shared
+# I/O thread (see blankie.ioloop).  If that cannot be set up, a helper
+# program (python -m blankie.xss_helper) is run instead, and its
+# output read by a thread.
 
 import os
 import subprocess
@@ -10,16 +15,26 @@ import threading
 
 import blankie
 import blankie.daemon
+import blankie.ioloop
 import blankie.modules.session.x11
 
 class XSSPerSessionModule(blankie.module.Module):
 	name = 'internal-xss-session'
+	concurrent = True
+
+	# Whether to run the screen saver in the daemon, rather than in a
+	# helper process (which costs a Python interpreter per display).
+	# The helper process is still used if this fails.
+	in_process = True
 
 	def __init__(self, session_spec):
 		super().__init__()
 		self.display = session_spec[1]
 		self.session = blankie.module.get(session_spec)
 
+		# blankie.xss_helper.ScreenSaver running in the daemon
+		self.screen_saver = None
+
 		# xss Popen object
 		self.xss_process = None
 
@@ -29,8 +44,16 @@ class XSSPerSessionModule(blankie.module.Module):
 	# Implementation:
 
 	def start(self):
+		if self.screen_saver is None and self.xss_process is None and self.in_process:
+			try:
+				self.xss_start_in_process()
+				self.log.debug('Started the screen saver in-process.')
+				return
+			except Exception as e:
+				self.log.warning('Failed to start the screen saver in-process (%s); falling back to xss.', e)
+
 		# Start xss
-		if self.xss_process is None:
+		if self.screen_saver is None and self.xss_process is None:
 			self.xss_process = subprocess.Popen(
 				[sys.executable, '-m', 'blankie.xss_helper'],
 				stdout = subprocess.PIPE,
@@ -59,6 +82,12 @@ class XSSPerSessionModule(blankie.module.Module):
 			self.log.debug('Started xss (PID %d).', self.xss_process.pid)
 
 	def stop(self):
+		if self.screen_saver is not None:
+			screen_saver = self.screen_saver
+			blankie.ioloop.run_sync(self.xss_stop_reading)
+			self.xss_close(screen_saver)
+			self.log.debug('Stopped the in-process screen saver.')
+
 		# Stop xss
 		if self.xss_process is not None:
 			self.log.debug('Killing xss (PID %d)...', self.xss_process.pid)
@@ -71,9 +100,67 @@ class XSSPerSessionModule(blankie.module.Module):
 
 			self.log.debug('Done.')
 
+	# In-process screen saver.  Until it is handed over to the I/O
+	# thread, and once it is taken back, the connection is only used by
+	# the thread starting or stopping the module.
+
+	def xss_start_in_process(self):
+		# Imported here, as importing Xlib is comparatively slow, and
+		# not needed by daemons without X11 sessions.
+		import Xlib.display
+		import blankie.xss_helper
+
+		display = Xlib.display.Display(self.display)
+		screen_saver = blankie.xss_helper.ScreenSaver(display, self.xss_notify)
+		try:
+			screen_saver.start()
+		except:
+			self.xss_close(screen_saver)
+			raise
+		blankie.ioloop.run_sync(self.xss_start_reading, screen_saver)
+
+	def xss_start_reading(self, screen_saver):
+		self.screen_saver = screen_saver
+		blankie.ioloop.add_reader(screen_saver.d, self.xss_on_readable)
+		# Events may already have been received while starting.
+		self.xss_on_readable()
+
+	def xss_stop_reading(self):
+		blankie.ioloop.remove_reader(self.screen_saver.d)
+		self.screen_saver = None
+
+	def xss_close(self, screen_saver):
+		try:
+			screen_saver.stop()
+			screen_saver.d.close()
+		except Exception as e:
+			# E.g. the X server is already gone.
+			self.log.debug('Error closing the X connection: %s', e)
+
+	def xss_on_readable(self):
+		try:
+			self.screen_saver.handle_pending_events()
+		except Exception as e:
+			# Like xss exiting: the X server went away.
+			self.log.debug('X connection lost: %s', e)
+			blankie.ioloop.remove_reader(self.screen_saver.d)
+
+	def xss_notify(self, state, kind, forced):
+		args = (b'notify', state.encode(), kind.encode(), forced.encode())
+		# Only the latest state matters (see xss_reader).
+		blankie.daemon.call(self.xss_handle_event, *args, coalesce_key=(self, b'notify'))
+
+	# Helper process:
+
 	def xss_reader(self, f):
 		while line := f.readline():
-			blankie.daemon.call(self.xss_handle_event, *line.split())
+			args = line.split()
+			if args[:1] == [b'notify']:
+				# Only the latest state matters, so there is no need to
+				# run an update for each event in a burst.
+				blankie.daemon.call(self.xss_handle_event, *args, coalesce_key=(self, b'notify'))
+			else:
+				blankie.daemon.call(self.xss_handle_event, *args)
 		self.log.debug('xss exited (EOF).')
 
 	def xss_handle_event(self, *args):
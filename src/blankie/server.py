@@ -12,6 +12,9 @@ import blankie
 # Path to the UNIX socket filesystem object.
 path = os.environ.setdefault('BLANKIE_SOCKET', blankie.run_dir + '/daemon.sock')
 
+# Daemon's PID file.
+pid_file = blankie.run_dir + '/daemon.pid'
+
 # -----------------------------------------------------------------------------
 # Daemon communication
 
@@ -46,8 +49,8 @@ def query(*args):
 	return result
 
 # Hold a wake lock until the daemon closes the connection.
-def wake_lock():
-	with _send('wake-lock') as s:
+def wake_lock(reason=None):
+	with _send('wake-lock', *([] if reason is None else [reason])) as s:
 		with s.makefile('rb') as f:
 			acknowledgement = f.readline()
 			if acknowledgement != b'Wake lock acquired.\n':
@@ -55,3 +58,11 @@ def wake_lock():
 			sys.stdout.write('Wake lock acquired.\n')
 			sys.stdout.flush()
 			f.read()
+
+# Print events (as lines of JSON) until the daemon closes the connection.
+def watch():
+	with _send('watch') as s:
+		with s.makefile('rb') as f:
+			for line in f:
+				sys.stdout.buffer.write(line)
+				sys.stdout.flush()
@@ -1,7 +1,6 @@
 # blankie.session - session management
 
 import blankie
-from blankie.logging import log
 
 # -----------------------------------------------------------------------------
 # Session management
@@ -25,10 +24,16 @@ class Session(blankie.module.Module):
 	def get_idle_since(self):
 		raise NotImplementedError()
 
+	# Set to True if the value returned by get_idle_since only changes
+	# when invalidate is called (e.g. because the session calls it
+	# itself).  Otherwise, the session is asked again in each event
+	# loop task which needs it (see blankie.idle).
+	notifies_changes = False
+
 	# Requests that the next call to get_idle_since returns fresh
-	# results.
+	# results.  Subclasses which override this must call it too.
 	def invalidate(self):
-		pass
+		blankie.idle.invalidate(self)
 
 	# Ensure that PerSessionModuleLauncher instances have their lists
 	# synchronized.
@@ -43,6 +48,10 @@ class Session(blankie.module.Module):
 # (using the module selector below).
 session_specs = set()
 
+# Incremented whenever session_specs changes, so that selectors can
+# cheaply tell whether the attached sessions changed.
+generation = 0
+
 
 # Selector which keeps the session modules running.
 def session_selector(wanted_modules):
@@ -55,21 +64,31 @@ def attach(session_spec):
 	if session_spec in session_specs:
 		raise blankie.UserError('Already attached to this session')
 
+	global generation
 	try:
 		session_specs.add(session_spec)
+		generation += 1
+		blankie.idle.add(session_spec)
 		blankie.module.update()
 	except:
 		session_specs.remove(session_spec)
+		generation += 1
+		blankie.idle.remove(session_spec)
 		blankie.module.update()
 		raise
+	blankie.events.emit('attached', session=session_spec)
 
 
 def detach(session_spec):
 	if session_spec not in session_specs:
 		raise blankie.UserError('Already not attached to this session')
 
+	global generation
 	session_specs.remove(session_spec)
+	generation += 1
+	blankie.idle.remove(session_spec)
 	blankie.module.update()
+	blankie.events.emit('detached', session=session_spec)
 
 
 # Get all running Session objects.
@@ -107,37 +126,12 @@ class PerSessionModuleLauncher(blankie.module.Module):
 		return '40-' + repr(self) + '-' + self.session_type + '-' + self.name
 
 	def start(self):
-		blankie.module.selectors[self.per_session_selector_key()] = self.per_session_selector
+		blankie.module.selectors[self.per_session_selector_key()] = blankie.module.Selector(
+			self.per_session_selector,
+			lambda: blankie.module.running_changes[self.session_type],
+		)
 		blankie.module.update()
 
 	def stop(self):
 		del blankie.module.selectors[self.per_session_selector_key()]
 		blankie.module.update()
-
-
-# -----------------------------------------------------------------------------
-# Remote (CLI -> server) actions:
-
-# Returns a module spec suitable for attaching to the invoking
-# process's session, or None.
-def get_session():
-	from blankie.modules.session import x11, tty
-	return \
-		x11.get_session() or \
-		tty.get_session() or \
-		None
-
-# Ask the Blankie daemon to attach/detach to/from the given session that the
-# current process is running in.
-def remote_attach_or_detach(do_attach, session_spec=None):
-	if session_spec is None:
-		session_spec = get_session()
-	if session_spec is None:
-		raise blankie.UserError('No session detected.')
-	result = blankie.server.query('attach' if do_attach else 'detach', *session_spec)
-	if result == b'ok':
-		log.info('Attached to %r' if do_attach else 'Detached from %r', session_spec)
-	else:
-		log.critical('Failed to %s %r: %s',
-					 'attach to' if do_attach else 'detach from',
-					 session_spec, result)
@@ -0,0 +1,127 @@
+# blankie.snapshot - published copy of the daemon's state
+# The daemon's state (blankie.state, the running modules, the
+# sessions...) may only be accessed from the main thread.  To allow
+# read-only queries such as "blankie status" to be answered without
+# waiting for (or interrupting) the main event loop, a snapshot of it
+# is published after module updates, and when the combined idle time
+# changes (see blankie.idle).  Snapshots are immutable, and replaced
+# as a whole, so they can be read from any thread.
+
+import collections
+import io
+import json
+import math
+import time
+
+import blankie
+
+Snapshot = collections.namedtuple('Snapshot', [
+	# When the snapshot was taken (seconds since the UNIX epoch).
+	'time',
+	'locked',
+	'sleeping',
+	# Tuple of module specs.
+	'running_modules',
+	# Tuple of (session spec, idle since) pairs.  The idle since
+	# values are those cached by the sessions (see
+	# Session.get_idle_since).
+	'sessions',
+	# Tuple of module specs requested by the configuration.
+	'configured_modules',
+	# Combined idle since value (see blankie.get_idle_since).
+	'idle_since',
+	# Tuple of (id, pid, reason, acquired, expires) tuples, one per
+	# held wake-lock (see blankie.wake_lock).  expires is None unless
+	# the wake-lock is a lease.
+	'wake_locks',
+])
+
+# The latest snapshot, or None if none was published yet.
+current = None
+
+# Functions called (in the main thread) with each published snapshot.
+listeners = []
+
+def take():
+	'''Return a snapshot of the current state.  Runs in the main
+	thread.'''
+	sessions = tuple(
+		(spec, blankie.idle.get_session_idle_since(spec))
+		for spec in blankie.session.session_specs
+	)
+	return Snapshot(
+		time=time.time(),
+		locked=blankie.state.locked,
+		sleeping=blankie.state.sleeping,
+		running_modules=tuple(blankie.module.running_modules),
+		sessions=sessions,
+		configured_modules=tuple(blankie.config.configurator.modules),
+		idle_since=blankie.get_idle_since(),
+		wake_locks=tuple(
+			(holder.id, holder.pid, holder.reason, holder.acquired, holder.expires)
+			for holder in blankie.wake_lock.holders.values()
+		),
+	)
+
+def publish():
+	'''Take and publish a snapshot.  Runs in the main thread.'''
+	global current
+	current = take()
+	for listener in list(listeners):
+		listener(current)
+	return current
+
+def schedule():
+	'''Publish a snapshot once the main event loop is done with the
+	work queued so far.  Called after module updates, and when the
+	state otherwise changes.'''
+	blankie.daemon.call(publish, coalesce_key=publish)
+
+def format_text(snapshot):
+	'''Return the text printed by "blankie status".'''
+	f = io.BytesIO()
+	f.write(b'Currently locked: %r\n' % (snapshot.locked,))
+	f.write(b'Running modules:\n')
+	f.write(b''.join(b'- %r\n' % (m,) for m in snapshot.running_modules))
+	f.write(b'Sessions:\n')
+	for spec, idle_since in snapshot.sessions:
+		f.write(b'- %r - %r\n' % (spec, idle_since))
+	if snapshot.wake_locks:
+		f.write(b'Wake-lock holders:\n')
+		for wake_lock_id, pid, reason, acquired, expires in snapshot.wake_locks:
+			f.write(b'- %s, %s, for %.0f s%s\n' % (
+				b'lease %d' % wake_lock_id if expires is not None else
+				b'PID ?' if pid is None else
+				b'PID %d' % pid,
+				b'no reason given' if reason is None else repr(reason).encode(),
+				max(snapshot.time - acquired, 0),
+				b'' if expires is None else b', expires in %.0f s' % max(expires - snapshot.time, 0),
+			))
+	f.write(b'Configuration-requested modules:\n')
+	f.write(b''.join(b'- %r\n' % (spec,) for spec in snapshot.configured_modules))
+	f.write(b'State as of %.3f s ago.\n' % (max(time.time() - snapshot.time, 0),))
+	return f.getvalue()
+
+def _number(value):
+	# JSON has no infinities: null stands for "never idle".
+	return value if math.isfinite(value) else None
+
+def format_json(snapshot):
+	'''Return the text printed by "blankie status --json".'''
+	return json.dumps({
+		'time': snapshot.time,
+		'age': max(time.time() - snapshot.time, 0),
+		'locked': snapshot.locked,
+		'sleeping': snapshot.sleeping,
+		'idle_since': _number(snapshot.idle_since),
+		'running_modules': snapshot.running_modules,
+		'sessions': [
+			{'session': spec, 'idle_since': _number(idle_since)}
+			for spec, idle_since in snapshot.sessions
+		],
+		'configured_modules': snapshot.configured_modules,
+		'wake_locks': [
+			{'id': wake_lock_id, 'pid': pid, 'reason': reason, 'acquired': acquired, 'expires': expires}
+			for wake_lock_id, pid, reason, acquired, expires in snapshot.wake_locks
+		],
+	}, default=repr).encode() + b'\n'
@@ -0,0 +1,166 @@
+# blankie.state_file - memory-mapped state file
+# The daemon keeps a small file with a fixed layout in its runtime
+# directory (see the 'state_file' module), describing its current
+# state.  Programs which need to poll the state often (e.g. status
+# bars) can map it and read it, without talking to the daemon.
+#
+# Layout (little-endian, 40 bytes):
+#
+#   offset  size  field
+#   0       4     magic: b'BLNK'
+#   4       4     version (uint32): 1
+#   8       8     sequence (uint64)
+#   16      4     flags (uint32): LOCKED | SLEEPING | RUNNING
+#   20      4     number of sessions (uint32)
+#   24      8     idle since (double, seconds since the UNIX epoch;
+#                 +inf if the system cannot become idle, -inf if it
+#                 is going to sleep)
+#   32      8     time of the update (double, seconds since the UNIX
+#                 epoch)
+#
+# The sequence number is odd while the daemon is updating the file,
+# and incremented again once it is done.  Readers must check that it
+# is even, and unchanged after reading the other fields; otherwise,
+# they read a partial update and should retry.
+#
+# Like blankie.server, this module does not import the daemon's
+# modules, so that readers start quickly.
+
+import collections
+import mmap
+import os
+import struct
+import time
+
+import blankie
+
+# Path to the state file.
+path = blankie.run_dir + '/state'
+
+magic = b'BLNK'
+version = 1
+
+_header = struct.Struct('<4sI')
+_sequence = struct.Struct('<Q')
+_payload = struct.Struct('<IIdd')
+_sequence_offset = _header.size
+_payload_offset = _sequence_offset + _sequence.size
+size = _payload_offset + _payload.size
+
+LOCKED = 1
+SLEEPING = 2
+# Cleared when the daemon stops.
+RUNNING = 4
+
+State = collections.namedtuple('State', [
+	'locked',
+	'sleeping',
+	'running',
+	'sessions',
+	'idle_since',
+	'time',
+	'sequence',
+])
+
+class Writer:
+	'''Creates and updates the state file.  Used by the daemon.'''
+
+	def __init__(self, file_path=None):
+		self.path = file_path or path
+		self.sequence = 0
+
+		# Create the file under a temporary name, so that readers
+		# never see it incomplete.
+		temp_path = self.path + '.tmp'
+		fd = os.open(temp_path, os.O_RDWR | os.O_CREAT | os.O_TRUNC, 0o644)
+		try:
+			os.ftruncate(fd, size)
+			self.map = mmap.mmap(fd, size)
+		finally:
+			os.close(fd)
+		_header.pack_into(self.map, 0, magic, version)
+		self.write(locked=False, sleeping=False, running=False, sessions=0, idle_since=float('inf'))
+		os.rename(temp_path, self.path)
+
+	def write(self, locked, sleeping, running, sessions, idle_since):
+		flags = (
+			(LOCKED if locked else 0) |
+			(SLEEPING if sleeping else 0) |
+			(RUNNING if running else 0)
+		)
+		self.sequence += 1  # Odd: update in progress
+		_sequence.pack_into(self.map, _sequence_offset, self.sequence)
+		_payload.pack_into(self.map, _payload_offset, flags, sessions, idle_since, time.time())
+		self.sequence += 1
+		_sequence.pack_into(self.map, _sequence_offset, self.sequence)
+
+	def close(self, remove=True):
+		'''Mark the daemon as no longer running, and remove the file.'''
+		(flags, sessions, idle_since, _time) = _payload.unpack_from(self.map, _payload_offset)
+		self.write(
+			locked=flags & LOCKED,
+			sleeping=flags & SLEEPING,
+			running=False,
+			sessions=sessions,
+			idle_since=idle_since,
+		)
+		self.map.close()
+		if remove:
+			try:
+				os.remove(self.path)
+			except FileNotFoundError:
+				pass
+
+class Reader:
+	'''Maps the state file, to read it repeatedly.'''
+
+	def __init__(self, file_path=None):
+		self.path = file_path or path
+		with open(self.path, 'rb') as f:
+			self.map = mmap.mmap(f.fileno(), size, access=mmap.ACCESS_READ)
+		if _header.unpack_from(self.map, 0) != (magic, version):
+			self.map.close()
+			raise ValueError('%r is not a Blankie state file (version %d)' % (self.path, version))
+
+	def read(self, timeout=1):
+		'''Return the current State.'''
+		deadline = None
+		while True:
+			(sequence,) = _sequence.unpack_from(self.map, _sequence_offset)
+			if sequence % 2 == 0:
+				payload = _payload.unpack_from(self.map, _payload_offset)
+				if _sequence.unpack_from(self.map, _sequence_offset) == (sequence,):
+					break
+
+			# Caught the writer in the middle of an update; let it
+			# finish.
+			if deadline is None:
+				deadline = time.monotonic() + timeout
+			elif time.monotonic() > deadline:
+				raise TimeoutError('The state file is not being updated consistently')
+			time.sleep(0)
+
+		(flags, sessions, idle_since, update_time) = payload
+		return State(
+			locked=bool(flags & LOCKED),
+			sleeping=bool(flags & SLEEPING),
+			running=bool(flags & RUNNING),
+			sessions=sessions,
+			idle_since=idle_since,
+			time=update_time,
+			sequence=sequence,
+		)
+
+	def close(self):
+		self.map.close()
+
+	def __enter__(self):
+		return self
+
+	def __exit__(self, *exc_info):
+		self.close()
+
+def read(file_path=None):
+	'''Read the state file once, and return a State.'''
+	with Reader(file_path) as reader:
+		return reader.read()
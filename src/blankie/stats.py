@@ -0,0 +1,142 @@
+# blankie.stats - event loop instrumentation
+# Keeps fixed-size histograms of how long tasks wait in the event
+# queue and how long they take to run, per kind of task.  Shown by
+# "blankie stats".
+
+import bisect
+import sys
+import time
+
+import blankie
+
+class Histogram:
+	'''Counts samples in a fixed set of buckets.  Memory use does not
+	grow with the number of samples.'''
+
+	def __init__(self, bounds):
+		# Inclusive upper bounds of all buckets but the last, which
+		# counts everything above bounds[-1].
+		self.bounds = bounds
+		self.counts = [0] * (len(bounds) + 1)
+		self.count = 0
+		self.total = 0
+		self.max = 0
+
+	def add(self, value):
+		self.counts[bisect.bisect_left(self.bounds, value)] += 1
+		self.count += 1
+		self.total += value
+		self.max = max(self.max, value)
+
+	def percentile(self, p):
+		'''Return an upper bound of the p-th percentile (0 < p <= 100)
+		of the samples, i.e. the upper bound of the bucket it is in.'''
+		if not self.count:
+			return 0
+		rank = self.count * p / 100
+		seen = 0
+		for i, count in enumerate(self.counts):
+			seen += count
+			if seen >= rank:
+				break
+		if i < len(self.bounds):
+			return min(self.bounds[i], self.max)
+		return self.max
+
+# Bucket bounds for durations, in seconds: four buckets per decade,
+# from 10 microseconds to 100 seconds.
+duration_bounds = tuple(10 ** (e / 4) for e in range(-20, 9))
+
+# Bucket bounds for queue depths.
+depth_bounds = tuple(2 ** e for e in range(0, 13))
+
+class TaskStats:
+	'''Statistics for one kind of event loop task.'''
+
+	def __init__(self):
+		# Time from call() to the task starting to run.
+		self.latency = Histogram(duration_bounds)
+		# Time the task took to run.
+		self.duration = Histogram(duration_bounds)
+		# Number of tasks ahead of this one when it was queued.
+		self.depth = Histogram(depth_bounds)
+		# Number of times the task took longer than the slow-task
+		# threshold.
+		self.slow = 0
+		# Number of times the watchdog found the task to be stuck.
+		self.stalls = 0
+
+def task_kind(func):
+	'''Return the name which tasks calling func are grouped by.'''
+	name = getattr(func, '__qualname__', None) or type(func).__qualname__
+	module = getattr(func, '__module__', None)
+	if module is not None and module != 'blankie' and not module.startswith('blankie.'):
+		name = module + '.' + name
+	return name
+
+def _ms(seconds):
+	return seconds * 1000
+
+def report(event_loop):
+	'''Return the text printed by "blankie stats".'''
+	stats = event_loop.stats
+	lines = [
+		'Event loop: %d tasks executed, %d waiting (max %d), %d slow (over %g ms)' % (
+			stats['executed'],
+			event_loop.depth(),
+			stats['max_depth'],
+			stats['slow'],
+			_ms(blankie.daemon.slow_task_threshold),
+		),
+		'Posted tasks: %d, coalesced: %d, throttled: %d, overflow: %d' % (
+			stats['posted'],
+			stats['coalesced'],
+			stats['throttled'],
+			stats['overflow'],
+		),
+		'Selector calls: %d executed, %d skipped' % (
+			blankie.module.selector_stats['executed'],
+			blankie.module.selector_stats['skipped'],
+		),
+	]
+	tty_idle = sys.modules.get('blankie.modules.tty_idle')
+	if tty_idle is not None:
+		lines.append('TTY activity: %d events, %d handled, %d updates, %d refreshes (%d deferred)' % (
+			tty_idle.stats['events'],
+			tty_idle.stats['handled'],
+			tty_idle.stats['updates'],
+			tty_idle.stats['refreshes'],
+			tty_idle.stats['deferred'],
+		))
+	if event_loop.last_stall is not None:
+		(kind, duration, when) = event_loop.last_stall
+		lines.append('Stalls: %d, last: %s ran for over %.1f s at %s' % (
+			stats['stalls'],
+			kind,
+			duration,
+			time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(when)),
+		))
+	lines += [
+		'',
+		'Per task (times in ms; p50 / p99 / max):',
+	]
+
+	task_stats = sorted(
+		event_loop.task_stats.items(),
+		key=lambda item: item[1].duration.total,
+		reverse=True,
+	)
+	for kind, task in task_stats:
+		lines.append('- %s: %d runs, %d slow, %d stalled' % (kind, task.duration.count, task.slow, task.stalls))
+		for label, histogram, scale in (
+				('queued', task.latency, _ms),
+				('ran', task.duration, _ms),
+				('depth', task.depth, int),
+		):
+			lines.append('    %-6s %10.3f %10.3f %10.3f' % (
+				label,
+				scale(histogram.percentile(50)),
+				scale(histogram.percentile(99)),
+				scale(histogram.max),
+			))
+	return ''.join(line + '\n' for line in lines).encode()
@@ -0,0 +1,115 @@
+# blankie.wake_lock - wake-lock holders
+# Clients may hold wake-locks (see "blankie wake-lock"), which inhibit
+# locking and suspend while held.  All holders share one wake-lock
+# session, which is attached while at least one wake-lock is held.
+# Thus, only acquiring the first wake-lock or releasing the last one
+# causes modules to be started or stopped; wake-locks can be acquired
+# and released often, and by many clients, cheaply.
+#
+# Wake-locks are either held for as long as the client's connection
+# is open, or leased for a given duration ("blankie wake-lock --for"),
+# after which they expire unless renewed.  Expiry uses the event
+# loop's timers, so leases need no connection or thread.
+#
+# Only accessed from the main thread.
+
+import itertools
+import math
+import time
+
+import blankie
+from blankie.logging import log
+
+# The session representing all holders.
+session_spec = ('session.wake_lock', 'wake-lock')
+
+_ids = itertools.count(1)
+
+class Holder:
+	'''A held wake-lock.'''
+
+	def __init__(self, pid, reason):
+		self.id = next(_ids)
+		# Process ID of the client holding the wake-lock, if known.
+		self.pid = pid
+		# Description given by the client, if any.
+		self.reason = reason
+		# When the wake-lock was acquired (seconds since the UNIX
+		# epoch).
+		self.acquired = time.time()
+
+		# For leases: duration (in seconds) and expiry time (seconds
+		# since the UNIX epoch), and the TimerHandle which releases
+		# the wake-lock when it expires.
+		self.duration = None
+		self.expires = None
+		self.timer = None
+
+	def __repr__(self):
+		return 'Holder(%d, pid=%r, reason=%r)' % (self.id, self.pid, self.reason)
+
+# Currently held wake-locks, by ID, in order of acquisition.
+holders = {}
+
+def acquire(pid=None, reason=None):
+	'''Acquire a wake-lock, and return its Holder.'''
+	holder = Holder(pid, reason)
+	if not holders:
+		blankie.session.attach(session_spec)
+	holders[holder.id] = holder
+	blankie.snapshot.schedule()
+	return holder
+
+def release(holder):
+	'''Release a wake-lock acquired with acquire() or lease().
+	Releasing it again has no effect.'''
+	if holders.pop(holder.id, None) is None:
+		return
+	if holder.timer is not None:
+		holder.timer.cancel()
+		holder.timer = None
+	if not holders:
+		blankie.session.detach(session_spec)
+	blankie.snapshot.schedule()
+
+def _check_duration(duration):
+	# bool is an int subclass, but true/false is not a duration; NaN
+	# and infinity would make a timer which never fires (or fires at
+	# once).
+	if isinstance(duration, bool) or not isinstance(duration, (int, float)) or \
+	   not math.isfinite(duration) or duration <= 0:
+		raise blankie.UserError('Invalid wake-lock duration: %r' % (duration,))
+
+def lease(duration, pid=None, reason=None):
+	'''Acquire a wake-lock which is released after duration seconds,
+	unless renewed.  Returns its Holder.'''
+	_check_duration(duration)
+	holder = acquire(pid, reason)
+	holder.duration = duration
+	holder.expires = time.time() + duration
+	holder.timer = blankie.daemon.call_later(duration, _expire, holder)
+	return holder
+
+def _expire(holder):
+	log.debug('Wake-lock lease %d (%s) expired.', holder.id, holder.reason or 'no reason given')
+	holder.timer = None
+	release(holder)
+
+def get_lease(lease_id):
+	holder = holders.get(lease_id)
+	if holder is None or holder.timer is None:
+		raise blankie.UserError('No such wake-lock lease: %r (it may have expired)' % (lease_id,))
+	return holder
+
+def renew(lease_id, duration=None):
+	'''Extend a lease by duration seconds from now (by default, its
+	original duration).  Returns its Holder.'''
+	holder = get_lease(lease_id)
+	if duration is None:
+		duration = holder.duration
+	_check_duration(duration)
+	holder.duration = duration
+	holder.expires = time.time() + duration
+	holder.timer.reschedule(duration)
+	blankie.snapshot.schedule()
+	return holder
@@ -0,0 +1,120 @@
+# blankie.watchdog - detects stalls of the main event loop
+# All module callbacks run on the event loop thread, so a single
+# stuck task (e.g. an xset call against a wedged X server) stops the
+# daemon from handling anything else, including locking.  The
+# watchdog thread notices this, logs where the event loop is stuck,
+# and can optionally take action.
+
+import faulthandler
+import os
+import signal
+import sys
+import threading
+import time
+import traceback
+
+import blankie
+import blankie.daemon
+import blankie.stats
+from blankie.logging import log
+
+# A task which runs for longer than this many seconds is considered
+# to have stalled the event loop (0 disables the watchdog).  Can be
+# changed from the configuration file.
+stall_timeout = 10
+
+# What to do when a stall is detected, in addition to logging it:
+# - None: nothing.
+# - 'lock': lock the system as soon as the event loop recovers.
+# - 'abort': dump all threads' stacks and abort the daemon (e.g. to
+#   let systemd restart it).
+# - A function, called (on the watchdog thread) with the task kind and
+#   the number of seconds it has been running for.
+# Can be changed from the configuration file.
+stall_action = None
+
+class Watchdog(threading.Thread):
+	def __init__(self, event_loop):
+		super().__init__(name='blankie-watchdog', daemon=True)
+		self.event_loop = event_loop
+		self.stopping = threading.Event()
+
+		# Number of the last task we reported, so that each stall is
+		# reported once.
+		self.reported = None
+
+	def stop(self):
+		self.stopping.set()
+		self.join()
+
+	def run(self):
+		while True:
+			# Check often enough to detect a stall within 1.5 *
+			# stall_timeout; re-read it, as the configuration may
+			# change it.
+			interval = stall_timeout / 2 if stall_timeout > 0 else 1
+			if self.stopping.wait(interval):
+				return
+			try:
+				self.check()
+			except Exception:
+				log.exception('Error in watchdog:')
+
+	def check(self):
+		current = self.event_loop.current
+		if current is None or stall_timeout <= 0:
+			return
+		(number, func, start_time) = current
+		duration = time.monotonic() - start_time
+		if duration < stall_timeout or number == self.reported:
+			return
+		self.reported = number
+
+		kind = blankie.stats.task_kind(func)
+		log.error('Event loop stalled: %s has been running for %.1f s.  Stack:\n%s',
+				  kind, duration, self.format_stack())
+		self.event_loop.record_stall(kind, duration)
+		self.escalate(kind, duration)
+
+	def format_stack(self):
+		thread = self.event_loop.thread
+		frame = sys._current_frames().get(thread.ident) if thread is not None else None
+		if frame is None:
+			return '(unavailable)\n'
+		return ''.join(traceback.format_stack(frame))
+
+	def escalate(self, kind, duration):
+		match stall_action:
+			case None:
+				pass
+			case 'lock':
+				if not blankie.state.locked:
+					log.security('Locking the system due to the event loop stall.')
+					# The lock will take effect once the stuck task
+					# finishes.  Until then, nothing else runs either.
+					blankie.daemon.call(blankie.lock, coalesce_key=Watchdog)
+			case 'abort':
+				log.critical('Aborting due to the event loop stall.')
+				faulthandler.dump_traceback(all_threads=True)
+				os.abort()
+			case _:
+				stall_action(kind, duration)
+
+# The running watchdog, if any.
+_watchdog = None
+
+def start(event_loop):
+	'''Start watching the given event loop.  Also makes the daemon dump
+	the stacks of all threads to stderr on SIGUSR1.'''
+	global _watchdog
+	assert _watchdog is None
+	faulthandler.register(signal.SIGUSR1, all_threads=True)
+	_watchdog = Watchdog(event_loop)
+	_watchdog.start()
+
+def stop():
+	global _watchdog
+	if _watchdog is not None:
+		_watchdog.stop()
+		_watchdog = None
+		faulthandler.unregister(signal.SIGUSR1)
@@ -3,6 +3,10 @@
 # Glue between the X11 Screen Saver Extension and Blankie.
 # Implements an X screen saver, which merely communicates
 # events received from the X server to standard output.
+#
+# The xss module normally runs ScreenSaver in the daemon itself (see
+# XSSPerSessionModule.in_process); running this module as a program
+# is the fallback.
 
 import os
 import signal
@@ -13,70 +17,87 @@ import Xlib.ext.screensaver as screensaver
 
 verbose = int(os.getenv('BLANKIE_VERBOSE', '0'))
 
+def print_notify(state, kind, forced):
+    print('notify', state, kind, forced, flush=True)
+
 class ScreenSaver:
     d = None
     screen = None
     pixmap = None
 
-    def __init__(self, disp):
+    # Called with the state, kind and forced fields of each Notify
+    # event, as strings (e.g. 'on', 'blanked', 'natural').
+    on_notify = None
+
+    def __init__(self, disp, on_notify=print_notify):
         self.d = disp
+        self.on_notify = on_notify
 
     def run(self):
         try:
-            r = self.d.screensaver_query_version()
-            if verbose:
-                sys.stderr.write(f'{screensaver.extname} version {r.major_version}.{r.minor_version}\n')
-
-            self.screen = self.d.screen()
+            self.start()
+            print('init', flush=True)  # Communicate successful startup
 
-            error = []
-            def set_attributes_error(e, _req):
-                error.append(e)
-                return True
+            while True:
+                self.handle_event(self.d.next_event())
+        finally:
+            self.stop()
 
-            self.screen.root.screensaver_set_attributes(
-                -1, -1, 1, 1, 0,
-                onerror=set_attributes_error
-            )
-            self.d.sync()
-            if error:
-                raise Exception(
-                    'blankie/xss: Failed to set screensaver attributes; '
-                    'is another one running?'
-                    + ''.join(f'\n{e}' for e in error)
-                )
-
-            self.screen.root.screensaver_select_input(
-                screensaver.NotifyMask | screensaver.CycleMask
+    def start(self):
+        '''Become the X screen saver, and select its events.'''
+        r = self.d.screensaver_query_version()
+        if verbose:
+            sys.stderr.write(f'{screensaver.extname} version {r.major_version}.{r.minor_version}\n')
+
+        self.screen = self.d.screen()
+
+        error = []
+        def set_attributes_error(e, _req):
+            error.append(e)
+            return True
+
+        self.screen.root.screensaver_set_attributes(
+            -1, -1, 1, 1, 0,
+            onerror=set_attributes_error
+        )
+        self.d.sync()
+        if error:
+            raise Exception(
+                'blankie/xss: Failed to set screensaver attributes; '
+                'is another one running?'
+                + ''.join(f'\n{e}' for e in error)
             )
 
-            self.pixmap = self.screen.root.create_pixmap(1, 1, self.screen.root_depth)
+        self.screen.root.screensaver_select_input(
+            screensaver.NotifyMask | screensaver.CycleMask
+        )
 
-            self.screen.root.change_property(
-                property=self.d.get_atom('_MIT_SCREEN_SAVER_ID'),
-                property_type=Xatom.PIXMAP,
-                format=32,
-                data=[self.pixmap.id],
-            )
-            self.d.sync()
-            print('init', flush=True)  # Communicate successful startup
+        self.pixmap = self.screen.root.create_pixmap(1, 1, self.screen.root_depth)
 
-            while True:
-                e = self.d.next_event()
-
-                if verbose:
-                    sys.stderr.write(f'blankie/xss: Got message: {e}\n')
-
-                if e.__class__.__name__ == screensaver.Notify.__name__:
-                    print(
-                        'notify',
-                        ['off', 'on', 'cycle'][e.state],
-                        ['blanked', 'internal', 'external'][e.kind],
-                        ['natural', 'forced'][e.forced],
-                        flush=True
-                    )
-        finally:
-            self.stop()
+        self.screen.root.change_property(
+            property=self.d.get_atom('_MIT_SCREEN_SAVER_ID'),
+            property_type=Xatom.PIXMAP,
+            format=32,
+            data=[self.pixmap.id],
+        )
+        self.d.sync()
+
+    def handle_pending_events(self):
+        '''Handle the events which the X server sent so far, without
+        waiting for more.'''
+        while self.d.pending_events():
+            self.handle_event(self.d.next_event())
+
+    def handle_event(self, e):
+        if verbose:
+            sys.stderr.write(f'blankie/xss: Got message: {e}\n')
+
+        if e.__class__.__name__ == screensaver.Notify.__name__:
+            self.on_notify(
+                ['off', 'on', 'cycle'][e.state],
+                ['blanked', 'internal', 'external'][e.kind],
+                ['natural', 'forced'][e.forced],
+            )
 
     def stop(self):
         if verbose:
@@ -3,6 +3,7 @@ import os
 import socketserver
 import sys
 import threading
+import time
 
 import pytest
 
@@ -28,6 +29,14 @@ def blankie_module(monkeypatch, tmp_path):
 	blankie.state.locked = False
 	blankie.state.sleeping = False
 	yield blankie
+	io_loop = sys.modules.get('blankie.ioloop')
+	if io_loop is not None:
+		io_loop.stop()
+	# Otherwise, its threads exit whenever it is garbage collected,
+	# which confuses tests counting threads.
+	module = sys.modules.get('blankie.module')
+	if module is not None and module._executor is not None:
+		module._executor.shutdown()
 	unload_blankie()
 
 
@@ -36,6 +45,7 @@ def event_loop(blankie_module):
 	loop = blankie_module.daemon.EventLoop()
 	blankie_module.daemon._event_loop = loop
 	blankie_module.daemon.call = loop.call
+	blankie_module.daemon.call_later = loop.call_later
 	started = threading.Event()
 
 	def run():
@@ -54,6 +64,31 @@ def event_loop(blankie_module):
 	blankie_module.daemon.event_loop_thread = None
 
 
+@pytest.fixture
+def sync(blankie_module):
+	'''Return a function which waits for the event loop, and then the
+	I/O thread (if running), to process everything queued so far.'''
+	def sync():
+		done = threading.Event()
+		blankie_module.daemon.call(done.set)
+		assert done.wait(timeout=1)
+		io_loop = sys.modules.get('blankie.ioloop')
+		if io_loop is not None and io_loop._io_loop is not None:
+			io_loop.run_sync(lambda: None)
+	return sync
+
+
+@pytest.fixture
+def wait():
+	'''Return a function which waits until predicate() is true.'''
+	def wait(predicate, timeout=2):
+		deadline = time.monotonic() + timeout
+		while not predicate():
+			assert time.monotonic() < deadline
+			time.sleep(0.01)
+	return wait
+
+
 @pytest.fixture
 def temporary_unix_server(tmp_path):
 	servers = []
@@ -43,7 +43,6 @@ def wake_lock_server(blankie_module, event_loop, monkeypatch):
 	from blankie.modules.server import ServerModule
 
 	monkeypatch.setattr(blankie_module.config, 'reconfigure', lambda: None)
-	monkeypatch.setattr(blankie_module.config.configurator, 'print_status', lambda _f: None)
 	attached_specs = []
 	detached_specs = []
 	attached = threading.Event()
@@ -63,11 +62,9 @@ def wake_lock_server(blankie_module, event_loop, monkeypatch):
 	monkeypatch.setattr(blankie_module.session, 'detach', detach)
 	module = ServerModule()
 	module.start()
-	server = module.server
 	yield blankie_module, module, attached_specs, detached_specs, attached, detached
 	if module.server is not None:
 		module.stop()
-	server.server_close()
 	os.unlink(blankie_module.server.path)
 
 
@@ -370,3 +367,102 @@ def test_notify_and_query_keep_their_socket_lifecycles(blankie_module, monkeypat
 	assert blankie_module.server.query('status') == b'reply'
 	assert query_client.shutdown_calls == [socket.SHUT_WR]
 	assert query_client.closed
+
+
+@pytest.mark.parametrize('command', ['status', 'lock', 'attach'])
+def test_client_commands_do_not_import_the_daemon_or_load_the_configuration(tmp_path, temporary_unix_server, command):
+	import subprocess
+
+	def handler(request):
+		request.rfile.readline()
+		request.wfile.write(b'ok')
+
+	config_dir = tmp_path / 'config' / 'blankie'
+	config_dir.mkdir(parents=True)
+	marker = tmp_path / 'config-loaded'
+	(config_dir / 'config.py').write_text('open(%r, "w").close()\n' % os.fspath(marker))
+
+	source_dir = os.path.join(os.path.dirname(__file__), os.pardir, 'src')
+	env = dict(
+		os.environ,
+		PYTHONPATH=os.path.abspath(source_dir),
+		BLANKIE_SOCKET=os.fspath(temporary_unix_server(handler)),
+		BLANKIE_RUN_DIR=os.fspath(tmp_path / 'run'),
+		XDG_CONFIG_HOME=os.fspath(tmp_path / 'config'),
+		DISPLAY=':42',
+	)
+	result = subprocess.run(
+		[sys.executable, '-X', 'importtime', '-c', 'import sys, blankie; sys.exit(blankie.main())', command],
+		env=env,
+		capture_output=True,
+		timeout=10,
+	)
+	assert result.returncode == 0, result.stderr
+	imported = {
+		line.rsplit('|', 1)[1].strip()
+		for line in result.stderr.decode().splitlines()
+		if line.startswith('import time:') and '|' in line
+	}
+	assert 'blankie.cli' in imported
+	for module in ['blankie.daemon', 'blankie.config', 'blankie.module', 'blankie.session']:
+		assert module not in imported
+	assert not marker.exists()
+
+
+def test_session_detection_matches_the_session_modules(blankie_module, monkeypatch):
+	import blankie.detect
+	import blankie.modules.session.tty
+	import blankie.modules.session.x11
+
+	monkeypatch.setenv('DISPLAY', ':42')
+	monkeypatch.setattr('os.ttyname', lambda fd: '/dev/pts/7')
+	x11 = blankie.modules.session.x11
+	tty = blankie.modules.session.tty
+	assert blankie.detect.get_session() == x11.get_session() == (x11.X11Session.name, ':42')
+	assert tty.get_session() == (tty.TTYSession.name, '/dev/pts/7')
+
+	monkeypatch.delenv('DISPLAY')
+	assert x11.get_session() is None
+	assert blankie.detect.get_session() == tty.get_session()
+
+
+def test_main_wake_lock_passes_the_reason(blankie_module, monkeypatch):
+	called = []
+	monkeypatch.setattr(blankie_module.server, 'wake_lock', lambda *args: called.append(args))
+	monkeypatch.setattr(sys, 'argv', ['blankie', 'wake-lock', '--reason', 'backup'])
+
+	assert blankie_module.main() == 0
+	assert called == [('backup',)]
+
+
+@pytest.mark.parametrize('argv, expected', [
+	(['wake-lock', '--for', '30'], ('wake-lock-lease', 30.0)),
+	(['wake-lock', '--reason', 'backup', '--for', '1.5'], ('wake-lock-lease', 1.5, 'backup')),
+	(['wake-lock-renew', '7'], ('wake-lock-renew', 7)),
+	(['wake-lock-renew', '7', '--for', '60'], ('wake-lock-renew', 7, 60.0)),
+	(['wake-lock-release', '7'], ('wake-lock-release', 7)),
+])
+def test_main_wake_lock_leases(blankie_module, monkeypatch, capsys, argv, expected):
+	import blankie.cli
+	calls = []
+	monkeypatch.setattr(blankie.cli, 'call', lambda *args: (calls.append(args), 'reply\n')[1])
+	monkeypatch.setattr(sys, 'argv', ['blankie'] + argv)
+
+	assert blankie_module.main() == 0
+	assert calls == [expected]
+	assert capsys.readouterr().out == 'reply\n'
+
+
+@pytest.mark.parametrize('argv', [
+	['wake-lock', '--for'],
+	['wake-lock', '--for', 'soon'],
+	['wake-lock-renew'],
+	['wake-lock-renew', 'x'],
+	['wake-lock-release', '1', '2'],
+])
+def test_main_wake_lock_leases_reject_bad_arguments(blankie_module, monkeypatch, argv):
+	import blankie.cli
+	monkeypatch.setattr(blankie.cli, 'call', lambda *args: pytest.fail('must not connect'))
+	monkeypatch.setattr(sys, 'argv', ['blankie'] + argv)
+
+	assert blankie_module.main() == 1
@@ -0,0 +1,182 @@
+import asyncio
+import json
+import os
+import socket
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def server_module(blankie_module, event_loop, monkeypatch):
+	from blankie.modules.server import ServerModule
+
+	monkeypatch.setattr(blankie_module.config, 'reconfigure', lambda: None)
+	monkeypatch.setattr(blankie_module.session, 'attach', blankie_module.session.session_specs.add)
+	monkeypatch.setattr(blankie_module.session, 'detach', blankie_module.session.session_specs.remove)
+	module = ServerModule()
+	module.start()
+	yield blankie_module, module
+	if module.server is not None:
+		module.stop()
+	os.unlink(blankie_module.server.path)
+
+
+def framed_connect(blankie_module):
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.settimeout(1)
+	client.connect(blankie_module.server.path)
+	return client, client.makefile('rb', buffering=0)
+
+
+def read_reply(f):
+	return json.loads(f.readline())
+
+
+def test_framed_requests_are_answered_on_one_connection(server_module):
+	blankie_module, _module = server_module
+	(client, f) = framed_connect(blankie_module)
+	with client, f:
+		client.sendall(
+			b'{"id": 1, "command": ["ping"]}\n'
+			b'{"id": 2, "command": ["lock"]}\n'
+			b'{"id": "three", "command": ["ping"]}\n'
+		)
+		assert read_reply(f) == {'id': 1, 'result': 'pong\n'}
+		assert read_reply(f) == {'id': 2, 'result': 'Locked.\n'}
+		assert read_reply(f) == {'id': 'three', 'result': 'pong\n'}
+
+		# The connection stays open for more requests.
+		client.sendall(b'{"id": 4, "command": ["unlock"]}\n')
+		assert read_reply(f) == {'id': 4, 'result': 'Unlocked.\n'}
+
+
+def test_framed_errors_are_reported_per_request(server_module):
+	blankie_module, _module = server_module
+	(client, f) = framed_connect(blankie_module)
+	with client, f:
+		client.sendall(
+			b'{"id": 1, "command": ["bogus"]}\n'
+			b'{"id": 2, "command": []}\n'
+			b'{"id": 3, "command": ["ping"]}\n'
+		)
+		replies = {}
+		for _ in range(3):
+			reply = read_reply(f)
+			replies[reply['id']] = reply
+		assert 'unknown daemon command' in replies[1]['error']
+		assert 'Invalid request' in replies[None]['error']
+		assert replies[3] == {'id': 3, 'result': 'pong\n'}
+
+
+def test_framed_replies_are_sent_before_closing_on_eof(server_module):
+	blankie_module, _module = server_module
+	(client, f) = framed_connect(blankie_module)
+	with client, f:
+		client.sendall(b''.join(
+			b'{"id": %d, "command": ["ping"]}\n' % i
+			for i in range(200)
+		))
+		client.shutdown(socket.SHUT_WR)
+		lines = f.read().splitlines()
+	assert [json.loads(line)['id'] for line in lines] == list(range(200))
+
+
+def test_framed_pipeline_is_bounded(server_module, monkeypatch):
+	blankie_module, module = server_module
+	from blankie.modules.server import Connection
+	monkeypatch.setattr(Connection, 'max_pipeline', 4)
+
+	calls = []
+	blocked = threading.Event()
+	release = threading.Event()
+	original = module.server_execute
+
+	def server_execute(output, *args):
+		calls.append(args)
+		if args == ('block',):
+			blocked.set()
+			assert release.wait(timeout=1)
+			return
+		original(output, *args)
+
+	monkeypatch.setattr(module, 'server_execute', server_execute)
+
+	(client, f) = framed_connect(blankie_module)
+	with client, f:
+		client.sendall(b'{"id": 0, "command": ["block"]}\n' + b''.join(
+			b'{"id": %d, "command": ["ping"]}\n' % i
+			for i in range(1, 20)
+		))
+		assert blocked.wait(timeout=1)
+		for _ in range(10):
+			blankie_module.ioloop.run_sync(lambda: None)
+		# Only max_pipeline requests are read while the first one is
+		# being handled.
+		(connection,) = module.server.connections
+		assert connection.outstanding == 4
+		assert blankie_module.daemon._event_loop.depth() == 3
+		release.set()
+		ids = [read_reply(f)['id'] for _ in range(20)]
+	assert ids == list(range(20))
+
+
+def test_one_shot_protocol_still_works(server_module):
+	blankie_module, _module = server_module
+	assert blankie_module.server.query('ping') == b'pong\n'
+
+
+def test_framed_wake_lock_is_held_until_close(server_module, sync):
+	blankie_module, _module = server_module
+	import blankie.client
+
+	client = blankie.client.Client()
+	assert client.call('wake-lock') == 'Wake lock acquired.\n'
+	assert client.call('wake-lock') == 'Wake lock acquired.\n'
+	assert len(blankie_module.wake_lock.holders) == 2
+	assert len(blankie_module.session.session_specs) == 1
+	client.close()
+	sync()
+	sync()
+	assert blankie_module.session.session_specs == set()
+
+
+def test_client_call_and_pipeline(server_module):
+	blankie_module, _module = server_module
+	import blankie.client
+
+	with blankie.client.Client() as client:
+		assert client.call('ping') == 'pong\n'
+		assert client.pipeline([['lock'], ['ping'], ['unlock']]) == [
+			'Locked.\n', 'pong\n', 'Unlocked.\n',
+		]
+		with pytest.raises(blankie.client.Error, match='unknown daemon command'):
+			client.call('bogus')
+
+		# Replies may be received in any order.
+		first = client.send('ping')
+		second = client.send('lock')
+		assert client.receive(second) == 'Locked.\n'
+		assert client.receive(first) == 'pong\n'
+
+
+def test_client_reports_missing_daemon(blankie_module):
+	import blankie.client
+
+	with pytest.raises(blankie_module.UserError, match='Is the blankie daemon running'):
+		blankie.client.Client()
+
+
+def test_async_client(server_module):
+	blankie_module, _module = server_module
+	import blankie.client
+
+	async def run():
+		async with await blankie.client.AsyncClient.connect() as client:
+			results = await asyncio.gather(*(client.call('ping') for _ in range(10)))
+			assert results == ['pong\n'] * 10
+			with pytest.raises(blankie.client.Error):
+				await client.call('bogus')
+			return await client.call('lock')
+
+	assert asyncio.run(run()) == 'Locked.\n'
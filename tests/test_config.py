@@ -0,0 +1,88 @@
+import math
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def configured(blankie_module, monkeypatch):
+	monkeypatch.setattr(blankie_module.daemon, 'event_loop_thread', threading.current_thread())
+	monkeypatch.setattr(blankie_module.module, 'selectors', {
+		'20-config': blankie_module.module.selectors['20-config'],
+	})
+	monkeypatch.setattr(blankie_module.module, 'get', lambda spec: type('Module', (), {
+		'concurrent': False,
+		'get_dependencies': lambda self: [],
+		'start': lambda self: None,
+		'stop': lambda self: None,
+	})())
+	evaluations = []
+
+	class Config:
+		@staticmethod
+		def config(c):
+			evaluations.append(c.is_locked())
+			if c.is_idle_for(60):
+				c.run_module('idle')
+
+	monkeypatch.setattr(blankie_module.config, 'module', Config)
+	idle_since = [math.inf]
+	monkeypatch.setattr(blankie_module, 'get_idle_since', lambda: idle_since[0])
+	return blankie_module, evaluations, idle_since
+
+
+def test_configuration_is_not_reevaluated_when_its_inputs_did_not_change(configured, monkeypatch):
+	blankie_module, evaluations, idle_since = configured
+	now = 1000.0
+	monkeypatch.setattr(blankie_module.config.time, 'time', lambda: now)
+
+	blankie_module.module.update()
+	assert len(evaluations) == 1
+
+	# Activity which does not change the outcome of is_idle_for().
+	idle_since[0] = now - 10
+	blankie_module.module.update()
+	idle_since[0] = now - 20
+	blankie_module.module.update()
+	assert len(evaluations) == 2  # inf -> finite changes idle_time >= 0
+	assert ('idle',) not in blankie_module.module.running_modules
+
+	# Crossing the threshold does.
+	now += 100
+	blankie_module.module.update()
+	assert len(evaluations) == 3
+	assert ('idle',) in blankie_module.module.running_modules
+	assert blankie_module.module.selector_stats == {'executed': 3, 'skipped': 1}
+
+
+def test_configuration_is_reevaluated_when_sessions_are_attached_or_detached(configured, monkeypatch):
+	blankie_module, evaluations, _idle_since = configured
+	monkeypatch.setattr(blankie_module.idle, 'add', lambda spec: None)
+	monkeypatch.setattr(blankie_module.idle, 'remove', lambda spec: None)
+	spec = ('session.test', 1)
+
+	blankie_module.module.update()
+	blankie_module.module.update()
+	count = len(evaluations)
+	blankie_module.module.update()
+	assert len(evaluations) == count
+
+	# The idle time and lock state stay the same.
+	blankie_module.session.attach(spec)
+	assert len(evaluations) == count + 1
+	blankie_module.session.detach(spec)
+	assert len(evaluations) == count + 2
+
+
+def test_configuration_is_reevaluated_on_state_changes_and_reconfigure(configured):
+	blankie_module, evaluations, _idle_since = configured
+
+	blankie_module.module.update()
+	blankie_module.state.locked = True
+	blankie_module.module.update()
+	assert evaluations == [False, True]
+
+	blankie_module.config.reconfigure()
+	assert evaluations == [False, True, True]
+	blankie_module.module.update()
+	assert evaluations == [False, True, True]
@@ -0,0 +1,180 @@
+import threading
+import time
+
+
+def drain(loop):
+	loop.stopping = True
+	loop.run()
+
+
+def test_coalesced_calls_keep_their_place_and_use_the_latest_arguments(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+	calls = []
+	loop.call(calls.append, 'first', coalesce_key='a')
+	loop.call(calls.append, 'other')
+	loop.call(calls.append, 'second', coalesce_key='a')
+	loop.call(calls.append, 'unkeyed')
+	loop.call(calls.append, 'third', coalesce_key='a')
+	assert loop.depth() == 3
+
+	drain(loop)
+	assert calls == ['third', 'other', 'unkeyed']
+	assert loop.stats['posted'] == 5
+	assert loop.stats['coalesced'] == 2
+	assert loop.stats['executed'] == 3
+	assert loop.stats['max_depth'] == 3
+
+
+def test_coalesced_calls_can_be_merged(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+	calls = []
+
+	def merge(old, new):
+		((old_list,), _) = old
+		((new_list,), _) = new
+		return ((old_list + new_list,), {})
+
+	for i in range(4):
+		loop.call(calls.append, [i], coalesce_key='a', merge=merge)
+	drain(loop)
+	assert calls == [[0, 1, 2, 3]]
+
+
+def test_keys_are_released_once_the_task_starts_running(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+	calls = []
+
+	def task(value):
+		calls.append(value)
+		if value == 'first':
+			loop.call(task, 'again', coalesce_key='a')
+
+	loop.call(task, 'first', coalesce_key='a')
+	drain(loop)
+	assert calls == ['first', 'again']
+
+
+def test_full_queue_applies_backpressure_to_producers(blankie_module, monkeypatch, event_loop):
+	monkeypatch.setattr(blankie_module.daemon, 'max_queue_size', 2)
+	monkeypatch.setattr(blankie_module.daemon, 'backpressure_timeout', 5)
+	release = threading.Event()
+	started = threading.Event()
+
+	def block():
+		started.set()
+		assert release.wait(timeout=5)
+
+	event_loop.call(block)
+	assert started.wait(timeout=1)
+	event_loop.call(lambda: None)
+	event_loop.call(lambda: None)
+
+	posted = threading.Event()
+	producer = threading.Thread(target=lambda: (event_loop.call(lambda: None), posted.set()))
+	producer.start()
+	assert not posted.wait(timeout=0.1)
+	assert event_loop.stats['throttled'] == 1
+	release.set()
+	assert posted.wait(timeout=1)
+	producer.join(timeout=1)
+	assert event_loop.depth() <= 2
+
+
+def test_io_thread_and_coalesced_calls_are_not_throttled(blankie_module, monkeypatch, event_loop):
+	monkeypatch.setattr(blankie_module.daemon, 'max_queue_size', 1)
+	monkeypatch.setattr(blankie_module.daemon, 'backpressure_timeout', 5)
+	release = threading.Event()
+	started = threading.Event()
+
+	def block():
+		started.set()
+		assert release.wait(timeout=5)
+
+	event_loop.call(block)
+	assert started.wait(timeout=1)
+	event_loop.call(lambda: None)
+
+	# E.g. an inotify or socket callback
+	start = time.monotonic()
+	blankie_module.ioloop.run_sync(event_loop.call, lambda: None)
+	event_loop.call(lambda: None, coalesce_key='key')
+	assert time.monotonic() - start < 1
+	assert event_loop.stats['throttled'] == 0
+	assert event_loop.stats['overflow'] == 2
+	assert event_loop.depth() == 3
+	release.set()
+
+
+def test_backpressure_gives_up_after_the_timeout(blankie_module, monkeypatch):
+	monkeypatch.setattr(blankie_module.daemon, 'max_queue_size', 1)
+	monkeypatch.setattr(blankie_module.daemon, 'backpressure_timeout', 0.01)
+	loop = blankie_module.daemon.EventLoop()
+	loop.call(lambda: None)
+	loop.call(lambda: None)
+	assert loop.depth() == 2
+	assert loop.stats['throttled'] == 1
+
+
+def test_timers_fire_in_deadline_order(blankie_module, event_loop):
+	calls = []
+	done = threading.Event()
+	event_loop.call_later(0.03, calls.append, 'late')
+	event_loop.call_later(0.01, calls.append, 'early')
+	event_loop.call_later(0.05, done.set)
+	assert done.wait(timeout=1)
+	assert calls == ['early', 'late']
+
+
+def test_timers_do_not_fire_early(blankie_module, event_loop):
+	fired = []
+	done = threading.Event()
+	start = blankie_module.daemon.clock()
+	event_loop.call_later(0.05, lambda: (fired.append(blankie_module.daemon.clock()), done.set()))
+	assert done.wait(timeout=1)
+	assert fired[0] - start >= 0.05
+
+
+def test_timers_can_be_cancelled_and_rescheduled(blankie_module, event_loop):
+	calls = []
+	done = threading.Event()
+	cancelled = event_loop.call_later(0.01, calls.append, 'cancelled')
+	rescheduled = event_loop.call_later(0.01, calls.append, 'rescheduled')
+	assert cancelled.active()
+	cancelled.cancel()
+	assert not cancelled.active()
+	rescheduled.reschedule(0.04)
+	event_loop.call_later(0.02, calls.append, 'first')
+	event_loop.call_later(0.06, done.set)
+	assert done.wait(timeout=1)
+	assert calls == ['first', 'rescheduled']
+	assert not rescheduled.active()
+
+
+def test_timers_within_their_slack_fire_together(blankie_module, event_loop):
+	fired = []
+	done = threading.Event()
+	now = blankie_module.daemon.clock
+	event_loop.call_later(0.02, lambda: fired.append(now()), slack=0.2)
+	event_loop.call_later(0.1, lambda: (fired.append(now()), done.set()), slack=0)
+	assert done.wait(timeout=1)
+	# The first timer was delayed until the second one was due.
+	assert fired[1] - fired[0] < 0.05
+
+
+def test_due_timers_run_when_the_loop_wakes_up_for_other_work(blankie_module, event_loop):
+	calls = []
+	done = threading.Event()
+	event_loop.call_later(0.01, calls.append, 'timer', slack=10)
+	time.sleep(0.05)
+	event_loop.call(calls.append, 'task')
+	event_loop.call(done.set)
+	assert done.wait(timeout=1)
+	assert calls == ['task', 'timer']
+
+
+def test_stale_timer_entries_are_dropped(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+	handle = loop.call_later(100, lambda: None)
+	for _ in range(100):
+		handle.reschedule(100)
+	assert len(loop.timers) <= 32
@@ -0,0 +1,68 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def emitted(blankie_module, monkeypatch):
+	monkeypatch.setattr(blankie_module.daemon, 'event_loop_thread', threading.current_thread())
+	monkeypatch.setattr(blankie_module.config, 'reconfigure', lambda: None)
+	events = []
+	blankie_module.events.subscribe(events.append)
+	yield events
+	blankie_module.events.unsubscribe(events.append)
+
+
+def kinds(events):
+	return [event['event'] for event in events]
+
+
+def test_lock_and_unlock_emit_only_on_change(blankie_module, emitted):
+	blankie_module.lock()
+	blankie_module.lock()
+	blankie_module.unlock()
+	blankie_module.unlock()
+	assert kinds(emitted) == ['locked', 'unlocked']
+	assert all(isinstance(event['time'], float) for event in emitted)
+
+
+def test_module_start_and_stop_are_emitted(blankie_module, emitted, monkeypatch):
+	monkeypatch.setattr(blankie_module.module, 'selectors', {})
+
+	class Recording(blankie_module.module.Module):
+		name = 'recording'
+
+		def __init__(self, *args):
+			super().__init__()
+
+	wanted = [('recording', 1)]
+	blankie_module.module.selectors['10'] = lambda wanted_modules: wanted_modules.extend(wanted)
+	blankie_module.module.update()
+	wanted = []
+	blankie_module.module.update()
+	assert emitted == [
+		{'event': 'started', 'time': emitted[0]['time'], 'module': ('recording', 1)},
+		{'event': 'stopped', 'time': emitted[1]['time'], 'module': ('recording', 1)},
+	]
+
+
+def test_session_attach_and_detach_are_emitted(blankie_module, emitted, monkeypatch):
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: None)
+	blankie_module.session.attach(('session.tty', '/dev/tty1'))
+	with pytest.raises(blankie_module.UserError):
+		blankie_module.session.attach(('session.tty', '/dev/tty1'))
+	blankie_module.session.detach(('session.tty', '/dev/tty1'))
+	assert [(event['event'], event['session']) for event in emitted] == [
+		('attached', ('session.tty', '/dev/tty1')),
+		('detached', ('session.tty', '/dev/tty1')),
+	]
+
+
+def test_failing_subscribers_do_not_affect_others(blankie_module, emitted):
+	def fail(event):
+		raise RuntimeError('subscriber failure')
+
+	blankie_module.events.subscribe(fail)
+	blankie_module.events.emit('test')
+	blankie_module.events.unsubscribe(fail)
+	assert kinds(emitted) == ['test']
@@ -1,6 +1,8 @@
 import math
 import threading
 
+import pytest
+
 
 class Session:
 	def __init__(self, idle_since):
@@ -27,6 +29,7 @@ def call_from_event_loop(event_loop, func, *args):
 	succeeded, value = result[0]
 	if not succeeded:
 		raise value
+	return value
 
 
 def test_idle_since_uses_latest_finite_session(blankie_module, monkeypatch):
@@ -117,3 +120,204 @@ def test_sleeping_returns_negative_infinity_with_wake_lock_session(blankie_modul
 	monkeypatch.setattr(blankie_module.session, 'get_sessions', lambda: [wake_lock])
 
 	assert blankie_module.get_idle_since() == -math.inf
+
+
+def test_timer_fires_exactly_at_the_next_idle_threshold(blankie_module, monkeypatch):
+	from blankie.modules.timer import TimerModule
+
+	now = 1000.0
+	monkeypatch.setattr(blankie_module.modules.timer.time, 'time', lambda: now)
+	monkeypatch.setattr(blankie_module, 'get_idle_since', lambda: now - 100)
+	scheduled = []
+	monkeypatch.setattr(blankie_module.daemon, 'call_later', lambda delay, func: scheduled.append((delay, func)))
+
+	module = TimerModule(frozenset([60, 120, 300]))
+	module.start()
+	assert scheduled == [(20, module.timer_handle_done)]
+
+
+
+class CountingSession(Session):
+	notifies_changes = False
+
+	def __init__(self, idle_since):
+		super().__init__(idle_since)
+		self.queries = 0
+
+	def get_idle_since(self):
+		self.queries += 1
+		return self.idle_since
+
+
+class NotifyingSession(CountingSession):
+	notifies_changes = True
+
+
+@pytest.fixture
+def add_session(blankie_module, event_loop):
+	def add(spec, session):
+		blankie_module.module.module_instances[spec] = session
+		call_from_event_loop(event_loop, blankie_module.idle.add, spec)
+		return session
+	return add
+
+
+def test_idle_since_is_queried_once_per_event_loop_task(blankie_module, event_loop, add_session):
+	sessions = [
+		add_session(('test', 1), CountingSession(10.0)),
+		add_session(('test', 2), CountingSession(25.0)),
+	]
+
+	def queries():
+		return [session.queries for session in sessions]
+
+	def task():
+		before = queries()
+		assert blankie_module.get_idle_since() == 25.0
+		sessions[1].idle_since = 30.0
+		# Consistent for the whole task...
+		assert blankie_module.get_idle_since() == 25.0
+		assert queries() == [before[0] + 1, before[1] + 1]
+		# ...unless the session is invalidated.
+		blankie_module.idle.invalidate(sessions[1])
+		assert blankie_module.get_idle_since() == 30.0
+		assert queries() == [before[0] + 1, before[1] + 2]
+
+	call_from_event_loop(event_loop, task)
+	# The next task queries the sessions again.
+	before = call_from_event_loop(event_loop, queries)
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 30.0
+	assert queries() == [before[0] + 1, before[1] + 1]
+
+
+def test_notifying_sessions_are_only_queried_after_invalidation(blankie_module, event_loop, add_session):
+	sessions = [add_session(('test', i), NotifyingSession(float(i))) for i in range(100)]
+
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 99.0
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 99.0
+	assert all(session.queries == 1 for session in sessions)
+
+	def update(session, idle_since):
+		session.idle_since = idle_since
+		blankie_module.idle.invalidate(session)
+
+	call_from_event_loop(event_loop, update, sessions[10], 150.0)
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 150.0
+	call_from_event_loop(event_loop, update, sessions[10], math.nan)
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 99.0
+	call_from_event_loop(event_loop, blankie_module.idle.remove, ('test', 99))
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == 98.0
+	assert sessions[10].queries == 3
+	assert sum(session.queries for session in sessions) == 102
+
+
+def test_idle_since_follows_session_changes_within_a_task(blankie_module, event_loop, add_session):
+	first = add_session(('test', 1), CountingSession(10.0))
+
+	def task():
+		before = first.queries
+		assert blankie_module.get_idle_since() == 10.0
+		blankie_module.module.module_instances[('test', 2)] = CountingSession(20.0)
+		blankie_module.idle.add(('test', 2))
+		assert blankie_module.get_idle_since() == 20.0
+		blankie_module.state.sleeping = True
+		assert blankie_module.get_idle_since() == -math.inf
+		blankie_module.state.sleeping = False
+		assert blankie_module.get_idle_since() == 20.0
+		blankie_module.idle.remove(('test', 2))
+		assert blankie_module.get_idle_since() == 10.0
+		assert first.queries == before + 1
+
+	call_from_event_loop(event_loop, task)
+	call_from_event_loop(event_loop, blankie_module.idle.remove, ('test', 1))
+	assert call_from_event_loop(event_loop, blankie_module.get_idle_since) == math.inf
+
+
+def test_changes_of_the_combined_idle_time_are_emitted(blankie_module, event_loop, add_session):
+	events = []
+	blankie_module.events.subscribe(events.append)
+	session = add_session(('test', 1), NotifyingSession(10.0))
+	add_session(('test', 2), NotifyingSession(5.0))
+
+	def update(idle_since):
+		session.idle_since = idle_since
+		blankie_module.idle.invalidate(session)
+
+	# Noticed without anyone asking for the idle time.
+	call_from_event_loop(event_loop, update, 20.0)
+	call_from_event_loop(event_loop, update, 20.0)
+	call_from_event_loop(event_loop, update, 1.0)
+	call_from_event_loop(event_loop, lambda: None)
+	assert [event['idle_since'] for event in events if event['event'] == 'idle_since'] == [10.0, 20.0, 5.0]
+
+
+def test_remote_sender_sends_idle_time_changes(blankie_module, event_loop, add_session):
+	from blankie.modules.remote_sender import RemoteSenderModule
+
+	sent = []
+	bus_client = type('BusClient', (), {'send_message': lambda self, message: sent.append(message)})()
+	blankie_module.module.module_instances[('bus_client', 'bus')] = bus_client
+	sender = RemoteSenderModule('bus')
+	call_from_event_loop(event_loop, sender.start)
+	session = add_session(('test', 1), NotifyingSession(10.0))
+	call_from_event_loop(event_loop, lambda: None)
+	assert sent == [{'type': 'idle_since', 'idle_since': 10.0}]
+
+	session.idle_since = 20.0
+	call_from_event_loop(event_loop, blankie_module.idle.invalidate, session)
+	call_from_event_loop(event_loop, lambda: None)
+	call_from_event_loop(event_loop, sender.stop)
+	session.idle_since = 30.0
+	call_from_event_loop(event_loop, blankie_module.idle.invalidate, session)
+	call_from_event_loop(event_loop, lambda: None)
+	assert sent == [
+		{'type': 'idle_since', 'idle_since': 10.0},
+		{'type': 'idle_since', 'idle_since': 20.0},
+	]
+
+
+def test_timer_only_updates_when_a_threshold_is_crossed(blankie_module, event_loop, add_session, monkeypatch):
+	import time
+	from blankie.modules.timer import TimerModule
+
+	class Config:
+		@staticmethod
+		def config(c):
+			c.is_idle_for(60)
+
+	class XSet(blankie_module.module.Module):
+		name = 'xset'
+
+	monkeypatch.setattr(blankie_module.config, 'module', Config)
+	monkeypatch.setattr(blankie_module.module, 'selectors', {
+		'20-config': blankie_module.module.selectors['20-config'],
+	})
+	timer = blankie_module.module.module_instances[('timer', frozenset([60]))] = TimerModule(frozenset([60]))
+	blankie_module.module.module_instances[('xset', 60)] = XSet()
+	session = add_session(('test', 1), NotifyingSession(time.time()))
+
+	updates = []
+	update = blankie_module.module.update
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: (updates.append(None), update()))
+	call_from_event_loop(event_loop, blankie_module.module.update)
+	assert timer.timer_running
+	updates.clear()
+
+	def activity(idle_since):
+		session.idle_since = idle_since
+		blankie_module.idle.invalidate(session)
+
+	# Activity while active only reschedules the timer.
+	for _ in range(5):
+		deadline = timer.timer.deadline
+		time.sleep(0.01)
+		call_from_event_loop(event_loop, activity, time.time())
+		call_from_event_loop(event_loop, lambda: None)
+		assert timer.timer.deadline > deadline
+	assert updates == []
+
+	# Crossing a threshold updates the modules.
+	call_from_event_loop(event_loop, activity, time.time() - 100)
+	call_from_event_loop(event_loop, lambda: None)
+	assert len(updates) == 1
+	assert not timer.timer_running
@@ -0,0 +1,140 @@
+import os
+import struct
+import time
+
+import pytest
+
+pytest.importorskip('inotify_simple')
+
+EV_SYN = 0
+EV_KEY = 1
+EV_REL = 2
+EV_MSC = 4
+EV_LED = 0x11
+
+
+def event(event_type, code=0, value=0):
+	return struct.pack('@llHHi', 0, 0, event_type, code, value)
+
+
+class Devices:
+	'''A directory of fake input devices (FIFOs, which, unlike regular
+	files, can be waited on).'''
+
+	def __init__(self, path):
+		self.path = path
+		self.writers = {}
+
+	def plug(self, name):
+		os.mkfifo(self.path / name)
+		# Opening both ends does not wait for a reader.
+		self.writers[name] = os.open(self.path / name, os.O_RDWR)
+
+	def unplug(self, name):
+		os.close(self.writers.pop(name))
+		os.remove(self.path / name)
+
+	def write(self, name, *events):
+		os.write(self.writers[name], b''.join(events))
+
+	def close(self):
+		for fd in self.writers.values():
+			os.close(fd)
+
+
+@pytest.fixture
+def input_session(blankie_module, event_loop, monkeypatch, tmp_path):
+	from blankie.modules.session.input import InputSession
+
+	updates = []
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: updates.append(time.time()))
+	monkeypatch.setattr(blankie_module.config.configurator, 'idle_checks', [60])
+	devices = Devices(tmp_path / 'input')
+	devices.path.mkdir()
+	devices.plug('event0')
+	devices.plug('mouse0')  # Not an event device
+
+	session = InputSession(str(devices.path))
+	session.start()
+	yield (session, devices, updates)
+	session.stop()
+	devices.close()
+
+
+def test_only_user_input_counts_as_activity(blankie_module, input_session, sync, wait):
+	session, devices, updates = input_session
+	assert list(session.devices) == ['event0']
+	assert time.time() - session.get_idle_since() < 1
+
+	# Long ago
+	session.last_input = 0.0
+	devices.write('event0', event(EV_MSC, 4, 30), event(EV_LED, 1, 1), event(EV_SYN))
+	devices.write('mouse0', event(EV_KEY, 30, 1))
+	time.sleep(0.1)
+	assert session.get_idle_since() == 0.0
+
+	before = time.time()
+	devices.write('event0', event(EV_MSC, 4, 30), event(EV_KEY, 30, 1), event(EV_SYN))
+	wait(lambda: session.get_idle_since() != 0.0)
+	assert before <= session.get_idle_since() <= time.time()
+	sync()
+	# One update when the session started, and one for the input
+	# after being idle for longer than a threshold.
+	assert len(updates) == 2
+
+	# Input while active does not update the modules.
+	for _ in range(10):
+		devices.write('event0', event(EV_REL, 0, 1), event(EV_SYN))
+	time.sleep(0.1)
+	sync()
+	assert len(updates) == 2
+
+
+def test_combined_idle_time_follows_input(blankie_module, input_session, monkeypatch, sync, wait):
+	session, devices, updates = input_session
+	monkeypatch.setattr(session, 'min_update_interval', 0.1)
+	blankie_module.module.module_instances[('session.input',)] = session
+	blankie_module.daemon.call(blankie_module.idle.add, ('session.input',))
+	wait(lambda: blankie_module.idle.last_idle_since == session.get_idle_since())
+	sync()
+	count = len(updates)
+
+	# Input shortly after other input is not an idle -> active edge:
+	# the modules are not updated, but the combined idle time (sent to
+	# remote peers etc.) follows it.
+	for _ in range(3):
+		time.sleep(0.2)
+		last = session.last_input
+		devices.write('event0', event(EV_REL, 0, 1), event(EV_SYN))
+		wait(lambda: session.get_idle_since() > last)
+		wait(lambda: blankie_module.idle.last_idle_since == session.get_idle_since())
+	assert len(updates) == count
+
+
+def test_input_without_known_thresholds_updates(blankie_module, input_session, monkeypatch, sync, wait):
+	session, devices, updates = input_session
+	# E.g. the configuration only checks the idle time while unlocked.
+	monkeypatch.setattr(blankie_module.config.configurator, 'idle_checks', [])
+	sync()
+	count = len(updates)
+
+	devices.write('event0', event(EV_KEY, 30, 1))
+	wait(lambda: len(updates) == count + 1)
+
+
+def test_devices_are_picked_up_when_plugged_in(blankie_module, input_session, wait):
+	session, devices, _updates = input_session
+
+	devices.plug('event1')
+	wait(lambda: 'event1' in session.devices)
+	session.last_input = 0.0
+	devices.write('event1', event(EV_REL, 1, -1))
+	wait(lambda: session.get_idle_since() != 0.0)
+
+	devices.unplug('event1')
+	wait(lambda: 'event1' not in session.devices)
+	assert list(session.devices) == ['event0']
+
+	session.stop()
+	assert not session.devices
+	assert session.inotify is None
@@ -0,0 +1,522 @@
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def module_system(blankie_module, monkeypatch):
+	monkeypatch.setattr(blankie_module.daemon, 'event_loop_thread', threading.current_thread())
+	monkeypatch.setattr(blankie_module.module, 'selectors', {})
+	events = []
+
+	class Recording(blankie_module.module.Module):
+		name = 'recording'
+
+		def __init__(self, *args):
+			super().__init__()
+			self.args = args
+
+		def start(self):
+			events.append(('start', self.args))
+
+		def stop(self):
+			events.append(('stop', self.args))
+	return blankie_module, events
+
+
+def select(blankie_module, key, specs):
+	blankie_module.module.selectors[key] = lambda wanted_modules: wanted_modules.extend(specs())
+
+
+def test_modules_start_in_wanted_order_and_stop_in_reverse(module_system):
+	blankie_module, events = module_system
+	wanted = [('recording', 1), ('recording', 2), ('recording', 3)]
+	select(blankie_module, '10', lambda: wanted)
+
+	blankie_module.module.update()
+	assert events == [('start', (1,)), ('start', (2,)), ('start', (3,))]
+	assert list(blankie_module.module.running_modules) == wanted
+
+	events.clear()
+	wanted = []
+	blankie_module.module.update()
+	assert events == [('stop', (3,)), ('stop', (2,)), ('stop', (1,))]
+	assert not blankie_module.module.running_modules
+
+
+def test_dependencies_start_first_and_stop_last(module_system):
+	blankie_module, events = module_system
+
+	class Dependent(blankie_module.module.Module):
+		name = 'dependent'
+
+		def get_dependencies(self):
+			return [('recording', 'dependency')]
+
+		def start(self):
+			events.append(('start', 'dependent'))
+
+		def stop(self):
+			events.append(('stop', 'dependent'))
+
+	wanted = [('dependent',)]
+	select(blankie_module, '10', lambda: wanted)
+	blankie_module.module.update()
+	wanted = []
+	blankie_module.module.update()
+
+	assert events == [
+		('start', ('dependency',)),
+		('start', 'dependent'),
+		('stop', 'dependent'),
+		('stop', ('dependency',)),
+	]
+
+
+def test_reconfigure_keeps_the_module_in_place(module_system):
+	blankie_module, events = module_system
+
+	class Reconfigurable(blankie_module.module.Module):
+		name = 'reconfigurable'
+
+		def __init__(self, value):
+			super().__init__()
+			self.value = value
+
+		def reconfigure(self, value):
+			events.append(('reconfigure', self.value, value))
+			self.value = value
+			return True
+
+		def stop(self):
+			events.append(('stop', self.value))
+
+	value = 1
+	wanted = True
+	select(blankie_module, '10', lambda: [('recording', 'a'), ('reconfigurable', value), ('recording', 'b')] if wanted else [])
+	blankie_module.module.update()
+	instance = blankie_module.module.get(('reconfigurable', 1))
+	events.clear()
+
+	value = 2
+	blankie_module.module.update()
+
+	assert events == [('reconfigure', 1, 2)]
+	assert list(blankie_module.module.running_modules) == [
+		('recording', 'a'), ('reconfigurable', 2), ('recording', 'b'),
+	]
+	assert blankie_module.module.get(('reconfigurable', 2)) is instance
+	assert ('reconfigurable', 1) not in blankie_module.module.module_instances
+
+	# It keeps its place in the stopping order.
+	events.clear()
+	wanted = False
+	blankie_module.module.update()
+	assert events == [('stop', ('b',)), ('stop', 2), ('stop', ('a',))]
+
+
+def test_declined_reconfigure_restarts_the_module(module_system):
+	blankie_module, events = module_system
+	wanted = [('recording', 1)]
+	select(blankie_module, '10', lambda: wanted)
+	blankie_module.module.update()
+	events.clear()
+
+	wanted = [('recording', 2)]
+	blankie_module.module.update()
+
+	assert events == [('stop', (1,)), ('start', (2,))]
+
+
+def test_failed_stop_is_kept_in_place_and_retried_later(module_system):
+	blankie_module, events = module_system
+	failures = [RuntimeError('stop failed')]
+
+	class Flaky(blankie_module.module.Module):
+		name = 'flaky'
+
+		def stop(self):
+			events.append(('stop', 'flaky'))
+			if failures:
+				raise failures.pop()
+
+	wanted = [('recording', 1), ('flaky',), ('recording', 2)]
+	select(blankie_module, '10', lambda: wanted)
+	blankie_module.module.update()
+	events.clear()
+
+	wanted = []
+	with pytest.raises(blankie_module.UserError, match='Failed to stop some modules'):
+		blankie_module.module.update()
+	assert events == [('stop', (2,)), ('stop', 'flaky'), ('stop', (1,))]
+	assert list(blankie_module.module.running_modules) == [('flaky',)]
+
+	events.clear()
+	blankie_module.module.update()
+	assert events == [('stop', 'flaky')]
+	assert not blankie_module.module.running_modules
+
+
+def test_reentrant_update_starts_newly_wanted_modules(module_system):
+	blankie_module, events = module_system
+	children = []
+
+	class Launcher(blankie_module.module.Module):
+		name = 'launcher'
+
+		def start(self):
+			children.extend([('recording', 'child-1'), ('recording', 'child-2')])
+			blankie_module.module.update()
+
+		def stop(self):
+			children.clear()
+			blankie_module.module.update()
+
+	launch = True
+	select(blankie_module, '10', lambda: [('launcher',)] if launch else [])
+	select(blankie_module, '20', lambda: children)
+	blankie_module.module.update()
+
+	assert events == [('start', ('child-1',)), ('start', ('child-2',))]
+	assert list(blankie_module.module.running_modules) == [
+		('recording', 'child-1'), ('recording', 'child-2'), ('launcher',),
+	]
+
+	events.clear()
+	launch = False
+	blankie_module.module.update()
+	assert events == [('stop', ('child-2',)), ('stop', ('child-1',))]
+	assert not blankie_module.module.running_modules
+
+
+def test_reentrant_update_cancels_pending_starts(module_system):
+	blankie_module, events = module_system
+	wanted = [('recording', 1), ('recording', 2), ('recording', 3)]
+
+	class Canceller(blankie_module.module.Module):
+		name = 'canceller'
+
+		def start(self):
+			wanted.remove(('recording', 2))
+			blankie_module.module.update()
+
+	select(blankie_module, '10', lambda: [('recording', 0), ('canceller',)] + wanted)
+	blankie_module.module.update()
+
+	assert events == [('start', (0,)), ('start', (1,)), ('start', (3,))]
+	assert ('recording', 2) not in blankie_module.module.running_modules
+
+
+def test_many_modules_synchronize(module_system):
+	blankie_module, events = module_system
+	count = 2000
+	wanted = [('recording', i) for i in range(count)]
+	select(blankie_module, '10', lambda: wanted)
+
+	blankie_module.module.update()
+	assert len(events) == count
+	wanted = wanted[::2]
+	blankie_module.module.update()
+
+	assert len(events) == count + count // 2
+	assert list(blankie_module.module.running_modules) == wanted
+
+
+def test_most_recently_defined_class_wins(module_system):
+	blankie_module, _events = module_system
+
+	class First(blankie_module.module.Module):
+		name = 'shadowed'
+
+	class Second(blankie_module.module.Module):
+		name = 'shadowed'
+
+	assert isinstance(blankie_module.module.get(('shadowed',)), Second)
+
+
+def test_modules_are_loaded_from_the_first_directory_defining_them(module_system, tmp_path, monkeypatch):
+	blankie_module, _events = module_system
+	user_dir = tmp_path / 'user'
+	system_dir = tmp_path / 'system'
+	(user_dir / 'nested').mkdir(parents=True)
+	system_dir.mkdir()
+	for directory, origin in ((user_dir, 'user'), (system_dir, 'system')):
+		for module_name in ('overridden', 'nested.child'):
+			path = directory / (module_name.replace('.', '/') + '.py')
+			path.parent.mkdir(exist_ok=True)
+			path.write_text(
+				'import blankie\n'
+				'class M(blankie.module.Module):\n'
+				'	name = %r\n'
+				'	origin = %r\n' % (module_name, origin))
+	(system_dir / 'system_only.py').write_text(
+		'import blankie\n'
+		'class M(blankie.module.Module):\n'
+		'	name = "system_only"\n')
+	monkeypatch.setattr(blankie_module.module, 'module_dirs', [str(user_dir), str(tmp_path / 'missing'), str(system_dir)])
+
+	scans = []
+	scandir = blankie_module.module.os.scandir
+	monkeypatch.setattr(blankie_module.module.os, 'scandir', lambda path: scans.append(path) or scandir(path))
+
+	assert blankie_module.module.get(('overridden',)).origin == 'user'
+	assert blankie_module.module.get(('nested.child',)).origin == 'user'
+	assert blankie_module.module.get(('system_only',)).name == 'system_only'
+	assert len(scans) == 5  # Each directory is scanned once.
+
+	with pytest.raises(blankie_module.UserError, match='not found'):
+		blankie_module.module.get(('nonexistent',))
+	assert len(scans) == 5
+
+
+@pytest.fixture
+def concurrent_modules(module_system):
+	blankie_module, events = module_system
+	barrier = threading.Barrier(3, timeout=1)
+	threads = []
+
+	class Concurrent(blankie_module.module.Module):
+		name = 'concurrent'
+		concurrent = True
+
+		def __init__(self, *args):
+			super().__init__()
+			self.args = args
+
+		def start(self):
+			threads.append(threading.current_thread())
+			barrier.wait()
+			events.append(('start', self.args))
+
+		def stop(self):
+			threads.append(threading.current_thread())
+			barrier.wait()
+			events.append(('stop', self.args))
+
+	return blankie_module, events, threads
+
+
+def test_concurrent_modules_start_and_stop_in_parallel(concurrent_modules):
+	blankie_module, events, threads = concurrent_modules
+	wanted = [('recording', 'before'), ('concurrent', 1), ('concurrent', 2), ('concurrent', 3), ('recording', 'after')]
+	select(blankie_module, '10', lambda: wanted)
+
+	blankie_module.module.update()
+	assert events[0] == ('start', ('before',))
+	assert sorted(events[1:4]) == [('start', (1,)), ('start', (2,)), ('start', (3,))]
+	assert events[4] == ('start', ('after',))
+	assert list(blankie_module.module.running_modules) == wanted
+
+	events.clear()
+	wanted = []
+	blankie_module.module.update()
+	assert events[0] == ('stop', ('after',))
+	assert sorted(events[1:4]) == [('stop', (1,)), ('stop', (2,)), ('stop', (3,))]
+	assert events[4] == ('stop', ('before',))
+	assert threading.current_thread() not in threads
+
+
+def test_concurrent_dependencies_are_not_run_in_parallel(module_system):
+	blankie_module, events = module_system
+	active = []
+
+	class Concurrent(blankie_module.module.Module):
+		name = 'concurrent'
+		concurrent = True
+
+		def __init__(self, *args):
+			super().__init__()
+			self.args = args
+
+		def get_dependencies(self):
+			return [('concurrent', 'dependency')] if self.args == ('dependent',) else []
+
+		def start(self):
+			active.append(self.args)
+			assert active == [self.args]
+			events.append(('start', self.args))
+			active.remove(self.args)
+
+		stop = start
+
+	wanted = [('concurrent', 'dependent')]
+	select(blankie_module, '10', lambda: wanted)
+	blankie_module.module.update()
+	wanted = []
+	blankie_module.module.update()
+
+	assert events == [
+		('start', ('dependency',)),
+		('start', ('dependent',)),
+		('start', ('dependent',)),
+		('start', ('dependency',)),
+	]
+
+
+def test_failed_concurrent_stop_is_kept_in_place(module_system):
+	blankie_module, events = module_system
+
+	class Concurrent(blankie_module.module.Module):
+		name = 'concurrent'
+		concurrent = True
+
+		def __init__(self, *args):
+			super().__init__()
+			self.args = args
+
+		def stop(self):
+			events.append(('stop', self.args))
+			if self.args == (2,):
+				raise RuntimeError('stop failed')
+
+	wanted = [('concurrent', 1), ('concurrent', 2), ('concurrent', 3)]
+	select(blankie_module, '10', lambda: wanted)
+	blankie_module.module.update()
+	wanted = [('concurrent', 1)]
+
+	with pytest.raises(blankie_module.UserError, match='Failed to stop some modules'):
+		blankie_module.module.update()
+	assert sorted(events) == [('stop', (2,)), ('stop', (3,))]
+	assert list(blankie_module.module.running_modules) == [('concurrent', 1), ('concurrent', 2)]
+
+
+def test_concurrency_can_be_disabled(module_system, monkeypatch):
+	blankie_module, _events = module_system
+	threads = []
+
+	class Concurrent(blankie_module.module.Module):
+		name = 'concurrent'
+		concurrent = True
+
+		def __init__(self, *args):
+			super().__init__()
+
+		def start(self):
+			threads.append(threading.current_thread())
+
+	monkeypatch.setattr(blankie_module.module, 'max_workers', 1)
+	select(blankie_module, '10', lambda: [('concurrent', 1), ('concurrent', 2)])
+
+	blankie_module.module.update()
+
+	assert threads == [threading.current_thread()] * 2
+
+
+def test_selectors_with_unchanged_inputs_are_skipped(module_system):
+	blankie_module, events = module_system
+	calls = []
+	inputs = ['a']
+
+	def selector(wanted_modules):
+		calls.append(inputs[0])
+		wanted_modules.append(('recording', inputs[0]))
+
+	blankie_module.module.selectors['10'] = blankie_module.module.Selector(selector, lambda: inputs[0])
+	blankie_module.module.update()
+	blankie_module.module.update()
+	assert calls == ['a']
+	assert list(blankie_module.module.running_modules) == [('recording', 'a')]
+	assert blankie_module.module.selector_stats == {'executed': 1, 'skipped': 1}
+
+	inputs[0] = 'b'
+	blankie_module.module.update()
+	assert calls == ['a', 'b']
+	assert list(blankie_module.module.running_modules) == [('recording', 'b')]
+	assert blankie_module.module.selector_stats == {'executed': 2, 'skipped': 1}
+
+
+def test_running_changes_track_running_modules_by_name(module_system):
+	blankie_module, events = module_system
+	wanted = [('recording', 1)]
+	select(blankie_module, '10', lambda: wanted)
+
+	blankie_module.module.update()
+	changes = blankie_module.module.running_changes['recording']
+	blankie_module.module.update()
+	assert blankie_module.module.running_changes['recording'] == changes
+	wanted = []
+	blankie_module.module.update()
+	assert blankie_module.module.running_changes['recording'] > changes
+
+
+def test_batch_defers_updates_until_the_outermost_block_exits(module_system, monkeypatch):
+	blankie_module, events = module_system
+	wanted = []
+	select(blankie_module, '10', lambda: wanted)
+	updates = []
+	original_update = blankie_module.module.update
+
+	def counting_update():
+		updates.append(blankie_module.module._batch_depth)
+		original_update()
+	monkeypatch.setattr(blankie_module.module, 'update', counting_update)
+
+	with blankie_module.module.batch():
+		for i in range(3):
+			with blankie_module.module.batch():
+				wanted.append(('recording', i))
+				blankie_module.module.update()
+			assert events == []
+	assert events == [('start', (i,)) for i in range(3)]
+	# Three deferred calls, plus the one performed at the end.
+	assert blankie_module.module.selector_stats['executed'] == 1
+	assert updates == [2, 2, 2, 0]
+
+
+def test_batch_without_updates_does_nothing(module_system):
+	blankie_module, events = module_system
+	with blankie_module.module.batch():
+		pass
+	assert blankie_module.module.selector_stats['executed'] == 0
+
+
+def test_batch_converges_when_the_block_raises(module_system):
+	blankie_module, events = module_system
+	wanted = []
+	select(blankie_module, '10', lambda: wanted)
+
+	with pytest.raises(KeyError):
+		with blankie_module.module.batch():
+			wanted.append(('recording', 1))
+			blankie_module.module.update()
+			raise KeyError()
+	assert events == [('start', (1,))]
+
+
+def test_batch_keeps_the_blocks_exception_if_the_update_fails(module_system, monkeypatch, caplog):
+	blankie_module, _events = module_system
+
+	def fail():
+		raise RuntimeError('update failed')
+
+	with pytest.raises(KeyError):
+		with blankie_module.module.batch():
+			blankie_module.module.update()
+			monkeypatch.setattr(blankie_module.module, 'start_stop_modules', fail)
+			raise KeyError()
+	assert 'Error in deferred module update' in caplog.text
+	assert blankie_module.module._batch_depth == 0
+
+	# Without an exception from the block, the update's error is raised.
+	with pytest.raises(RuntimeError):
+		with blankie_module.module.batch():
+			blankie_module.module.update()
+
+
+def test_remote_disconnect_detaches_all_sessions_in_one_update(module_system):
+	blankie_module, events = module_system
+	import blankie.modules.session.remote  # noqa: F401 - registers the session module
+	from blankie.modules.remote_receiver import RemoteReceiverModule
+	blankie_module.module.selectors['30-sessions'] = blankie_module.session.session_selector
+
+	for i in range(20):
+		blankie_module.session.attach(('session.remote', str(i)))
+	assert len(blankie_module.module.running_modules) == 20
+	executed = blankie_module.module.selector_stats['executed']
+
+	RemoteReceiverModule().bus_packet({'type': 'disconnect'})
+	assert not blankie_module.session.session_specs
+	assert not blankie_module.module.running_modules
+	# One update for the whole batch, plus the re-entrant one made by
+	# each Session.stop() (instead of two per detached session).
+	assert blankie_module.module.selector_stats['executed'] == executed + 1 + 20
@@ -1,4 +1,3 @@
-import io
 import json
 import os
 import socket
@@ -12,16 +11,13 @@ def server_module(blankie_module, event_loop, monkeypatch):
 	from blankie.modules.server import ServerModule
 
 	monkeypatch.setattr(blankie_module.config, 'reconfigure', lambda: None)
-	monkeypatch.setattr(blankie_module.config.configurator, 'print_status', lambda _f: None)
 	monkeypatch.setattr(blankie_module.session, 'attach', blankie_module.session.session_specs.add)
 	monkeypatch.setattr(blankie_module.session, 'detach', blankie_module.session.session_specs.remove)
 	module = ServerModule()
 	module.start()
-	server = module.server
 	yield blankie_module, module
 	if module.server is not None:
 		module.stop()
-	server.server_close()
 	os.unlink(blankie_module.server.path)
 
 
@@ -36,164 +32,171 @@ def read_line(client):
 	return client.makefile('rb', buffering=0).readline()
 
 
-def reader_module(module):
-	module.server = type('Server', (), {'request_lock': threading.Lock(), 'stopping': False})()
-	return module
-
-
-class Handler:
-	def __init__(self, input, output):
-		self.rfile = input
-		self.wfile = output
-
-
-class WakeLockInput:
-	def __init__(self, trailing=b'', error=None):
-		self.trailing = trailing
-		self.error = error
-
-	def readline(self):
-		return b'["wake-lock"]\n'
-
-	def read(self):
-		if self.error is not None:
-			raise self.error
-		return self.trailing
-
+def read_all(client):
+	client.settimeout(1)
+	with client.makefile('rb') as f:
+		return f.read()
 
-def run_reader(module, handler):
-	completed = threading.Event()
-	errors = []
 
-	def run():
-		try:
-			module.server_reader(handler)
-		except Exception as error:
-			errors.append(error)
-		finally:
-			completed.set()
-
-	thread = threading.Thread(target=run)
-	thread.start()
-	assert completed.wait(timeout=1)
-	thread.join(timeout=1)
-	assert not thread.is_alive()
-	return errors
+def record(calls, name, func=None):
+	def recorder(*args):
+		calls.append((name,) + args)
+		if func is not None:
+			return func(*args)
+	return recorder
 
 
-def test_wake_lock_attaches_before_acknowledging(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
+class FailingSocket(socket.socket):
+	'''Server-side connection socket whose reads or writes fail.'''
+	failing = None
 
-	attached = []
+	def recv(self, *args):
+		if self.failing == 'recv':
+			raise ConnectionResetError()
+		return super().recv(*args)
 
-	def attach(spec):
-		attached.append(spec)
+	def send(self, *args):
+		if self.failing == 'send':
+			raise BrokenPipeError()
+		return super().send(*args)
 
-	class Output(io.BytesIO):
-		def write(self, data):
-			assert attached
-			return super().write(data)
 
-	monkeypatch.setattr(blankie_module.session, 'attach', attach)
-	monkeypatch.setattr(blankie_module.session, 'detach', lambda _spec: None)
-	module = reader_module(ServerModule())
-	handler = Handler(WakeLockInput(), Output())
+def connect_pair(blankie_module, module, failing):
+	'''Hand one end of a socket pair to the server, as if accepted.'''
+	(client, server_side) = socket.socketpair()
+	server_side = FailingSocket(fileno=server_side.detach())
+	server_side.failing = failing
+	blankie_module.ioloop.run_sync(module.server.add_connection, server_side)
+	return client
 
-	assert not run_reader(module, handler)
-	assert handler.wfile.getvalue() == b'Wake lock acquired.\n'
-	assert len(attached) == 1
 
+def test_server_uses_no_thread_per_connection(server_module, sync):
+	blankie_module, _module = server_module
+	threads = threading.active_count()
+	clients = [connect(blankie_module, 'wake-lock') for _ in range(20)]
+	for client in clients:
+		assert read_line(client) == b'Wake lock acquired.\n'
+	assert threading.active_count() == threads
+	assert len(blankie_module.wake_lock.holders) == 20
+	assert blankie_module.session.session_specs == {blankie_module.wake_lock.session_spec}
+	for client in clients:
+		client.close()
+	sync()
+	sync()
+	assert not blankie_module.session.session_specs
 
-def test_wake_lock_eof_and_reset_detach_once(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
 
-	for error in (None, ConnectionResetError()):
-		attached = []
-		detached = []
-		monkeypatch.setattr(blankie_module.session, 'attach', attached.append)
-		monkeypatch.setattr(blankie_module.session, 'detach', detached.append)
+def test_commands_are_answered_and_the_connection_closed(server_module):
+	blankie_module, _module = server_module
+	client = connect(blankie_module, 'ping')
+	assert read_all(client) == b'pong\n'
+	client.close()
 
-		run_reader(
-			reader_module(ServerModule()),
-			Handler(WakeLockInput(error=error), io.BytesIO()),
-		)
 
-		assert detached == attached
-		assert len(detached) == 1
+def test_commands_may_arrive_in_pieces(server_module, sync):
+	blankie_module, _module = server_module
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.connect(blankie_module.server.path)
+	client.sendall(b'["pi')
+	sync()
+	client.sendall(b'ng"]\n')
+	assert read_all(client) == b'pong\n'
+	client.close()
 
 
-@pytest.mark.parametrize('method', ['write', 'flush'])
-def test_wake_lock_acknowledgement_failure_detaches_once(blankie_module, event_loop, monkeypatch, method):
-	from blankie.modules.server import ServerModule
+@pytest.mark.parametrize('data', [b'["ping"]', b'not json\n', b'{}\n'])
+def test_invalid_or_unterminated_commands_are_dropped(server_module, data):
+	blankie_module, _module = server_module
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.connect(blankie_module.server.path)
+	client.sendall(data)
+	client.shutdown(socket.SHUT_WR)
+	assert read_all(client) == b''
+	client.close()
 
-	attached = []
-	detached = []
 
-	class Output(io.BytesIO):
-		def write(self, data):
-			if method == 'write':
-				raise BrokenPipeError()
-			return super().write(data)
+def test_wake_lock_attaches_before_acknowledging(server_module, monkeypatch):
+	blankie_module, module = server_module
+	from blankie.modules.server import Connection
 
-		def flush(self):
-			if method == 'flush':
-				raise BrokenPipeError()
+	calls = []
+	monkeypatch.setattr(blankie_module.session, 'attach', record(calls, 'attach'))
+	monkeypatch.setattr(blankie_module.session, 'detach', record(calls, 'detach'))
+	monkeypatch.setattr(Connection, 'send', record(calls, 'send', Connection.send))
+	client = connect(blankie_module, 'wake-lock')
 
-	monkeypatch.setattr(blankie_module.session, 'attach', attached.append)
-	monkeypatch.setattr(blankie_module.session, 'detach', detached.append)
+	assert read_line(client) == b'Wake lock acquired.\n'
+	assert [call[0] for call in calls] == ['attach', 'send']
+	client.close()
 
-	errors = run_reader(reader_module(ServerModule()), Handler(WakeLockInput(), Output()))
 
-	assert len(errors) == 1
-	assert detached == attached
-	assert len(detached) == 1
+@pytest.mark.parametrize('how', ['shutdown', 'close', 'reset'])
+def test_wake_lock_eof_and_reset_detach_once(server_module, monkeypatch, how, sync):
+	blankie_module, module = server_module
+	calls = []
+	monkeypatch.setattr(blankie_module.session, 'attach', record(calls, 'attach'))
+	monkeypatch.setattr(blankie_module.session, 'detach', record(calls, 'detach'))
 
+	client = connect_pair(blankie_module, module, None)
+	client.sendall(b'["wake-lock"]\n')
+	assert read_line(client) == b'Wake lock acquired.\n'
+	match how:
+		case 'shutdown':
+			client.shutdown(socket.SHUT_WR)
+		case 'close':
+			client.close()
+		case 'reset':
+			# The next read fails.
+			(connection,) = module.server.connections
+			connection.socket.failing = 'recv'
+			client.sendall(b'x')
+	sync()
+	sync()
+
+	(attach,) = [call for call in calls if call[0] == 'attach']
+	assert calls == [attach, ('detach',) + attach[1:]]
+	client.close()
 
-def test_simultaneous_wake_locks_use_distinct_session_specs(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
 
-	attached = []
-	detached = []
-	both_attached = threading.Event()
-	first_can_close = threading.Event()
-	second_can_close = threading.Event()
+def test_wake_lock_acknowledgement_failure_detaches_once(server_module, monkeypatch, sync):
+	blankie_module, module = server_module
+	calls = []
+	monkeypatch.setattr(blankie_module.session, 'attach', record(calls, 'attach'))
+	monkeypatch.setattr(blankie_module.session, 'detach', record(calls, 'detach'))
 
-	class Input(WakeLockInput):
-		def __init__(self, can_close):
-			super().__init__()
-			self.can_close = can_close
+	client = connect_pair(blankie_module, module, 'send')
+	client.sendall(b'["wake-lock"]\n')
+	assert read_all(client) == b''
+	sync()
 
-		def read(self):
-			assert self.can_close.wait(timeout=1)
-			return b''
+	(attach,) = [call for call in calls if call[0] == 'attach']
+	assert calls == [attach, ('detach',) + attach[1:]]
+	client.close()
 
-	def attach(spec):
-		attached.append(spec)
-		if len(attached) == 2:
-			both_attached.set()
 
-	monkeypatch.setattr(blankie_module.session, 'attach', attach)
-	monkeypatch.setattr(blankie_module.session, 'detach', detached.append)
-	module = reader_module(ServerModule())
-	threads = [
-		threading.Thread(target=module.server_reader, args=(Handler(Input(event), io.BytesIO()),))
-		for event in (first_can_close, second_can_close)
-	]
-	for thread in threads:
-		thread.start()
-	assert both_attached.wait(timeout=1)
-	assert attached[0] != attached[1]
-	assert all(spec[0] == 'session.wake_lock' for spec in attached)
-
-	first_can_close.set()
-	threads[0].join(timeout=1)
-	assert not threads[0].is_alive()
-	assert detached == [attached[0]]
-	second_can_close.set()
-	for thread in threads[1:]:
-		thread.join(timeout=1)
-		assert not thread.is_alive()
-	assert set(detached) == set(attached)
+def test_simultaneous_wake_locks_share_one_session(server_module, monkeypatch, sync):
+	blankie_module, _module = server_module
+	calls = []
+	monkeypatch.setattr(blankie_module.session, 'attach', record(calls, 'attach', blankie_module.session.session_specs.add))
+	monkeypatch.setattr(blankie_module.session, 'detach', record(calls, 'detach', blankie_module.session.session_specs.remove))
+	clients = [connect(blankie_module, 'wake-lock') for _ in range(3)]
+	for client in clients:
+		assert read_line(client) == b'Wake lock acquired.\n'
+	assert blankie_module.session.session_specs == {('session.wake_lock', 'wake-lock')}
+	assert len(blankie_module.wake_lock.holders) == 3
+
+	for client in clients[:2]:
+		client.close()
+	sync()
+	sync()
+	assert len(blankie_module.wake_lock.holders) == 1
+	assert blankie_module.session.session_specs == {('session.wake_lock', 'wake-lock')}
+	clients[2].close()
+	sync()
+	sync()
+	assert not blankie_module.session.session_specs
+	# Only the first acquisition and the last release affect sessions.
+	assert [call[0] for call in calls] == ['attach', 'detach']
 
 
 def test_wake_lock_connection_adds_and_removes_its_session_spec(server_module):
@@ -211,9 +214,8 @@ def test_wake_lock_connection_adds_and_removes_its_session_spec(server_module):
 	assert not blankie_module.session.session_specs
 
 
-def test_status_lists_wake_lock_sessions_without_legacy_count(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
-
+def test_status_lists_wake_lock_sessions_without_legacy_count(server_module, monkeypatch):
+	blankie_module, _module = server_module
 	spec = ('session.wake_lock', 'client')
 	monkeypatch.setattr(blankie_module.session, 'session_specs', {spec})
 	monkeypatch.setattr(
@@ -221,17 +223,16 @@ def test_status_lists_wake_lock_sessions_without_legacy_count(blankie_module, ev
 		'get',
 		lambda _spec: type('Session', (), {'get_idle_since': lambda self: float('inf')})(),
 	)
-	monkeypatch.setattr(blankie_module.config.configurator, 'print_status', lambda _output: None)
-	handler = Handler(io.BytesIO(b'["status"]\n'), io.BytesIO())
-
-	assert not run_reader(reader_module(ServerModule()), handler)
-	assert repr(spec).encode() in handler.wfile.getvalue()
-	assert b'Wake locks:' not in handler.wfile.getvalue()
+	client = connect(blankie_module, 'status')
 
+	output = read_all(client)
+	client.close()
+	assert repr(spec).encode() in output
+	assert b'Wake locks:' not in output
 
-def test_failed_wake_lock_attach_sends_no_acknowledgement_or_detach(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
 
+def test_failed_wake_lock_attach_sends_no_acknowledgement_or_detach(server_module, monkeypatch, sync):
+	blankie_module, _module = server_module
 	detached = []
 	monkeypatch.setattr(
 		blankie_module.session,
@@ -239,27 +240,28 @@ def test_failed_wake_lock_attach_sends_no_acknowledgement_or_detach(blankie_modu
 		lambda _spec: (_ for _ in ()).throw(RuntimeError('attach failed')),
 	)
 	monkeypatch.setattr(blankie_module.session, 'detach', detached.append)
-	handler = Handler(WakeLockInput(), io.BytesIO())
-
-	run_reader(reader_module(ServerModule()), handler)
+	client = connect(blankie_module, 'wake-lock')
 
-	assert handler.wfile.getvalue() == b''
+	assert read_all(client) == b''
+	client.close()
+	sync()
 	assert not detached
 
 
-def test_wake_lock_trailing_bytes_are_not_processed_as_commands(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
-
-	attached = []
-	detached = []
-	monkeypatch.setattr(blankie_module.session, 'attach', attached.append)
-	monkeypatch.setattr(blankie_module.session, 'detach', detached.append)
-	handler = Handler(WakeLockInput(b'["unlock"]\n'), io.BytesIO())
-
-	assert not run_reader(reader_module(ServerModule()), handler)
+def test_wake_lock_trailing_bytes_are_not_processed_as_commands(server_module, sync):
+	blankie_module, _module = server_module
+	client = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+	client.connect(blankie_module.server.path)
+	client.sendall(b'["wake-lock"]\n["lock"]\n')
+	assert read_line(client) == b'Wake lock acquired.\n'
+	client.sendall(b'["lock"]\n')
+	client.shutdown(socket.SHUT_WR)
+	assert read_all(client) == b''
+	client.close()
+	sync()
+	sync()
 	assert not blankie_module.state.locked
-	assert len(attached) == 1
-	assert detached == attached
+	assert not blankie_module.session.session_specs
 
 
 @pytest.mark.parametrize('count', [1, 2])
@@ -293,7 +295,8 @@ def test_stop_interrupts_held_wake_lock_clients(server_module, monkeypatch, coun
 		for client in clients:
 			client.close()
 	assert detached_event.wait(timeout=1)
-	assert len(detached) == count
+	assert len(detached) == 1
+	assert not blankie_module.wake_lock.holders
 	assert not blankie_module.session.session_specs
 	assert module.server is None
 
@@ -340,29 +343,41 @@ def test_stop_command_terminates_accept_loop(server_module, monkeypatch):
 	client.close()
 
 
-def test_stopping_server_does_not_start_wakeup_or_wake_lock_work(blankie_module, event_loop, monkeypatch):
-	from blankie.modules.server import ServerModule
-
-	module = ServerModule()
-	module.server = type('Server', (), {'stopping': True})()
-	monkeypatch.setattr(blankie_module.daemon, 'call', lambda *_args: pytest.fail('started work'))
-	monkeypatch.setattr(blankie_module.session, 'attach', lambda *_args: pytest.fail('attached session'))
+def test_stopping_server_does_not_start_command_or_wake_lock_work(server_module, monkeypatch):
+	blankie_module, module = server_module
+	started = []
+	monkeypatch.setattr(blankie_module.daemon, 'call', record(started, 'call'))
+	module.server.stopping = True
 
-	assert not run_reader(module, Handler(io.BytesIO(b'["server-shutdown-ping"]\n'), io.BytesIO()))
-	assert not run_reader(module, Handler(WakeLockInput(), io.BytesIO()))
+	for command in ('wake-lock', 'status'):
+		client = connect(blankie_module, command)
+		assert read_all(client) == b''
+		client.close()
+	assert not started
 
 
 def test_cleared_server_does_not_start_command_work(blankie_module, event_loop, monkeypatch):
 	from blankie.modules.server import ServerModule
 
-	monkeypatch.setattr(blankie_module.daemon, 'call', lambda *_args: pytest.fail('started work'))
-	monkeypatch.setattr(blankie_module.session, 'attach', lambda *_args: pytest.fail('attached session'))
+	started = []
+	monkeypatch.setattr(blankie_module.daemon, 'call', record(started, 'call'))
+
+	class Connection:
+		closed = False
+		wake_lock = False
 
-	assert not run_reader(ServerModule(), Handler(WakeLockInput(), io.BytesIO()))
-	assert not run_reader(ServerModule(), Handler(io.BytesIO(b'["status"]\n'), io.BytesIO()))
+		def close(self):
+			self.closed = True
 
+	for command in (b'["wake-lock"]', b'["status"]'):
+		connection = Connection()
+		ServerModule().server_reader(connection, command)
+		assert connection.closed
+		assert not connection.wake_lock
+	assert not started
 
-def test_stop_racing_reader_admission_does_not_attach_wake_lock(server_module, monkeypatch):
+
+def test_stop_racing_wake_lock_admission_does_not_attach(server_module, monkeypatch):
 	blankie_module, module = server_module
 	entered = threading.Event()
 	resume = threading.Event()
@@ -370,10 +385,10 @@ def test_stop_racing_reader_admission_does_not_attach_wake_lock(server_module, m
 	attached = []
 	original_wake_lock = module.server_wake_lock
 
-	def server_wake_lock(server, handler):
+	def server_wake_lock(server, connection):
 		entered.set()
 		assert resume.wait(timeout=1)
-		original_wake_lock(server, handler)
+		original_wake_lock(server, connection)
 		completed.set()
 
 	monkeypatch.setattr(module, 'server_wake_lock', server_wake_lock)
@@ -385,7 +400,7 @@ def test_stop_racing_reader_admission_does_not_attach_wake_lock(server_module, m
 	stop_thread.join(timeout=1)
 	assert not stop_thread.is_alive()
 	resume.set()
-	assert client.makefile('rb').read() == b''
+	assert read_all(client) == b''
 	client.close()
 	assert completed.wait(timeout=1)
 	assert not attached
@@ -409,7 +424,7 @@ def test_detach_during_shutdown_drain_does_not_restart_modules(blankie_module, e
 	assert not blankie_module.module.running_modules
 
 
-def test_detach_queued_after_event_loop_exit_does_not_block_stop(blankie_module, monkeypatch):
+def test_wake_lock_release_queued_after_event_loop_exit_does_not_block_stop(blankie_module, monkeypatch):
 	from blankie.modules.server import ServerModule
 
 	loop = blankie_module.daemon.EventLoop()
@@ -430,14 +445,176 @@ def test_detach_queued_after_event_loop_exit_does_not_block_stop(blankie_module,
 	assert not loop_thread.is_alive()
 
 	module = ServerModule()
-	module.server = type('Server', (), {'interrupt_requests': lambda self: None})()
-	module.server_thread = type('Thread', (), {'join': lambda self: None})()
-	monkeypatch.setattr(blankie_module.server, 'notify', lambda *_args: None)
-	spec = ('session.wake_lock', 'stopped-loop')
-	blankie_module.session.session_specs.add(spec)
-	released = threading.Event()
-	blankie_module.daemon.call(blankie_module.session.detach, spec)
-	blankie_module.daemon.call(released.set)
-	module.stop()
-	assert not released.is_set()
-	assert spec in blankie_module.session.session_specs
+	module.start()
+	blankie_module.ioloop.run_sync(lambda: None)
+	# The wake-lock request, and then its release, are queued for the
+	# event loop, which will never run them.
+	client = connect(blankie_module, 'wake-lock')
+	blankie_module.ioloop.run_sync(lambda: None)
+	while not loop.depth():
+		blankie_module.ioloop.run_sync(lambda: None)
+
+	stop_thread = threading.Thread(target=module.stop)
+	stop_thread.start()
+	stop_thread.join(timeout=1)
+	assert not stop_thread.is_alive()
+	assert read_all(client) == b''
+	client.close()
+	assert loop.depth() == 2
+	os.unlink(blankie_module.server.path)
+
+
+def read_event(client):
+	client.settimeout(1)
+	return json.loads(read_line(client))
+
+
+def test_watch_streams_the_state_and_then_events(server_module, sync):
+	blankie_module, _module = server_module
+	blankie_module.session.session_specs.add(('session.tty', '/dev/tty1'))
+	client = connect(blankie_module, 'watch')
+	event = read_event(client)
+	assert event['event'] == 'state'
+	assert (event['locked'], event['sleeping']) == (False, False)
+	assert event['sessions'] == [['session.tty', '/dev/tty1']]
+
+	sync()
+	blankie_module.daemon.call(blankie_module.lock)
+	blankie_module.daemon.call(blankie_module.lock)
+	blankie_module.daemon.call(blankie_module.unlock)
+	blankie_module.daemon.call(blankie_module.events.emit, 'started', module=('timer', frozenset([5])))
+	assert read_event(client)['event'] == 'locked'
+	assert read_event(client)['event'] == 'unlocked'
+	assert read_event(client)['module'] == ['timer', 'frozenset({5})']
+	client.close()
+
+
+def test_watch_clients_are_removed_on_eof(server_module, sync):
+	blankie_module, module = server_module
+	client = connect(blankie_module, 'watch')
+	assert read_event(client)['event'] == 'state'
+	sync()
+	assert len(module.server.watchers) == 1
+	client.shutdown(socket.SHUT_WR)
+	assert read_all(client) == b''
+	assert not module.server.watchers
+	client.close()
+
+
+def test_slow_watch_clients_are_dropped(server_module, monkeypatch, sync):
+	blankie_module, module = server_module
+	from blankie.modules.server import Connection
+	monkeypatch.setattr(Connection, 'max_watch_buffer', 4096)
+
+	slow = connect(blankie_module, 'watch')
+	slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 1024)
+	fast = connect(blankie_module, 'watch')
+	assert read_event(fast)['event'] == 'state'
+	sync()
+
+	padding = 'x' * 500
+	for i in range(10000):
+		blankie_module.daemon.call(blankie_module.events.emit, 'test', number=i, padding=padding)
+		assert read_event(fast)['number'] == i
+		if len(module.server.watchers) == 1:
+			break
+	else:
+		pytest.fail('slow client was not dropped')
+	fast.close()
+	slow.close()
+
+
+def test_watch_is_rejected_on_framed_connections(server_module):
+	blankie_module, _module = server_module
+	import blankie.client
+
+	with blankie.client.Client() as client:
+		with pytest.raises(blankie.client.Error, match='one-shot'):
+			client.call('watch')
+
+
+def test_status_is_served_from_the_snapshot_without_the_main_thread(server_module, monkeypatch):
+	blankie_module, _module = server_module
+	spec = ('session.x11', ':0')
+	monkeypatch.setattr(blankie_module.session, 'session_specs', {spec})
+	monkeypatch.setattr(
+		blankie_module.module,
+		'get',
+		lambda _spec: type('Session', (), {'get_idle_since': lambda self: 1234.5})(),
+	)
+	published = threading.Event()
+	blankie_module.daemon.call(lambda: (blankie_module.snapshot.publish(), published.set()))
+	assert published.wait(timeout=1)
+
+	# Block the main thread; status queries are still answered.
+	release = threading.Event()
+	blankie_module.daemon.call(release.wait, 1)
+	try:
+		client = connect(blankie_module, 'status')
+		output = read_all(client)
+		client.close()
+		assert b"- ('session.x11', ':0') - 1234.5\n" in output
+		assert b'State as of ' in output
+
+		client = connect(blankie_module, 'status', '--json')
+		status = json.loads(read_all(client))
+		client.close()
+	finally:
+		release.set()
+	assert status['locked'] is False
+	assert status['sessions'] == [{'session': ['session.x11', ':0'], 'idle_since': 1234.5}]
+	assert 0 <= status['age'] < 1
+
+
+def test_status_snapshot_follows_module_updates(server_module, monkeypatch, sync):
+	blankie_module, _module = server_module
+	monkeypatch.setattr(blankie_module.module, 'selectors', {})
+	blankie_module.daemon.call(blankie_module.module.update)
+	sync()
+	first = blankie_module.snapshot.current
+	assert first is not None
+
+	def lock():
+		blankie_module.state.locked = True
+		blankie_module.module.update()
+	blankie_module.daemon.call(lock)
+	sync()
+	assert blankie_module.snapshot.current.locked
+	assert blankie_module.snapshot.current.time >= first.time
+
+
+def test_invalid_status_options_are_rejected(server_module, sync):
+	blankie_module, _module = server_module
+	import blankie.client
+
+	blankie_module.daemon.call(blankie_module.snapshot.publish)
+	sync()
+	with blankie.client.Client() as client:
+		assert client.call('status').startswith('Currently locked: False\n')
+		with pytest.raises(blankie.client.Error, match='Unknown status options'):
+			client.call('status', '--bogus')
+
+
+def test_wake_lock_holders_are_listed_in_status(server_module, monkeypatch):
+	blankie_module, _module = server_module
+	monkeypatch.setattr(
+		blankie_module.module,
+		'get',
+		lambda _spec: type('Session', (), {'get_idle_since': lambda self: float('inf')})(),
+	)
+	client = connect(blankie_module, 'wake-lock', 'backup')
+	assert read_line(client) == b'Wake lock acquired.\n'
+	(holder,) = blankie_module.wake_lock.holders.values()
+	assert holder.pid == os.getpid()
+	assert holder.reason == 'backup'
+
+	status = connect(blankie_module, 'status')
+	output = read_all(status)
+	status.close()
+	assert b"- PID %d, 'backup', for 0 s\n" % os.getpid() in output
+
+	status = connect(blankie_module, 'status', '--json')
+	(wake_lock,) = json.loads(read_all(status))['wake_locks']
+	status.close()
+	assert (wake_lock['pid'], wake_lock['reason']) == (os.getpid(), 'backup')
+	client.close()
@@ -0,0 +1,152 @@
+import math
+import threading
+
+import pytest
+
+
+def test_reader_sees_the_writers_updates(blankie_module, tmp_path):
+	import blankie.state_file
+
+	path = str(tmp_path / 'state')
+	writer = blankie.state_file.Writer(path)
+	with blankie.state_file.Reader(path) as reader:
+		state = reader.read()
+		assert (state.running, state.sessions, state.idle_since) == (False, 0, math.inf)
+
+		writer.write(locked=True, sleeping=False, running=True, sessions=3, idle_since=1234.5)
+		state = reader.read()
+		assert (state.locked, state.sleeping, state.running) == (True, False, True)
+		assert (state.sessions, state.idle_since) == (3, 1234.5)
+		assert state.sequence % 2 == 0
+
+		# Readers which keep the file mapped see the daemon stop.
+		writer.close()
+		assert not reader.read().running
+		assert reader.read().locked
+	with pytest.raises(FileNotFoundError):
+		blankie.state_file.read(path)
+
+
+def test_reader_retries_partial_updates(blankie_module, tmp_path):
+	import blankie.state_file
+
+	path = str(tmp_path / 'state')
+	writer = blankie.state_file.Writer(path)
+	writer.sequence += 1
+	blankie.state_file._sequence.pack_into(writer.map, blankie.state_file._sequence_offset, writer.sequence)
+	with blankie.state_file.Reader(path) as reader:
+		with pytest.raises(TimeoutError):
+			reader.read(timeout=0.01)
+	writer.close()
+
+
+def test_reads_are_consistent_during_concurrent_writes(blankie_module, tmp_path):
+	import blankie.state_file
+
+	path = str(tmp_path / 'state')
+	writer = blankie.state_file.Writer(path)
+	done = threading.Event()
+
+	def write():
+		for i in range(20000):
+			writer.write(locked=i % 2, sleeping=False, running=True, sessions=i, idle_since=float(i))
+		done.set()
+
+	thread = threading.Thread(target=write)
+	with blankie.state_file.Reader(path) as reader:
+		thread.start()
+		while not done.is_set():
+			state = reader.read()
+			assert state.idle_since == (state.sessions if state.running else math.inf)
+			assert state.locked == bool(state.sessions % 2)
+	thread.join()
+	writer.close()
+
+
+def test_rejects_other_files(blankie_module, tmp_path):
+	import blankie.state_file
+
+	path = tmp_path / 'state'
+	path.write_bytes(b'\0' * blankie.state_file.size)
+	with pytest.raises(ValueError):
+		blankie.state_file.read(str(path))
+
+
+def test_module_writes_published_snapshots(blankie_module, monkeypatch):
+	import os
+	import blankie.state_file
+	from blankie.modules.state_file import StateFileModule
+
+	monkeypatch.setattr(blankie_module.daemon, 'event_loop_thread', threading.current_thread())
+	os.makedirs(blankie_module.run_dir, exist_ok=True)
+	spec = ('session.x11', ':0')
+	monkeypatch.setattr(blankie_module.session, 'session_specs', {spec})
+	monkeypatch.setattr(
+		blankie_module.module,
+		'get',
+		lambda _spec: type('Session', (), {'get_idle_since': lambda self: 1234.5})(),
+	)
+
+	module = StateFileModule()
+	module.start()
+	state = blankie.state_file.read()
+	assert (state.locked, state.running, state.sessions, state.idle_since) == (False, True, 1, 1234.5)
+
+	blankie_module.state.locked = True
+	blankie_module.state.sleeping = True
+	blankie_module.snapshot.publish()
+	state = blankie.state_file.read()
+	assert (state.locked, state.sleeping, state.idle_since) == (True, True, -math.inf)
+
+	module.stop()
+	assert not os.path.exists(blankie.state_file.path)
+
+
+def test_idle_time_changes_are_written_without_module_updates(blankie_module, event_loop, monkeypatch):
+	import os
+	import time
+	import blankie.state_file
+	from blankie.modules.state_file import StateFileModule
+
+	os.makedirs(blankie_module.run_dir, exist_ok=True)
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: pytest.fail('Should not update the modules'))
+
+	class Session:
+		notifies_changes = True
+		idle_since = 1234.5
+
+		def get_idle_since(self):
+			return self.idle_since
+
+	session = Session()
+	spec = ('test', 1)
+	blankie_module.module.module_instances[spec] = session
+	module = StateFileModule()
+
+	def start():
+		blankie_module.idle.add(spec)
+		module.start()
+
+	def wait_for(idle_since):
+		deadline = time.monotonic() + 2
+		while True:
+			try:
+				if blankie.state_file.read().idle_since == idle_since:
+					return
+			except FileNotFoundError:
+				pass  # Not started yet
+			assert time.monotonic() < deadline
+			time.sleep(0.01)
+
+	blankie_module.daemon.call(start)
+	wait_for(1234.5)
+
+	def activity():
+		session.idle_since = 2000.0
+		blankie_module.idle.invalidate(session)
+
+	blankie_module.daemon.call(activity)
+	wait_for(2000.0)
+
+	blankie_module.daemon.call(module.stop)
+	blankie_module.daemon.call(blankie_module.idle.remove, spec)
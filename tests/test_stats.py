@@ -0,0 +1,77 @@
+import logging
+import time
+
+
+def test_histogram_percentiles_are_bucket_upper_bounds(blankie_module):
+	histogram = blankie_module.stats.Histogram((1, 2, 4, 8))
+	assert histogram.percentile(50) == 0
+	for value in [0.5, 1, 1.5, 3, 3, 3, 7, 20]:
+		histogram.add(value)
+	assert histogram.count == 8
+	assert histogram.percentile(25) == 1
+	assert histogram.percentile(50) == 4
+	assert histogram.percentile(99) == 20
+	assert histogram.max == 20
+	assert len(histogram.counts) == 5
+
+
+def test_histogram_percentile_is_capped_by_the_maximum(blankie_module):
+	histogram = blankie_module.stats.Histogram((1, 10))
+	histogram.add(2)
+	assert histogram.percentile(50) == 2
+
+
+def test_event_loop_records_latency_duration_and_depth_per_task_kind(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+
+	def sleeper():
+		time.sleep(0.01)
+
+	def other():
+		pass
+
+	loop.call(sleeper)
+	loop.call(other)
+	loop.call(other)
+	loop.stopping = True
+	loop.run()
+
+	sleeper_stats = loop.task_stats[blankie_module.stats.task_kind(sleeper)]
+	other_stats = loop.task_stats[blankie_module.stats.task_kind(other)]
+	assert sleeper_stats.duration.count == 1
+	assert sleeper_stats.duration.max >= 0.01
+	assert other_stats.duration.count == 2
+	# The second call to other() waited behind sleeper() and the first
+	# call to other().
+	assert other_stats.latency.max >= 0.01
+	assert other_stats.depth.max == 2
+	assert sleeper_stats.depth.max == 0
+
+
+def test_slow_tasks_are_logged_and_counted(blankie_module, monkeypatch, caplog):
+	monkeypatch.setattr(blankie_module.daemon, 'slow_task_threshold', 0.005)
+	loop = blankie_module.daemon.EventLoop()
+
+	def slow_task():
+		time.sleep(0.01)
+
+	loop.call(slow_task)
+	loop.call(lambda: None)
+	loop.stopping = True
+	with caplog.at_level(logging.WARNING, logger='blankie'):
+		loop.run()
+
+	assert loop.stats['slow'] == 1
+	assert loop.task_stats[blankie_module.stats.task_kind(slow_task)].slow == 1
+	assert 'Slow event task: %s took' % blankie_module.stats.task_kind(slow_task) in caplog.text
+
+
+def test_report_lists_tasks(blankie_module):
+	loop = blankie_module.daemon.EventLoop()
+	loop.call(blankie_module.session.get_sessions)
+	loop.stopping = True
+	loop.run()
+
+	report = blankie_module.stats.report(loop).decode()
+	assert report.startswith('Event loop: 1 tasks executed, 0 waiting (max 1), 0 slow (over 500 ms)\n')
+	assert '- get_sessions: 1 runs, 0 slow, 0 stalled\n' in report
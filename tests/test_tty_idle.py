@@ -0,0 +1,293 @@
+import os
+import threading
+import time
+
+import pytest
+
+pytest.importorskip('inotify_simple')
+
+
+@pytest.fixture
+def ptys():
+	opened = []
+
+	def open_ptys(count):
+		for _ in range(count):
+			opened.extend(os.openpty())
+		return [(opened[i], opened[i + 1], os.ttyname(opened[i + 1])) for i in range(len(opened) - 2 * count, len(opened), 2)]
+
+	yield open_ptys
+	for fd in opened:
+		os.close(fd)
+
+
+def type_on(master, slave):
+	'''Simulate input: a program on the TTY reads what was typed.'''
+	os.write(master, b'x\n')
+	os.read(slave, 100)
+
+
+@pytest.fixture
+def tty_idle(blankie_module, event_loop, monkeypatch):
+	import blankie.modules.session.tty
+	import blankie.modules.tty_idle
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: None)
+	monkeypatch.setattr(blankie_module.config.configurator, 'idle_checks', [60, 300])
+
+	class Session(blankie.modules.session.tty.TTYSession):
+		def __init__(self, tty):
+			super().__init__(tty)
+			self.invalidated = threading.Event()
+			self.invalidations = 0
+
+		def invalidate(self):
+			super().invalidate()
+			self.invalidations += 1
+			self.invalidated.set()
+
+	def start(tty):
+		spec = ('session.tty', tty)
+		session = blankie_module.module.module_instances[spec] = Session(tty)
+		# Long ago
+		session.last_input = session.last_output = 0.0
+		module = blankie.modules.tty_idle.TTYIdlePerSessionModule(spec)
+		module.start()
+		return (module, session)
+
+	yield (blankie.modules.tty_idle, start)
+
+
+def test_many_ttys_share_one_inotify_instance(tty_idle, ptys):
+	tty_idle_module, start = tty_idle
+	threads = threading.active_count()
+	terminals = ptys(300)
+	sessions = [start(tty) for _master, _slave, tty in terminals]
+
+	watcher = tty_idle_module.watcher
+	assert sum(len(modules) for modules in watcher.watches.values()) == 300
+	# No thread per session (only the shared I/O thread, if it was
+	# not running yet).
+	assert threading.active_count() <= threads + 1
+
+	active = [0, 150, 299]
+	for i in active:
+		type_on(*terminals[i][:2])
+	for i in active:
+		assert sessions[i][1].invalidated.wait(timeout=2)
+	time.sleep(0.1)
+	assert [i for i, (_module, session) in enumerate(sessions) if session.invalidated.is_set()] == active
+
+	for module, _session in sessions:
+		module.stop()
+	assert tty_idle_module.watcher is None
+
+
+def test_stopped_sessions_no_longer_receive_events(tty_idle, ptys):
+	tty_idle_module, start = tty_idle
+	[(master1, slave1, tty1), (master2, slave2, tty2)] = ptys(2)
+	(module1, session1) = start(tty1)
+	(module2, session2) = start(tty2)
+
+	module1.stop()
+	assert len(tty_idle_module.watcher.watches) == 1
+	type_on(master1, slave1)
+	type_on(master2, slave2)
+	assert session2.invalidated.wait(timeout=2)
+	time.sleep(0.1)
+	assert not session1.invalidated.is_set()
+
+	# Watching again after all sessions stopped.
+	module2.stop()
+	assert tty_idle_module.watcher is None
+	(module1, session1) = start(tty1)
+	type_on(master1, slave1)
+	assert session1.invalidated.wait(timeout=2)
+	module1.stop()
+
+
+def test_only_activity_after_an_idle_period_triggers_updates(blankie_module, tty_idle, ptys, monkeypatch, sync, wait):
+	tty_idle_module, start = tty_idle
+	[(master, slave, tty)] = ptys(1)
+	(module, session) = start(tty)
+	stats = tty_idle_module.stats
+
+	monkeypatch.setattr(module, 'min_update_interval', 0.5)
+
+	# Idle -> active: one update, then none while the TTY stays busy
+	# (only a deferred refresh of the idle time).
+	for _ in range(50):
+		type_on(master, slave)
+		time.sleep(0.001)
+	assert session.invalidated.wait(timeout=2)
+	time.sleep(0.1)
+	sync()
+	assert session.invalidations == 1
+	assert stats['events'] >= stats['handled'] > 1
+	assert stats['updates'] == 1
+	wait(lambda: stats['refreshes'] == 1)
+	assert stats['deferred'] == 1
+	assert stats['updates'] == 1
+
+	# Quiet for longer than the first threshold: the next activity is
+	# an edge again, but updates are rate limited.
+	module.last_update = time.monotonic()
+	session.last_input -= 61
+	type_on(master, slave)
+	wait(lambda: stats['deferred'] == 2)
+	assert session.invalidations == 2
+	wait(lambda: session.invalidations == 3)
+	assert stats['updates'] == 2
+
+	module.stop()
+	assert b'TTY activity: ' in blankie_module.stats.report(blankie_module.daemon._event_loop)
+
+
+def test_combined_idle_time_follows_activity(blankie_module, tty_idle, ptys, monkeypatch, wait):
+	_tty_idle_module, start = tty_idle
+	[(master, slave, tty)] = ptys(1)
+	(module, session) = start(tty)
+	monkeypatch.setattr(module, 'min_update_interval', 0.1)
+	updates = []
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: updates.append(session.get_idle_since()))
+	blankie_module.daemon.call(blankie_module.idle.add, ('session.tty', tty))
+
+	type_on(master, slave)
+	wait(lambda: len(updates) == 1)
+	first = updates[0]
+	wait(lambda: blankie_module.idle.last_idle_since == first)
+
+	# Not an idle -> active edge: no update, but the combined idle
+	# time (sent to remote peers etc.) still moves.
+	time.sleep(0.2)
+	type_on(master, slave)
+	wait(lambda: blankie_module.idle.last_idle_since > first)
+	assert len(updates) == 1
+
+	module.stop()
+
+
+def test_activity_does_not_update_the_modules_with_a_timer_running(blankie_module, event_loop, ptys, monkeypatch, sync, wait):
+	import blankie.modules.session.tty
+	import blankie.modules.tty_idle
+	from blankie.modules.timer import TimerModule
+
+	class Config:
+		@staticmethod
+		def config(c):
+			c.is_idle_for(60)
+
+	class XSet(blankie_module.module.Module):
+		name = 'xset'
+
+	monkeypatch.setattr(blankie_module.config, 'module', Config)
+	monkeypatch.setattr(blankie_module.module, 'selectors', {
+		'20-config': blankie_module.module.selectors['20-config'],
+	})
+	instances = blankie_module.module.module_instances
+	timer = instances[('timer', frozenset([60]))] = TimerModule(frozenset([60]))
+	instances[('xset', 60)] = XSet()
+
+	[(master, slave, tty)] = ptys(1)
+	spec = ('session.tty', tty)
+	session = instances[spec] = blankie.modules.session.tty.TTYSession(tty)
+	session.last_input = session.last_output = time.time()
+	module = blankie.modules.tty_idle.TTYIdlePerSessionModule(spec)
+	monkeypatch.setattr(module, 'min_update_interval', 0.05)
+	stats = blankie.modules.tty_idle.stats
+
+	updates = []
+	update = blankie_module.module.update
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: (updates.append(None), update()))
+
+	def setup():
+		blankie_module.idle.add(spec)
+		module.start()
+		update()
+	blankie_module.daemon.call(setup)
+	sync()
+	assert timer.timer_running
+
+	for count in range(1, 6):
+		time.sleep(0.1)
+		type_on(master, slave)
+		wait(lambda: stats['refreshes'] == count)
+		sync()
+	assert stats['updates'] == 0
+	assert updates == []
+	assert timer.timer_running
+
+	blankie_module.daemon.call(module.stop)
+	sync()
+
+
+def test_activity_without_known_thresholds_updates(blankie_module, tty_idle, ptys, monkeypatch, wait):
+	tty_idle_module, start = tty_idle
+	[(master, slave, tty)] = ptys(1)
+	(module, session) = start(tty)
+	# E.g. the configuration only checks the idle time while unlocked.
+	monkeypatch.setattr(blankie_module.config.configurator, 'idle_checks', [])
+	session.last_input = time.time()
+
+	type_on(master, slave)
+	wait(lambda: tty_idle_module.stats['updates'] == 1)
+
+	module.stop()
+
+
+def test_idle_time_is_kept_from_tty_events(blankie_module, tty_idle, ptys, monkeypatch, wait):
+	_tty_idle_module, start = tty_idle
+	[(master, slave, tty)] = ptys(1)
+	(module, session) = start(tty)
+	monkeypatch.setattr('os.stat', lambda *args: pytest.fail('Should not stat the TTY'))
+
+	# Output counts as activity (e.g. a long-running job).
+	before = time.time()
+	os.write(slave, b'output\n')
+	wait(lambda: session.get_idle_since() > 0)
+	assert before <= session.get_idle_since() <= time.time()
+	assert session.last_input == 0.0
+
+	before = time.time()
+	type_on(master, slave)
+	wait(lambda: session.last_input > 0)
+	assert before <= session.get_idle_since() <= time.time()
+	session.invalidate()
+	assert before <= session.get_idle_since()
+
+	monkeypatch.undo()
+	module.stop()
+	assert not session.watched
+
+
+def test_output_can_be_ignored(blankie_module, tty_idle, ptys, monkeypatch, sync, wait):
+	import blankie.modules.session.tty
+	_tty_idle_module, start = tty_idle
+	monkeypatch.setattr(blankie.modules.session.tty.TTYSession, 'output_is_activity', False)
+	[(master, slave, tty)] = ptys(1)
+	(module, session) = start(tty)
+
+	os.write(slave, b'output\n')
+	time.sleep(0.1)
+	sync()
+	assert session.get_idle_since() == 0.0
+
+	type_on(master, slave)
+	wait(lambda: session.get_idle_since() > 0)
+
+	module.stop()
+
+
+def test_unwatched_sessions_read_the_device_timestamps(blankie_module, ptys, monkeypatch):
+	import blankie.modules.session.tty
+	[(master, slave, tty)] = ptys(1)
+	session = blankie.modules.session.tty.TTYSession(tty)
+	stat = os.stat(tty)
+	assert session.get_idle_since() == max(stat.st_atime, stat.st_mtime)
+	monkeypatch.setattr(session, 'output_is_activity', False)
+	assert session.get_idle_since() == stat.st_atime
+	monkeypatch.undo()
+
+	session.last_input = 0.0
+	assert session.get_idle_since() == stat.st_mtime
+	session.invalidate()
+	assert session.get_idle_since() == max(stat.st_atime, stat.st_mtime)
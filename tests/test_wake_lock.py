@@ -0,0 +1,112 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def wake_lock(blankie_module, event_loop, monkeypatch):
+	calls = []
+
+	def attach(spec):
+		calls.append(('attach', spec))
+		blankie_module.session.session_specs.add(spec)
+
+	def detach(spec):
+		calls.append(('detach', spec))
+		blankie_module.session.session_specs.remove(spec)
+
+	monkeypatch.setattr(blankie_module.session, 'attach', attach)
+	monkeypatch.setattr(blankie_module.session, 'detach', detach)
+	monkeypatch.setattr(blankie_module.snapshot, 'schedule', lambda: None)
+	return blankie_module.wake_lock, calls
+
+
+def on_main_thread(blankie_module, func, *args):
+	'''Run func on the event loop, and return its result.'''
+	done = threading.Event()
+	result = []
+
+	def run():
+		try:
+			result.append((True, func(*args)))
+		except Exception as error:
+			result.append((False, error))
+		finally:
+			done.set()
+
+	blankie_module.daemon.call(run)
+	assert done.wait(timeout=1)
+	(succeeded, value) = result[0]
+	if not succeeded:
+		raise value
+	return value
+
+
+def test_only_the_first_and_last_holders_attach_and_detach(blankie_module, wake_lock):
+	(wake_lock, calls) = wake_lock
+	holders = [on_main_thread(blankie_module, wake_lock.acquire, 1, 'reason %d' % i) for i in range(3)]
+	for holder in holders:
+		on_main_thread(blankie_module, wake_lock.release, holder)
+	on_main_thread(blankie_module, wake_lock.release, holders[0])
+	assert calls == [('attach', wake_lock.session_spec), ('detach', wake_lock.session_spec)]
+
+
+def test_leases_expire(blankie_module, wake_lock):
+	(wake_lock, calls) = wake_lock
+	short = on_main_thread(blankie_module, wake_lock.lease, 0.05, None, 'short')
+	long = on_main_thread(blankie_module, wake_lock.lease, 10)
+	assert short.expires <= time.time() + 0.05
+	time.sleep(0.2)
+	assert list(on_main_thread(blankie_module, lambda: list(wake_lock.holders))) == [long.id]
+	with pytest.raises(blankie_module.UserError, match='expired'):
+		on_main_thread(blankie_module, wake_lock.renew, short.id)
+
+	on_main_thread(blankie_module, wake_lock.release, on_main_thread(blankie_module, wake_lock.get_lease, long.id))
+	assert calls == [('attach', wake_lock.session_spec), ('detach', wake_lock.session_spec)]
+	assert long.timer is None
+
+
+def test_renewing_a_lease_postpones_its_expiry(blankie_module, wake_lock):
+	(wake_lock, calls) = wake_lock
+	holder = on_main_thread(blankie_module, wake_lock.lease, 0.1)
+	for _ in range(4):
+		time.sleep(0.05)
+		on_main_thread(blankie_module, wake_lock.renew, holder.id)
+	assert holder.id in wake_lock.holders
+	on_main_thread(blankie_module, wake_lock.renew, holder.id, 0.01)
+	time.sleep(0.1)
+	on_main_thread(blankie_module, lambda: None)
+	assert not wake_lock.holders
+	assert calls[-1] == ('detach', wake_lock.session_spec)
+
+
+@pytest.mark.parametrize('duration', [0, -1, float('inf'), float('-inf'), float('nan'), '10', True, False])
+def test_invalid_lease_durations_are_rejected(blankie_module, wake_lock, duration):
+	(wake_lock, calls) = wake_lock
+	with pytest.raises(blankie_module.UserError, match='Invalid wake-lock duration'):
+		on_main_thread(blankie_module, wake_lock.lease, duration)
+	assert not calls
+
+
+def test_leases_over_the_socket(blankie_module, event_loop, wake_lock, monkeypatch):
+	from blankie.modules.server import ServerModule
+	import blankie.client
+
+	module = ServerModule()
+	module.start()
+	try:
+		with blankie.client.Client() as client:
+			lease_id = int(client.call('wake-lock-lease', 60, 'backup'))
+			(holder,) = wake_lock[0].holders.values()
+			assert (holder.id, holder.reason, holder.duration) == (lease_id, 'backup', 60)
+			assert client.call('wake-lock-renew', lease_id, 120) == 'Wake lock renewed.\n'
+			assert holder.duration == 120
+			assert client.call('wake-lock-release', lease_id) == 'Wake lock released.\n'
+			assert not wake_lock[0].holders
+			with pytest.raises(blankie.client.Error, match='No such wake-lock lease'):
+				client.call('wake-lock-release', lease_id)
+			with pytest.raises(blankie.client.Error, match='unknown daemon command'):
+				client.call('wake-lock-lease')
+	finally:
+		module.stop()
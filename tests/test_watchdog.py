@@ -0,0 +1,76 @@
+import logging
+import threading
+
+import pytest
+
+
+@pytest.fixture
+def watchdog(blankie_module, event_loop, monkeypatch):
+	monkeypatch.setattr(blankie_module.watchdog, 'stall_timeout', 0.05)
+	watchdog = blankie_module.watchdog.Watchdog(event_loop)
+	watchdog.start()
+	yield watchdog
+	watchdog.stop()
+
+
+def stall(event_loop, release, until):
+	def stuck_task():
+		assert release.wait(timeout=5)
+	event_loop.call(stuck_task)
+	assert until.wait(timeout=5)
+	release.set()
+	synced = threading.Event()
+	event_loop.call(synced.set)
+	assert synced.wait(timeout=5)
+
+
+def test_stalls_are_logged_with_the_stack_and_recorded(blankie_module, event_loop, watchdog, caplog):
+	release = threading.Event()
+	reported = threading.Event()
+	caplog.set_level(logging.ERROR, logger='blankie')
+	original_record_stall = event_loop.record_stall
+
+	def record_stall(kind, duration):
+		original_record_stall(kind, duration)
+		reported.set()
+	event_loop.record_stall = record_stall
+
+	stall(event_loop, release, reported)
+	assert event_loop.stats['stalls'] == 1
+	(kind, duration, _when) = event_loop.last_stall
+	assert kind.endswith('stall.<locals>.stuck_task')
+	assert duration >= 0.05
+	assert event_loop.task_stats[kind].stalls == 1
+	assert 'Event loop stalled: %s' % kind in caplog.text
+	# The stack of the event loop thread shows where it is stuck.
+	assert 'in stuck_task' in caplog.text
+	assert 'release.wait(timeout=5)' in caplog.text
+
+
+def test_each_stall_is_acted_upon_once(blankie_module, event_loop, watchdog, monkeypatch):
+	release = threading.Event()
+	reported = threading.Event()
+	actions = []
+
+	def action(kind, duration):
+		actions.append(kind)
+		reported.set()
+	monkeypatch.setattr(blankie_module.watchdog, 'stall_action', action)
+
+	stall(event_loop, release, reported)
+	assert len(actions) == 1
+	assert event_loop.stats['stalls'] == 1
+
+
+def test_lock_action_locks_once_the_event_loop_recovers(blankie_module, event_loop, watchdog, monkeypatch):
+	monkeypatch.setattr(blankie_module.watchdog, 'stall_action', 'lock')
+	locked = threading.Event()
+	monkeypatch.setattr(blankie_module, 'lock', locked.set)
+	release = threading.Event()
+
+	def stuck_task():
+		assert release.wait(timeout=5)
+	event_loop.call(stuck_task)
+	assert not locked.wait(timeout=0.2)
+	release.set()
+	assert locked.wait(timeout=5)
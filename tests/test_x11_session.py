@@ -0,0 +1,99 @@
+import types
+
+import pytest
+
+
+class Window:
+	'''Like Xlib.xobject.drawable.Window, with the MIT-SCREEN-SAVER
+	extension loaded.'''
+
+	def __init__(self, connection):
+		self.connection = connection
+
+	def screensaver_query_info(self):
+		connection = self.connection
+		if connection.broken:
+			raise ConnectionResetError('Connection closed by server')
+		connection.queries += 1
+		return types.SimpleNamespace(idle=connection.idle_ms)
+
+
+class Connection:
+	def __init__(self, idle_ms, broken=False):
+		self.idle_ms = idle_ms
+		self.broken = broken
+		self.queries = 0
+		self.closed = False
+
+	def screen(self):
+		return types.SimpleNamespace(root=Window(self))
+
+	def close(self):
+		self.closed = True
+
+
+@pytest.fixture
+def session(blankie_module):
+	import blankie.modules.session.x11
+	return blankie.modules.session.x11.X11Session(':0')
+
+
+def test_active_session_is_not_idle(session):
+	session.connect = lambda: pytest.fail('Should not query the X server')
+	assert session.get_idle_since() == float('inf')
+
+
+def test_idle_time_is_queried_once_until_invalidated(session, monkeypatch):
+	connections = []
+
+	def connect():
+		connections.append(Connection(5000))
+		return connections[-1]
+
+	session.connect = connect
+	session.idle = True
+	monkeypatch.setattr('time.time', lambda: 100.0)
+
+	assert session.get_idle_since() == 95.0
+	assert session.get_idle_since() == 95.0
+	session.invalidate()
+	assert session.get_idle_since() == 95.0
+	assert len(connections) == 1
+	assert connections[0].queries == 2
+
+
+def test_broken_connection_is_replaced(session, monkeypatch):
+	first = Connection(1000)
+	connections = [first, Connection(2000)]
+	session.connect = lambda: connections.pop(0)
+	session.idle = True
+	monkeypatch.setattr('time.time', lambda: 100.0)
+
+	assert session.get_idle_since() == 99.0
+	session.invalidate()
+	first.broken = True  # e.g. the X server was restarted
+	assert session.get_idle_since() == 98.0
+	assert first.closed
+	assert not connections
+
+
+def test_query_fails_if_reconnecting_fails(session):
+	connections = [Connection(0, broken=True), Connection(0, broken=True)]
+	session.connect = lambda: connections.pop(0)
+	session.idle = True
+
+	with pytest.raises(ConnectionResetError):
+		session.get_idle_since()
+	assert not connections
+
+
+def test_stop_closes_the_connection(session, monkeypatch):
+	connection = Connection(0)
+	session.connect = lambda: connection
+	session.idle = True
+	session.get_idle_since()
+	monkeypatch.setattr('blankie.module.update', lambda: None)
+
+	session.stop()
+	assert connection.closed
+	assert session.connection is None
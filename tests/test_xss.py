@@ -0,0 +1,78 @@
+import io
+
+import pytest
+
+
+class Process:
+	'''Stands in for the xss helper process.'''
+
+	pid = 1234
+
+	def __init__(self, output):
+		self.stdout = io.BytesIO(output)
+		self.terminated = False
+
+	def terminate(self):
+		self.terminated = True
+
+	def communicate(self):
+		return (None, None)
+
+
+@pytest.fixture
+def xss(blankie_module, event_loop, monkeypatch):
+	import blankie.modules.session.x11
+	import blankie.modules.xss
+
+	updates = []
+	monkeypatch.setattr(blankie_module.module, 'update', lambda: updates.append(None))
+	spec = ('session.x11', ':0')
+	session = blankie_module.module.module_instances[spec] = blankie.modules.session.x11.X11Session(':0')
+	module = blankie.modules.xss.XSSPerSessionModule(spec)
+	yield (module, session, updates)
+	module.stop()
+
+
+def test_in_process_notifications_update_the_session(blankie_module, xss, sync):
+	module, session, updates = xss
+	session.idle_since = 1234.5
+
+	module.xss_notify('on', 'blanked', 'natural')
+	sync()
+	assert session.idle
+	assert session.idle_since == -1  # Invalidated
+	assert len(updates) == 1
+
+	module.xss_notify('off', 'blanked', 'natural')
+	sync()
+	assert not session.idle
+	assert len(updates) == 2
+
+
+def test_helper_process_is_the_fallback(blankie_module, xss, monkeypatch, sync):
+	module, session, updates = xss
+
+	def fail():
+		raise ConnectionRefusedError('Cannot connect to the X server')
+
+	processes = []
+
+	def popen(args, **kwargs):
+		assert args[1:] == ['-m', 'blankie.xss_helper']
+		assert kwargs['env']['DISPLAY'] == ':0'
+		processes.append(Process(b'init\nnotify on blanked natural\n'))
+		return processes[-1]
+
+	monkeypatch.setattr(module, 'xss_start_in_process', fail)
+	monkeypatch.setattr('subprocess.Popen', popen)
+	module.start()
+	assert module.screen_saver is None
+	assert module.xss_process is processes[0]
+	module.xss_reader_thread.join(timeout=1)
+	sync()
+	assert session.idle
+	assert len(updates) == 1
+
+	module.stop()
+	assert processes[0].terminated
+	assert module.xss_process is None